@@ -97,6 +97,8 @@ class CdkDeploymentStack(Stack):
             "ROOT_CATALOG_URI": self.node.try_get_context("ROOT_CATALOG_URI"),
         }
         indexer_env_var_prefix = "stac_index_indexer_"
+        # Lambda has no /dev/shm, which parse worker processes require
+        environment[f"{indexer_env_var_prefix}parse_workers"] = "0"
         if requested_log_level is not None:
             environment[f"{indexer_env_var_prefix}log_level"] = requested_log_level
         indexer_lambda = _lambda.DockerImageFunction(
@@ -1,3 +1,4 @@
+from json import loads
 from os import environ
 from re import match, sub
 from typing import Any, Dict, Final, List
@@ -52,8 +53,22 @@ def handler(event, context) -> Dict[str, Any]:
             )
         )
         index_run_retention = index_run_retention_default
-    index_run_prefixes_to_delete = sorted(list(index_files_by_run.keys()))[
-        :-index_run_retention
+    # runs referenced by the current manifest, e.g. an index with item deltas, are always retained
+    manifest = loads(bytes(obstore.get(store=s3_store, path=manifest_path).bytes()))
+    referenced_index_run_prefixes = {
+        "{}{}/".format(
+            manifest_parent_path, "/".join(metadata["relative_path"].split("/")[:-1])
+        )
+        for metadata in list(manifest.get("tables", {}).values())
+        + manifest.get("item_deltas", [])
+        + ([manifest["database"]] if manifest.get("database") is not None else [])
+    }
+    index_run_prefixes_to_delete = [
+        index_run_prefix
+        for index_run_prefix in sorted(list(index_files_by_run.keys()))[
+            :-index_run_retention
+        ]
+        if index_run_prefix not in referenced_index_run_prefixes
     ]
     print(f"need to delete {len(index_run_prefixes_to_delete)} past index run(s)")
     if len(index_run_prefixes_to_delete) > 0:
@@ -1,8 +1,19 @@
 from json import dumps
-from typing import List, Tuple
+from typing import Final, List, Tuple
 
 from duckdb import DuckDBPyConnection
 from stac_index.indexer.types.index_config import IndexConfig
+from stac_index.indexer.types.text_search import (
+    text_search_dictionary_table,
+    text_search_documents_table,
+    text_search_ignore_pattern,
+    text_search_stats_table,
+    text_search_stemmer,
+    text_search_stopwords,
+    text_search_terms_table,
+)
+
+_text_search_source_table: Final[str] = "text_search_source"
 
 
 def add_items_columns(config: IndexConfig, connection: DuckDBPyConnection) -> None:
@@ -18,6 +29,7 @@ def add_items_columns(config: IndexConfig, connection: DuckDBPyConnection) -> No
 def configure_indexables(config: IndexConfig, connection: DuckDBPyConnection) -> None:
     _configure_queryables(config, connection)
     _configure_sortables(config, connection)
+    _configure_text_search(config, connection)
 
 
 def _configure_queryables(config: IndexConfig, connection: DuckDBPyConnection) -> None:
@@ -76,3 +88,83 @@ def _configure_sortables(config: IndexConfig, connection: DuckDBPyConnection) ->
         """,
             [collection_id, name],
         )
+
+
+def _configure_text_search(config: IndexConfig, connection: DuckDBPyConnection) -> None:
+    # DuckDB's full-text index lives in schema objects that cannot be exported as parquet.
+    # Build the index here, then export the tables required to score BM25 matches at query time.
+    if len(config.text_searchables) == 0:
+        return
+    connection.execute("INSTALL fts")
+    connection.execute("LOAD fts")
+    text_columns = [
+        config.indexables[name].table_column_name
+        for name in config.text_searchables.keys()
+    ]
+    # the full-text index requires a single-column document key, items are keyed by collection and ID
+    connection.execute(
+        f"""
+        CREATE TABLE {_text_search_source_table} AS
+        SELECT row_number() OVER () AS text_key
+             , collection_id
+             , id
+             , {", ".join(text_columns)}
+          FROM items
+    """
+    )
+    connection.execute(
+        """
+        PRAGMA create_fts_index(
+            '{source_table}', 'text_key', {columns},
+            stemmer='{stemmer}', stopwords='{stopwords}', ignore='{ignore}',
+            strip_accents=1, lower=1, overwrite=1
+        )
+    """.format(
+            source_table=_text_search_source_table,
+            columns=", ".join([f"'{column}'" for column in text_columns]),
+            stemmer=text_search_stemmer,
+            stopwords=text_search_stopwords,
+            ignore=text_search_ignore_pattern,
+        )
+    )
+    fts_schema = f"fts_main_{_text_search_source_table}"
+    connection.execute(
+        f"""
+        CREATE TABLE {text_search_terms_table} AS
+        SELECT docid
+             , termid
+          FROM {fts_schema}.terms
+    """
+    )
+    connection.execute(
+        f"""
+        CREATE TABLE {text_search_documents_table} AS
+        SELECT s.collection_id
+             , s.id
+             , d.docid
+             , COUNT(t.termid) AS len
+          FROM {fts_schema}.docs d
+    INNER JOIN {_text_search_source_table} s ON s.text_key = d.name
+     LEFT JOIN {text_search_terms_table} t ON t.docid = d.docid
+      GROUP BY s.collection_id, s.id, d.docid
+    """
+    )
+    connection.execute(
+        f"""
+        CREATE TABLE {text_search_dictionary_table} AS
+        SELECT d.termid
+             , d.term
+             , COUNT(DISTINCT t.docid) AS df
+          FROM {fts_schema}.dict d
+    INNER JOIN {text_search_terms_table} t ON t.termid = d.termid
+      GROUP BY d.termid, d.term
+    """
+    )
+    connection.execute(
+        f"""
+        CREATE TABLE {text_search_stats_table} AS
+        SELECT COUNT(*) AS num_docs
+             , AVG(len) AS avgdl
+          FROM {text_search_documents_table}
+    """
+    )
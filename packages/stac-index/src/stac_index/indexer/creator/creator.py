@@ -1,11 +1,13 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from glob import glob
 from hashlib import md5
-from json import dump
+from json import dump, dumps
 from logging import Logger, getLogger
-from os import makedirs, path
+from os import makedirs, path, remove
 from tempfile import mkdtemp
-from typing import Dict, Final, List, Optional, Self, Tuple, cast
+from typing import Any, Dict, Final, Iterator, List, Optional, Self, Set, Tuple, cast
 from uuid import uuid4
 
 from duckdb import ConstraintException, connect
@@ -16,41 +18,293 @@ from stac_index.indexer.creator.configurer import (
     add_items_columns,
     configure_indexables,
 )
+from stac_index.indexer.settings import get_settings
 from stac_index.indexer.stac_catalog_reader import StacCatalogReader
-from stac_index.indexer.types.index_config import IndexConfig, collection_wildcard
-from stac_index.indexer.types.index_manifest import IndexManifest, TableMetadata
+from stac_index.indexer.types.index_config import (
+    IndexableByCollection,
+    IndexConfig,
+    collection_wildcard,
+)
+from stac_index.indexer.types.index_manifest import (
+    DatabaseMetadata,
+    IndexManifest,
+    ShardMetadata,
+    TableMetadata,
+)
 from stac_index.indexer.types.indexing_error import (
     IndexingError,
     IndexingErrorType,
     new_error,
     save_error,
 )
+from stac_index.indexer.types.item_delta import (
+    ItemEvent,
+    ItemEventType,
+    format_items_with_deltas,
+    item_delta_deleted_column,
+)
 from stac_index.indexer.types.stac_data import ItemWithLocation
+from stac_index.indexer.types.text_search import text_search_tables
 from stac_index.io.readers import get_reader_for_uri
+from stac_index.io.readers.source_reader import SourceReader
 
 _logger: Final[Logger] = getLogger(__name__)
 _indexer_version: Final[int] = (
     1  # only increment on changes that are not backwards-compatible
 )
+_exported_table_names: Final[List[str]] = [
+    "collections",
+    "items",
+    "queryables_by_collection",
+    "sortables_by_collection",
+    "errors",
+    "index_history",
+    "item_changes",
+    *text_search_tables,
+]
+_database_filename: Final[str] = "index.duckdb"
+_database_alias: Final[str] = "export_database"
+# stages recorded in the checkpoints table, completed collections are recorded individually
+_started_stage: Final[str] = "started"
+_previous_index_stage: Final[str] = "previous_index"
+_tables_stage: Final[str] = "tables"
+_collections_stage: Final[str] = "collections"
+_collection_stage_prefix: Final[str] = "collection:"
+_items_stage: Final[str] = "items"
+_indexables_stage: Final[str] = "indexables"
 
 
 def _current_time() -> datetime:
     return datetime.now(tz=timezone.utc)
 
 
+def _hash_data(data_str: str) -> str:
+    return md5(data_str.encode()).hexdigest()
+
+
+def _format_changes_query(
+    table_name: str,
+    key_columns: List[str],
+    hash_column: str,
+    columns: Optional[List[str]] = None,
+) -> str:
+    # Compares a table with its previous version in a single join on its key columns. USING
+    # coalesces the key columns, so rows present in only one version are keyed alike.
+    return """
+        SELECT {key_columns}
+               {columns}
+               , CASE
+                   WHEN p.{hash_column} IS NULL THEN 'added'
+                   WHEN c.{hash_column} IS NULL THEN 'removed'
+                   WHEN c.{hash_column} != p.{hash_column} THEN 'updated'
+                   ELSE 'unchanged'
+                 END AS change
+          FROM {table_name} c
+     FULL OUTER JOIN {table_name}_previous p USING ({key_columns})
+    """.format(
+        table_name=table_name,
+        key_columns=", ".join(key_columns),
+        hash_column=hash_column,
+        columns="".join(
+            [
+                f", COALESCE(c.{column}, p.{column}) AS {column}"
+                for column in columns or []
+            ]
+        ),
+    )
+
+
+def _get_shard_index(collection_id: str, shard_count: int) -> int:
+    # stable across runs and processes, unlike hash()
+    return int(md5(collection_id.encode()).hexdigest(), 16) % shard_count
+
+
+def _validate_shard_manifests(shard_manifests: List[IndexManifest]) -> None:
+    if len(shard_manifests) == 0:
+        raise ValueError("at least one shard is required")
+    shards = [shard_manifest.shard for shard_manifest in shard_manifests]
+    if any([shard is None for shard in shards]):
+        raise ValueError("only shard indexes can be merged")
+    shard_count = cast(ShardMetadata, shards[0]).count
+    if sorted([cast(ShardMetadata, shard).index for shard in shards]) != list(
+        range(shard_count)
+    ) or any([cast(ShardMetadata, shard).count != shard_count for shard in shards]):
+        raise ValueError(f"exactly one of each of {shard_count} shard(s) is required")
+    for shard_manifest in shard_manifests[1:]:
+        if (
+            shard_manifest.root_catalog_uri != shard_manifests[0].root_catalog_uri
+            or shard_manifest.index_config != shard_manifests[0].index_config
+        ):
+            raise ValueError(
+                "shards must index the same root catalog with the same index configuration"
+            )
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+@dataclass
+class _ItemRowBuilder:
+    # Built in the indexing process and pickled to parse workers, so holds only plain data.
+    load_id: str
+    column_names: List[str]
+    indexables_by_collection: IndexableByCollection
+
+    def __call__(
+        self: Self, item: ItemWithLocation
+    ) -> Tuple[Optional[Dict[str, Any]], List[IndexingError]]:
+        errors: List[IndexingError] = []
+        geometry: Geometry = wkt_loads(item.geometry.wkt)
+        if not geometry.is_valid:
+            errors.append(
+                new_error(
+                    IndexingErrorType.item_validation,
+                    f"Invalid geometry for '{item.collection}'/'{item.id}': {is_valid_reason(geometry)}",
+                    subtype="invalid_geometry",
+                    collection=item.collection,
+                    item=item.id,
+                )
+            )
+            return (None, errors)
+
+        # every column is present, so that an indexable not configured for an item's collection is
+        # left NULL
+        row: Dict[str, Any] = {column_name: None for column_name in self.column_names}
+        row.update(
+            {
+                "id": item.id,
+                "collection_id": item.collection,
+                "geometry": geometry.wkb_hex,
+                "datetime": item.properties.datetime,
+                "start_datetime": item.properties.start_datetime,
+                "end_datetime": item.properties.end_datetime,
+                "stac_location": item.location,
+                "applied_fixes": ",".join(item.applied_fixes)
+                if item.applied_fixes is not None
+                else "NONE",
+                "load_id": self.load_id,
+                "item_hash": _hash_data(item.to_json()),
+                "source_version": item.source_version,
+            }
+        )
+        for (
+            collection_id,
+            indexable_by_field_name,
+        ) in self.indexables_by_collection.items():
+            if collection_id == collection_wildcard or collection_id == item.collection:
+                for field_name, indexable in indexable_by_field_name.items():
+                    insert_param = None
+                    for path_option in indexable.json_path.split("|"):
+                        # where multiple JSON paths are possible accept the first that is not-None
+                        path_parts = path_option.split(".")
+                        path_parents, path_key = path_parts[:-1], path_parts[-1:][0]
+                        param_source = item.to_dict()
+                        for parent_part in path_parents:
+                            try:
+                                param_source = param_source[parent_part]
+                            except KeyError:
+                                break
+                        try:
+                            insert_param = param_source[path_key]
+                            break
+                        except KeyError:
+                            pass
+                    if insert_param is None:
+                        errors.append(
+                            new_error(
+                                IndexingErrorType.item_validation,
+                                "could not locate path '{}' for field '{}' in '{}'/'{}'".format(
+                                    indexable.json_path,
+                                    field_name,
+                                    item.collection,
+                                    item.id,
+                                ),
+                                collection=item.collection,
+                                item=item.id,
+                            )
+                        )
+                    else:
+                        row[indexable.table_column_name] = insert_param
+        return (row, errors)
+
+
 class IndexCreator:
-    def __init__(self: Self):
+    def __init__(
+        self: Self, export_database: bool = False, load_id: Optional[str] = None
+    ):
         self._creation_time = _current_time()
-        self._conn = connect()
+        self._export_database = export_database
+        self._load_id = load_id or uuid4().hex
+        settings = get_settings()
+        checkpoint_directory = settings.checkpoint_directory
+        self._checkpointing = checkpoint_directory is not None
+        self._working_database_path: Optional[str] = None
+        if checkpoint_directory is not None:
+            # A run that stops can be resumed by a run with the same load ID.
+            # Work is held in a database file named for the load ID, alongside a record of completed stages.
+            makedirs(checkpoint_directory, exist_ok=True)
+            database_path = path.join(checkpoint_directory, f"{self._load_id}.duckdb")
+            _logger.info(f"checkpointing load {self._load_id} to {database_path}")
+            self._conn = connect(database_path)
+        elif settings.working_directory is not None:
+            makedirs(settings.working_directory, exist_ok=True)
+            self._working_database_path = path.join(
+                settings.working_directory, f"{self._load_id}.duckdb"
+            )
+            _logger.info(
+                f"working on load {self._load_id} in {self._working_database_path}"
+            )
+            self._conn = connect(self._working_database_path)
+        else:
+            self._conn = connect()
+        if settings.memory_limit is not None:
+            self._conn.execute(f"SET memory_limit = '{settings.memory_limit}'")
+            # exports need not hold rows in memory to preserve their order, index queries always order results
+            self._conn.execute("SET preserve_insertion_order = false")
+        if settings.temp_directory is not None:
+            self._conn.execute(f"SET temp_directory = '{settings.temp_directory}'")
         self._conn.execute("INSTALL spatial")
         self._conn.execute("LOAD spatial")
-        self._load_id = uuid4().hex
+        if self._checkpointing:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    stage VARCHAR PRIMARY KEY,
+                    completed TIMESTAMPTZ NOT NULL,
+                )
+                """
+            )
+            # a resumed run retains the creation time of the run it resumes
+            if self._is_checkpointed(_started_stage):
+                self._creation_time = self._conn.execute(
+                    "SELECT completed FROM checkpoints WHERE stage = ?",
+                    [_started_stage],
+                ).fetchone()[0]
+                _logger.info(
+                    f"resuming load {self._load_id} started at {self._creation_time}"
+                )
+            else:
+                self._conn.execute(
+                    "INSERT INTO checkpoints VALUES (?, ?)",
+                    [_started_stage, self._creation_time],
+                )
 
     def __del__(self: Self):
         try:
             self._conn.close()
         except Exception:
             pass
+        # a working database is only needed until the index is exported
+        working_database_path = getattr(self, "_working_database_path", None)
+        if working_database_path is not None:
+            for file_path in [working_database_path, f"{working_database_path}.wal"]:
+                try:
+                    remove(file_path)
+                except FileNotFoundError:
+                    pass
 
     def create_empty(self: Self) -> str:
         _logger.info("creating empty index")
@@ -61,43 +315,394 @@ class IndexCreator:
         self: Self,
         root_catalog_uri: str,
         index_config: Optional[IndexConfig] = None,
+        shard: Optional[ShardMetadata] = None,
     ) -> Tuple[List[IndexingError], str]:
         return await self._index_stac_source(
-            root_catalog_uri=root_catalog_uri, index_config=index_config
+            root_catalog_uri=root_catalog_uri, index_config=index_config, shard=shard
         )
 
     async def update_index(
         self: Self,
         manifest_json_uri: str,
+        shard: Optional[ShardMetadata] = None,
     ) -> Tuple[List[IndexingError], str]:
         existing_index_manifest = await self._load_existing_index(manifest_json_uri)
         return await self._index_stac_source(
             root_catalog_uri=cast(str, existing_index_manifest.root_catalog_uri),
             index_config=existing_index_manifest.index_config,
+            shard=shard,
+        )
+
+    async def merge_shards(
+        self: Self,
+        shard_manifest_json_uris: List[str],
+        manifest_json_uri: Optional[str] = None,
+    ) -> Tuple[List[IndexingError], str]:
+        """Combine shard indexes into a complete index.
+
+        Each shard indexes the collections assigned to it, and all shards of a run must be merged
+        together. manifest_json_uri optionally references the index the shards update, which is
+        compared with the merged index in index history.
+
+        """
+        _logger.info(
+            f"merging {len(shard_manifest_json_uris)} shard(s) for load {self._load_id}"
+        )
+        if manifest_json_uri is not None:
+            await self._load_existing_index(manifest_json_uri)
+        shard_manifests = [
+            await get_reader_for_uri(uri=shard_manifest_json_uri)
+            .get_index_reader(index_manifest_uri=shard_manifest_json_uri)
+            .get_index_manifest()
+            for shard_manifest_json_uri in shard_manifest_json_uris
+        ]
+        _validate_shard_manifests(shard_manifests)
+        root_catalog_uri = cast(str, shard_manifests[0].root_catalog_uri)
+        index_config = shard_manifests[0].index_config or IndexConfig()
+        self._create_db_objects()
+        add_items_columns(index_config, self._conn)
+        for shard_manifest_json_uri, shard_manifest in zip(
+            shard_manifest_json_uris, shard_manifests
+        ):
+            await self._merge_shard(shard_manifest_json_uri, shard_manifest)
+        configure_indexables(index_config, self._conn)
+        self._log_index_event(root_catalog_uri=root_catalog_uri)
+        return (
+            [],
+            self._export_db_objects(
+                root_catalog_uri=root_catalog_uri,
+                index_config=index_config,
+            ),
+        )
+
+    async def apply_item_events(
+        self: Self, manifest_json_uri: str, events: List[ItemEvent]
+    ) -> Tuple[List[IndexingError], str]:
+        """Apply item events to an index by adding an item delta.
+
+        The index's existing files are unchanged and referenced by the new manifest, so only the
+        delta, index history, and manifest need to be published. Upserts are checked against the
+        index's items, which are downloaded. Text search does not include items from deltas until
+        the index is compacted.
+
+        """
+        source_reader = get_reader_for_uri(uri=manifest_json_uri)
+        index_manifest = await self._get_compatible_index_manifest(
+            source_reader, manifest_json_uri
+        )
+        if index_manifest.shard is not None:
+            raise ValueError("item events cannot be applied to a shard")
+        index_config = index_manifest.index_config or IndexConfig()
+        # a later event for the same location supersedes an earlier event
+        events_by_uri = {event.uri: event for event in events}
+        _logger.info(
+            f"applying {len(events_by_uri)} item event(s) for load {self._load_id}"
+        )
+        self._create_db_objects()
+        add_items_columns(index_config, self._conn)
+        tmp_dir_path = mkdtemp()
+        # items may only be added to existing collections
+        for table_name in ["collections", "index_history"]:
+            self._conn.execute(
+                "INSERT INTO {} BY NAME SELECT * FROM '{}'".format(
+                    table_name,
+                    await self._download_index_table(
+                        source_reader,
+                        manifest_json_uri,
+                        index_manifest,
+                        table_name,
+                        tmp_dir_path,
+                    ),
+                )
+            )
+        # the index's items with earlier deltas applied, against which upserts are checked and counted
+        self._conn.execute(
+            "CREATE TABLE items_current AS SELECT collection_id, id, stac_location FROM {}".format(
+                await self._format_downloaded_items(
+                    source_reader,
+                    manifest_json_uri,
+                    index_manifest,
+                    await self._download_index_table(
+                        source_reader,
+                        manifest_json_uri,
+                        index_manifest,
+                        "items",
+                        tmp_dir_path,
+                    ),
+                    tmp_dir_path,
+                )
+            )
+        )
+        item_column_types = {
+            row[0]: row[1] for row in self._conn.execute("DESCRIBE items").fetchall()
+        }
+        reader = StacCatalogReader(
+            root_catalog_uri=cast(str, index_manifest.root_catalog_uri),
+            fixes_to_apply=index_config.fixes_to_apply,
+        )
+        rows, errors = await reader.read_items(
+            [
+                event.uri
+                for event in events_by_uri.values()
+                if event.type == ItemEventType.upsert
+            ],
+            _ItemRowBuilder(
+                load_id=self._load_id,
+                column_names=list(item_column_types.keys()),
+                indexables_by_collection=index_config.all_indexables_by_collection,
+            ),
+        )
+        counts: Dict[str, int] = {"inserted": 0, "failed": 0, "duplicates": 0}
+        errors.extend(self._insert_items(rows, item_column_types, counts))
+        # an upsert that fails leaves the item unchanged, rather than deleting it
+        deleted_uris = [
+            event.uri
+            for event in events_by_uri.values()
+            if event.type == ItemEventType.delete
+        ]
+        self._conn.execute(
+            "CREATE TABLE item_delta_deletes AS SELECT unnest(from_json(?, '[\"VARCHAR\"]')) AS stac_location",
+            [dumps(deleted_uris)],
+        )
+        errors.extend(self._reject_upserted_key_conflicts(counts))
+        self._log_item_events(cast(str, index_manifest.root_catalog_uri))
+        output_base_dir, output_relative_dir = self._create_output_directory()
+        delta_relative_path = path.join(output_relative_dir, "items_delta.parquet")
+        index_history_relative_path = path.join(
+            output_relative_dir, "index_history.parquet"
+        )
+        self._conn.execute(
+            f"COPY index_history TO '{path.join(output_base_dir, index_history_relative_path)}' (FORMAT PARQUET)"
+        )
+        self._conn.execute(
+            f"""
+            COPY (
+                SELECT *, false AS {item_delta_deleted_column} FROM items
+                UNION ALL BY NAME
+                SELECT stac_location, true AS {item_delta_deleted_column} FROM item_delta_deletes
+            ) TO '{path.join(output_base_dir, delta_relative_path)}' (FORMAT PARQUET)
+            """
+        )
+        _logger.info(
+            f"item delta upserts {counts['inserted']} item(s) and deletes {len(deleted_uris)}"
+        )
+        return (
+            errors,
+            self._write_manifest(
+                output_base_dir,
+                index_manifest.model_copy(
+                    update={
+                        # a new load ID invalidates API caches for the previous index
+                        "load_id": self._load_id,
+                        "updated": self._creation_time,
+                        "item_deltas": index_manifest.item_deltas
+                        + [TableMetadata(relative_path=delta_relative_path)],
+                        "tables": {
+                            **index_manifest.tables,
+                            "index_history": TableMetadata(
+                                relative_path=index_history_relative_path
+                            ),
+                        },
+                    }
+                ),
+            ),
+        )
+
+    async def compact_index(
+        self: Self, manifest_json_uri: str
+    ) -> Tuple[List[IndexingError], str]:
+        """Create an index with an index's item deltas applied to its items table."""
+        source_reader = get_reader_for_uri(uri=manifest_json_uri)
+        index_manifest = await self._get_compatible_index_manifest(
+            source_reader, manifest_json_uri
+        )
+        _logger.info(
+            f"compacting {len(index_manifest.item_deltas)} item delta(s) for load {self._load_id}"
+        )
+        index_config = index_manifest.index_config or IndexConfig()
+        self._create_db_objects()
+        add_items_columns(index_config, self._conn)
+        tmp_dir_path = mkdtemp()
+        for table_name in ["collections", "items", "errors", "index_history"]:
+            tmp_file_path = await self._download_index_table(
+                source_reader,
+                manifest_json_uri,
+                index_manifest,
+                table_name,
+                tmp_dir_path,
+            )
+            self._conn.execute(
+                "INSERT INTO {} BY NAME SELECT * {} FROM {}".format(
+                    table_name,
+                    "EXCLUDE (id)" if table_name == "errors" else "",
+                    await self._format_downloaded_items(
+                        source_reader,
+                        manifest_json_uri,
+                        index_manifest,
+                        tmp_file_path,
+                        tmp_dir_path,
+                    )
+                    if table_name == "items"
+                    else f"'{tmp_file_path}'",
+                )
+            )
+        # queryables, sortables, and text search are recreated, text search then includes items from deltas
+        configure_indexables(index_config, self._conn)
+        # compaction changes the index's files but not its items
+        self._insert_index_history(
+            index_manifest.root_catalog_uri,
+            items_loaded="(SELECT COUNT(*) FROM items)",
+            items_added=0,
+            items_removed=0,
+            items_updated=0,
+            items_unchanged="(SELECT COUNT(*) FROM items)",
+            collections_loaded="(SELECT COUNT(*) FROM collections)",
+            collections_added=0,
+            collections_removed=0,
+            collections_updated=0,
+            collections_unchanged="(SELECT COUNT(*) FROM collections)",
+        )
+        return (
+            [],
+            self._export_db_objects(
+                root_catalog_uri=index_manifest.root_catalog_uri,
+                index_config=index_config,
+            ),
+        )
+
+    async def _merge_shard(
+        self: Self, shard_manifest_json_uri: str, shard_manifest: IndexManifest
+    ) -> None:
+        shard_index = cast(ShardMetadata, shard_manifest.shard).index
+        source_reader = get_reader_for_uri(uri=shard_manifest_json_uri)
+        tmp_dir_path = mkdtemp()
+        # collections first, items reference them
+        for table_name, key_columns in [
+            ("collections", ["id"]),
+            ("items", ["collection_id", "id"]),
+            ("errors", None),
+        ]:
+            tmp_file_path = await self._download_index_table(
+                source_reader,
+                shard_manifest_json_uri,
+                shard_manifest,
+                table_name,
+                tmp_dir_path,
+            )
+            if key_columns is not None:
+                # shards are expected to be disjoint, overlapping shards indicate a shard was run twice
+                # or with a different shard count
+                duplicate_keys = self._conn.execute(
+                    f"""
+                    SELECT {", ".join(key_columns)} FROM '{tmp_file_path}'
+                 INTERSECT
+                    SELECT {", ".join(key_columns)} FROM {table_name}
+                     LIMIT 10
+                    """
+                ).fetchall()
+                if len(duplicate_keys) > 0:
+                    raise ValueError(
+                        "shard {} {} duplicate(s) already merged from another shard, including {}".format(
+                            shard_index, table_name, duplicate_keys
+                        )
+                    )
+            self._conn.execute(
+                """
+                INSERT INTO {table_name} BY NAME
+                SELECT * {exclude} FROM '{tmp_file_path}'
+                """.format(
+                    table_name=table_name,
+                    # error IDs are assigned on insert, as each shard numbers its errors from 1
+                    exclude="EXCLUDE (id)" if table_name == "errors" else "",
+                    tmp_file_path=tmp_file_path,
+                )
+            )
+            _logger.info(f"merged shard {shard_index} {table_name}")
+
+    async def _download_index_table(
+        self: Self,
+        source_reader: SourceReader,
+        manifest_json_uri: str,
+        index_manifest: IndexManifest,
+        table_name: str,
+        tmp_dir_path: str,
+    ) -> str:
+        if table_name not in index_manifest.tables:
+            raise ValueError(f"{table_name} table not present in index_manifest")
+        relative_path = index_manifest.tables[table_name].relative_path
+        tmp_file_path = path.join(tmp_dir_path, relative_path)
+        makedirs(path.dirname(tmp_file_path), exist_ok=True)
+        await source_reader.get_uri_to_file(
+            source_reader.path_separator().join(
+                manifest_json_uri.split(source_reader.path_separator())[:-1]
+                + [relative_path]
+            ),
+            tmp_file_path,
+        )
+        return tmp_file_path
+
+    async def _format_downloaded_items(
+        self: Self,
+        source_reader: SourceReader,
+        manifest_json_uri: str,
+        index_manifest: IndexManifest,
+        items_file_path: str,
+        tmp_dir_path: str,
+    ) -> str:
+        delta_file_paths: List[str] = []
+        for delta_metadata in index_manifest.item_deltas:
+            delta_file_path = path.join(tmp_dir_path, delta_metadata.relative_path)
+            makedirs(path.dirname(delta_file_path), exist_ok=True)
+            await source_reader.get_uri_to_file(
+                source_reader.path_separator().join(
+                    manifest_json_uri.split(source_reader.path_separator())[:-1]
+                    + [delta_metadata.relative_path]
+                ),
+                delta_file_path,
+            )
+            delta_file_paths.append(delta_file_path)
+        return format_items_with_deltas(
+            f"'{items_file_path}'",
+            [f"'{delta_file_path}'" for delta_file_path in delta_file_paths],
         )
 
     async def _index_stac_source(
         self: Self,
         root_catalog_uri: str,
         index_config: Optional[IndexConfig] = None,
+        shard: Optional[ShardMetadata] = None,
     ) -> Tuple[List[IndexingError], str]:
         _logger.info(f"indexing stac source for load {self._load_id}")
-        self._create_db_objects()
         index_config = index_config or IndexConfig()
-        add_items_columns(index_config, self._conn)
+        if not self._is_checkpointed(_tables_stage):
+            with self._transaction():
+                self._create_db_objects()
+                add_items_columns(index_config, self._conn)
+                self._checkpoint(_tables_stage)
         reader = StacCatalogReader(
             root_catalog_uri=root_catalog_uri,
             fixes_to_apply=index_config.fixes_to_apply,
         )
-        collections, collection_errors = await self._request_collections(reader)
-        items_errors = await self._request_items(index_config, reader, collections)
-        configure_indexables(index_config, self._conn)
-        self._log_index_event(root_catalog_uri=root_catalog_uri)
+        collection_errors: List[IndexingError] = []
+        items_errors: List[IndexingError] = []
+        if not self._is_checkpointed(_items_stage):
+            collections, collection_errors = await self._request_collections(
+                reader, shard
+            )
+            items_errors = await self._request_items(index_config, reader, collections)
+            self._checkpoint(_items_stage)
+        # indexables and history describe a complete index, so are configured when shards are merged
+        if shard is None and not self._is_checkpointed(_indexables_stage):
+            with self._transaction():
+                configure_indexables(index_config, self._conn)
+                self._log_index_event(root_catalog_uri=root_catalog_uri)
+                self._checkpoint(_indexables_stage)
         return (
             collection_errors + items_errors,
             self._export_db_objects(
                 root_catalog_uri=root_catalog_uri,
                 index_config=index_config,
+                shard=shard,
             ),
         )
 
@@ -117,40 +722,22 @@ class IndexCreator:
         self: Self,
         root_catalog_uri: Optional[str] = None,
         index_config: Optional[IndexConfig] = None,
+        shard: Optional[ShardMetadata] = None,
     ) -> str:
-        output_relative_dir = path.join(
-            "{}-{}".format(
-                self._creation_time.strftime("%Y-%m-%dT%H.%M.%S.%fZ"),
-                self._load_id,
-            )
-        )
-        output_base_dir = mkdtemp()
+        output_base_dir, output_relative_dir = self._create_output_directory()
         output_dir = path.join(output_base_dir, output_relative_dir)
-        try:
-            makedirs(output_dir, exist_ok=True)
-        except Exception:
-            _logger.exception(
-                f"unable to create index destination directory at '{output_dir}'"
-            )
-            raise
         manifest = IndexManifest(
             indexer_version=_indexer_version,
             updated=self._creation_time,
             load_id=self._load_id,
             root_catalog_uri=root_catalog_uri,
             index_config=index_config,
+            shard=shard,
         )
         for table_name in [
             row[0] for row in self._conn.execute("SHOW tables").fetchall()
         ]:
-            if table_name not in [
-                "collections",
-                "items",
-                "queryables_by_collection",
-                "sortables_by_collection",
-                "errors",
-                "index_history",
-            ]:
+            if table_name not in _exported_table_names:
                 continue
             table_filename = f"{table_name}.parquet"
             self._conn.execute(f"""
@@ -162,6 +749,37 @@ class IndexCreator:
             manifest.tables[table_name] = TableMetadata(
                 relative_path=path.join(output_relative_dir, table_filename),
             )
+        if self._export_database:
+            self._export_database_file(
+                path.join(output_dir, _database_filename),
+                list(manifest.tables.keys()),
+            )
+            manifest.database = DatabaseMetadata(
+                relative_path=path.join(output_relative_dir, _database_filename),
+            )
+        return self._write_manifest(output_base_dir, manifest)
+
+    def _create_output_directory(self: Self) -> Tuple[str, str]:
+        output_relative_dir = path.join(
+            "{}-{}".format(
+                self._creation_time.strftime("%Y-%m-%dT%H.%M.%S.%fZ"),
+                self._load_id,
+            )
+        )
+        output_base_dir = mkdtemp()
+        output_dir = path.join(output_base_dir, output_relative_dir)
+        try:
+            makedirs(output_dir, exist_ok=True)
+        except Exception:
+            _logger.exception(
+                f"unable to create index destination directory at '{output_dir}'"
+            )
+            raise
+        return (output_base_dir, output_relative_dir)
+
+    def _write_manifest(
+        self: Self, output_base_dir: str, manifest: IndexManifest
+    ) -> str:
         manifest_path = path.join(output_base_dir, "manifest.json")
         with open(manifest_path, "w") as f:
             dump(
@@ -171,32 +789,103 @@ class IndexCreator:
             )
         return manifest_path
 
+    def _export_database_file(
+        self: Self, database_path: str, table_names: List[str]
+    ) -> None:
+        # The API can attach this file in place of parquet files, avoiding remote parquet metadata
+        # requests and query planning across parquet files when a container starts.
+        _logger.info(f"exporting database to {database_path}")
+        self._conn.execute(f"ATTACH '{database_path}' AS {_database_alias}")
+        try:
+            for table_name in table_names:
+                self._conn.execute(
+                    """
+                    CREATE TABLE {alias}.{table_name} AS
+                    SELECT * FROM {table_name} {order}
+                """.format(
+                        alias=_database_alias,
+                        table_name=table_name,
+                        # rows stored in the default search order give the most selective min-max indexes
+                        order="ORDER BY collection_id, id"
+                        if table_name == "items"
+                        else "",
+                    )
+                )
+            for index_statement in [
+                "CREATE INDEX items_collection_id_id ON {alias}.items (collection_id, id)",
+                "CREATE INDEX items_geometry ON {alias}.items USING RTREE (geometry)",
+                "CREATE INDEX collections_id ON {alias}.collections (id)",
+            ]:
+                self._conn.execute(index_statement.format(alias=_database_alias))
+        finally:
+            self._conn.execute(f"DETACH {_database_alias}")
+
     async def _request_collections(
-        self: Self, reader: StacCatalogReader
+        self: Self,
+        reader: StacCatalogReader,
+        shard: Optional[ShardMetadata] = None,
     ) -> Tuple[List[Collection], List[IndexingError]]:
         collections, errors = await reader.get_collections(
             await reader.get_root_catalog()
         )
         _logger.info(f"discovered {len(collections)} collection(s)")
+        if shard is not None:
+            collections = [
+                collection
+                for collection in collections
+                if _get_shard_index(collection.id, shard.count) == shard.index
+            ]
+            _logger.info(
+                f"indexing {len(collections)} collection(s) in shard {shard.index} of {shard.count}"
+            )
+        if self._is_checkpointed(_collections_stage):
+            # collections were inserted by the run being resumed, only their item links are required
+            return (collections, [])
+        if self._checkpointing:
+            # removes any partial insertion by a run that stopped before completing this stage
+            self._conn.execute("DELETE FROM collections")
+            self._conn.execute("DELETE FROM errors")
         for collection in collections:
             insert_sql = """
                 INSERT INTO collections (
                     id
+                , title
+                , description
+                , keywords
+                , license
+                , geometry
+                , start_datetime
+                , end_datetime
                 , stac_location
                 , load_id
                 , collection_hash
                 ) VALUES (
-                    ?, ?, ?, ?
+                    ?, ?, ?, ?, ?, {geometry}, ?, ?, ?, ?, ?
                 );
             """
+            spatial_extent = self._get_collection_spatial_extent(collection)
+            start_datetime, end_datetime = self._get_collection_temporal_extent(
+                collection
+            )
             try:
                 self._conn.execute(
-                    insert_sql,
+                    insert_sql.format(
+                        geometry="ST_MakeEnvelope(?, ?, ?, ?)"
+                        if spatial_extent is not None
+                        else "NULL"
+                    ),
                     (
                         collection.id,
+                        collection.title,
+                        collection.description,
+                        collection.keywords,
+                        collection.license,
+                        *(spatial_extent or []),
+                        start_datetime,
+                        end_datetime,
                         collection.location,
                         self._load_id,
-                        self._hash_data(collection.to_json()),
+                        _hash_data(collection.to_json()),
                     ),
                 )
             except Exception as e:
@@ -208,13 +897,41 @@ class IndexCreator:
                     )
                 )
         self._insert_errors(errors)
+        self._checkpoint(_collections_stage)
         return (collections, errors)
 
+    def _get_collection_spatial_extent(
+        self: Self, collection: Collection
+    ) -> Optional[Tuple[float, float, float, float]]:
+        # the first bbox describes the overall extent, any others describe subsets of it
+        bboxes = collection.extent.spatial.bbox
+        if len(bboxes) == 0:
+            return None
+        bbox = bboxes[0]
+        if len(bbox) == 6:
+            x_min, y_min, x_max, y_max = bbox[0], bbox[1], bbox[3], bbox[4]
+        else:
+            x_min, y_min, x_max, y_max = bbox[0], bbox[1], bbox[2], bbox[3]
+        if x_min > x_max:
+            # extent crosses the antimeridian, index it as spanning all longitudes
+            x_min, x_max = -180, 180
+        return (x_min, y_min, x_max, y_max)
+
+    def _get_collection_temporal_extent(
+        self: Self, collection: Collection
+    ) -> Tuple[Optional[str], Optional[str]]:
+        # the first interval describes the overall extent, any others describe subsets of it
+        # RFC 3339 strings are cast to timestamps on insert
+        intervals = collection.extent.temporal.interval
+        if len(intervals) == 0:
+            return (None, None)
+        return (intervals[0][0], intervals[0][1])
+
     # Processing items is more complex than collections due to scale.
     # It is possible to have an enormous number of items (collections too, though this is less likely).
     # As a result it may not be sensible to assemble an in-memory list of all items to then iterate over and process.
-    # Instead we pass a processor function to the reader so that each item can be processed (i.e. inserted into a table)
-    # as it is retrieved.
+    # Instead we pass a row builder and an ingestor function to the reader so that each item can be processed
+    # (i.e. converted to a row in a parse worker, then inserted into a table) as it is retrieved.
     async def _request_items(
         self: Self,
         index_config: IndexConfig,
@@ -226,157 +943,355 @@ class IndexCreator:
             "invalid": 0,
             "failed": 0,
             "duplicates": 0,
+            "unchanged": 0,
         }
-        insert_fields_and_values_template = {
-            "id": "?",
-            "collection_id": "?",
-            "geometry": "ST_GeomFromText('{geometry_wkt}')",
-            "datetime": "?",
-            "start_datetime": "?",
-            "end_datetime": "?",
-            "stac_location": "?",
-            "applied_fixes": "?",
-            "load_id": "?",
-            "item_hash": "?",
+        item_column_types = {
+            row[0]: row[1] for row in self._conn.execute("DESCRIBE items").fetchall()
         }
-        for indexable in index_config.indexables.values():
-            insert_fields_and_values_template[indexable.table_column_name] = "?"
+        row_builder = _ItemRowBuilder(
+            load_id=self._load_id,
+            column_names=list(item_column_types.keys()),
+            indexables_by_collection=index_config.all_indexables_by_collection,
+        )
+        pending_rows: List[Dict[str, Any]] = []
 
-        def processor(item: ItemWithLocation) -> List[IndexingError]:
-            errors: List[IndexingError] = []
-            geometry: Geometry = wkt_loads(item.geometry.wkt)
-            if not geometry.is_valid:
-                errors.append(
-                    new_error(
-                        IndexingErrorType.item_validation,
-                        f"Invalid geometry for '{item.collection}'/'{item.id}': {is_valid_reason(geometry)}",
-                        subtype="invalid_geometry",
-                        collection=item.collection,
-                        item=item.id,
-                    )
+        def flush() -> List[IndexingError]:
+            rows = pending_rows.copy()
+            pending_rows.clear()
+            return self._insert_items(rows, item_column_types, counts)
+
+        # rows are built in parse workers, only insertion happens here
+        def ingestor(row: Dict[str, Any]) -> List[IndexingError]:
+            pending_rows.append(row)
+            if len(pending_rows) >= get_settings().insert_batch_size:
+                return flush()
+            return []
+
+        has_previous_source_versions = self._create_previous_source_versions()
+        pending_unchanged_uris: List[str] = []
+
+        def flush_unchanged() -> List[IndexingError]:
+            uris = pending_unchanged_uris.copy()
+            pending_unchanged_uris.clear()
+            return self._copy_previous_items(uris, item_column_types, counts)
+
+        def unchanged_ingestor(uri: str) -> List[IndexingError]:
+            pending_unchanged_uris.append(uri)
+            if len(pending_unchanged_uris) >= get_settings().insert_batch_size:
+                return flush_unchanged()
+            return []
+
+        checkpointed_errors: List[IndexingError] = []
+
+        # Once a collection's items are all inserted it is recorded as complete, so that a resumed run
+        # need not list its items again.
+        def collection_completed(
+            collection_id: str, collection_errors: List[IndexingError]
+        ) -> None:
+            collection_errors = collection_errors + flush() + flush_unchanged()
+            self._insert_errors(collection_errors)
+            checkpointed_errors.extend(collection_errors)
+            self._checkpoint(f"{_collection_stage_prefix}{collection_id}")
+
+        # Items inserted for incomplete collections by the run being resumed are not fetched again.
+        # They are looked up one collection at a time, and only for collections with inserted items.
+        partial_collection_ids: Set[str] = set()
+
+        def get_ingested_uris(collection_id: str) -> Set[str]:
+            if collection_id not in partial_collection_ids:
+                return set()
+            return {
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT stac_location FROM items WHERE collection_id = ?",
+                    [collection_id],
+                ).fetchall()
+            }
+
+        if self._checkpointing:
+            completed_collection_ids = self._get_completed_collection_ids()
+            if len(completed_collection_ids) > 0:
+                _logger.info(
+                    f"resuming with {len(completed_collection_ids)} collection(s) complete"
                 )
-                counts["invalid"] += 1
-                return errors
-
-            insert_params = [
-                item.id,
-                item.collection,
-                item.properties.datetime,
-                item.properties.start_datetime,
-                item.properties.end_datetime,
-                item.location,
-                ",".join(item.applied_fixes)
-                if item.applied_fixes is not None
-                else "NONE",
-                self._load_id,
-                self._hash_data(item.to_json()),
+            collections = [
+                collection
+                for collection in collections
+                if collection.id not in completed_collection_ids
             ]
-            for (
-                collection_id,
-                indexable_by_field_name,
-            ) in index_config.all_indexables_by_collection.items():
+            partial_collection_ids = {
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT DISTINCT collection_id FROM items"
+                ).fetchall()
+            } - completed_collection_ids
+        errors = await reader.process_items(
+            collections,
+            row_builder,
+            ingestor,
+            get_previous_source_versions=self._get_previous_source_versions
+            if has_previous_source_versions
+            else None,
+            unchanged_ingestor=unchanged_ingestor,
+            get_ingested_uris=get_ingested_uris if self._checkpointing else None,
+            collection_completed=collection_completed if self._checkpointing else None,
+        )
+        errors.extend(flush())
+        errors.extend(flush_unchanged())
+        self._insert_errors(errors)
+        errors = checkpointed_errors + errors
+        counts["invalid"] = len(
+            [error for error in errors if error.subtype == "invalid_geometry"]
+        )
+        _logger.info(counts)
+        return errors
+
+    def _get_completed_collection_ids(self: Self) -> Set[str]:
+        return {
+            row[0][len(_collection_stage_prefix) :]
+            for row in self._conn.execute(
+                "SELECT stage FROM checkpoints WHERE starts_with(stage, ?)",
+                [_collection_stage_prefix],
+            ).fetchall()
+        }
+
+    def _is_checkpointed(self: Self, stage: str) -> bool:
+        if not self._checkpointing:
+            return False
+        return (
+            self._conn.execute(
+                "SELECT COUNT(*) FROM checkpoints WHERE stage = ?", [stage]
+            ).fetchone()[0]
+            > 0
+        )
+
+    def _checkpoint(self: Self, stage: str) -> None:
+        if self._checkpointing:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?)",
+                [stage, _current_time()],
+            )
+
+    @contextmanager
+    def _transaction(self: Self) -> Iterator[None]:
+        # stages whose statements are not expected to fail are checkpointed atomically
+        if not self._checkpointing:
+            yield
+            return
+        self._conn.begin()
+        try:
+            yield
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    def _create_previous_source_versions(self: Self) -> bool:
+        # Only available when updating an index that recorded source versions.
+        # Items whose source objects are unchanged are copied from the previous index rather than fetched.
+        # Versions are looked up one collection at a time, so that they need not all be held in memory.
+        # Rows are ordered by collection so that each lookup reads only that collection's row groups.
+        if not get_settings().incremental_update:
+            return False
+        if (
+            self._conn.execute(
+                """
+                SELECT COUNT(*)
+                  FROM duckdb_columns()
+                 WHERE table_name = 'items_previous'
+                   AND column_name = 'source_version'
+                """
+            ).fetchone()[0]
+            == 0
+        ):
+            return False
+        self._conn.execute(
+            """
+            CREATE OR REPLACE TABLE previous_source_versions AS
+            SELECT collection_id, stac_location, source_version
+              FROM items_previous
+             WHERE source_version IS NOT NULL
+          ORDER BY collection_id
+            """
+        )
+        return True
+
+    def _get_previous_source_versions(self: Self, collection_id: str) -> Dict[str, str]:
+        return {
+            row[0]: row[1]
+            for row in self._conn.execute(
+                """
+                SELECT stac_location, source_version
+                  FROM previous_source_versions
+                 WHERE collection_id = ?
+                """,
+                [collection_id],
+            ).fetchall()
+        }
+
+    def _copy_previous_items(
+        self: Self,
+        stac_locations: List[str],
+        item_column_types: Dict[str, str],
+        counts: Dict[str, int],
+    ) -> List[IndexingError]:
+        if len(stac_locations) == 0:
+            return []
+        previous_column_types = {
+            row[0]: row[1]
+            for row in self._conn.execute("DESCRIBE items_previous").fetchall()
+        }
+        try:
+            copied = self._conn.execute(
+                """
+                INSERT OR IGNORE INTO items ({columns})
+                SELECT {values}
+                  FROM items_previous
+                 WHERE stac_location IN (SELECT unnest(from_json(?, '["VARCHAR"]')))
+                """.format(
+                    columns=", ".join(item_column_types.keys()),
+                    values=", ".join(
+                        [
+                            # geometries are read from parquet as WKB if not recognised as GeoParquet
+                            f"ST_GeomFromWKB({column_name})"
+                            if column_type == "GEOMETRY"
+                            and previous_column_types.get(column_name) == "BLOB"
+                            else column_name
+                            for column_name, column_type in item_column_types.items()
+                        ]
+                    ),
+                ),
+                [dumps(stac_locations)],
+            ).fetchone()[0]
+        except Exception as e:
+            counts["failed"] += len(stac_locations)
+            return [
+                new_error(
+                    IndexingErrorType.unknown,
+                    f"failed to copy {len(stac_locations)} unchanged item(s) from the previous index: {e}",
+                )
+            ]
+        counts["unchanged"] += copied
+        return []
+
+    def _insert_items(
+        self: Self,
+        rows: List[Dict[str, Any]],
+        item_column_types: Dict[str, str],
+        counts: Dict[str, int],
+    ) -> List[IndexingError]:
+        # A batch is bound as a single JSON parameter, avoiding a statement parse and a parameter
+        # bind per value. Geometries are bound as hex-encoded WKB.
+        if len(rows) == 0:
+            return []
+        try:
+            self._conn.execute(
+                """
+                INSERT INTO items ({columns})
+                SELECT {values}
+                  FROM (SELECT unnest(from_json_strict(?, ?)) AS item)
+                """.format(
+                    columns=", ".join(item_column_types.keys()),
+                    values=", ".join(
+                        [
+                            f"ST_GeomFromHEXWKB(item.{column_name})"
+                            if column_type == "GEOMETRY"
+                            else f"item.{column_name}"
+                            for column_name, column_type in item_column_types.items()
+                        ]
+                    ),
+                ),
+                [
+                    dumps(rows, default=_json_default),
+                    dumps(
+                        [
+                            {
+                                column_name: "VARCHAR"
+                                if column_type == "GEOMETRY"
+                                else column_type
+                                for column_name, column_type in item_column_types.items()
+                            }
+                        ]
+                    ),
+                ],
+            )
+            counts["inserted"] += len(rows)
+            return []
+        except Exception as e:
+            if len(rows) > 1:
+                # a batch fails as a whole, insert its rows individually to attribute the failure
+                return [
+                    error
+                    for row in rows
+                    for error in self._insert_items([row], item_column_types, counts)
+                ]
+            item_id, collection_id = rows[0]["id"], rows[0]["collection_id"]
+            if isinstance(e, ConstraintException) and "duplicate key" in str(e).lower():
+                counts["duplicates"] += 1
+                # an item URI listed by more than one collection is fetched for each, but is not an error
                 if (
-                    collection_id == collection_wildcard
-                    or collection_id == item.collection
+                    rows[0].get("stac_location") is not None
+                    and self._conn.execute(
+                        """
+                        SELECT 1
+                          FROM items
+                         WHERE collection_id = ? AND id = ? AND stac_location = ?
+                        """,
+                        [collection_id, item_id, rows[0]["stac_location"]],
+                    ).fetchone()
+                    is not None
                 ):
-                    for field_name, indexable in indexable_by_field_name.items():
-                        insert_param = None
-                        for path_option in indexable.json_path.split("|"):
-                            # where multiple JSON paths are possible accept the first that is not-None
-                            path_parts = path_option.split(".")
-                            path_parents, path_key = path_parts[:-1], path_parts[-1:][0]
-                            param_source = item.to_dict()
-                            for parent_part in path_parents:
-                                try:
-                                    param_source = param_source[parent_part]
-                                except KeyError:
-                                    break
-                            try:
-                                insert_param = param_source[path_key]
-                                break
-                            except KeyError:
-                                pass
-                        if insert_param is None:
-                            errors.append(
-                                new_error(
-                                    IndexingErrorType.item_validation,
-                                    "could not locate path '{}' for field '{}' in '{}'/'{}'".format(
-                                        indexable.json_path,
-                                        field_name,
-                                        item.collection,
-                                        item.id,
-                                    ),
-                                    collection=item.collection,
-                                    item=item.id,
-                                )
-                            )
-                        else:
-                            insert_params.append(insert_param)
-            try:
-                self._conn.execute(
-                    "INSERT INTO items ({}) VALUES ({})".format(
-                        ", ".join(insert_fields_and_values_template.keys()),
-                        ", ".join(insert_fields_and_values_template.values()),
-                    ).format(geometry_wkt=item.geometry.wkt),
-                    insert_params,
-                )
-                counts["inserted"] += 1
-            except ConstraintException as e:
-                if "duplicate key" in str(e).lower():
-                    errors.append(
-                        new_error(
-                            IndexingErrorType.item_validation,
-                            f"duplicate in '{item.collection}'/'{item.id}'",
-                            collection=item.collection,
-                            item=item.id,
-                        )
-                    )
-                    counts["duplicates"] += 1
-                else:
-                    raise  # defer to generic handler
-            except Exception as e:
-                errors.append(
+                    return []
+                return [
                     new_error(
-                        IndexingErrorType.unknown,
-                        f"failed to insert into '{item.collection}'/'{item.id}': {e}",
-                        collection=item.collection,
-                        item=item.id,
+                        IndexingErrorType.item_validation,
+                        f"duplicate in '{collection_id}'/'{item_id}'",
+                        collection=collection_id,
+                        item=item_id,
                     )
+                ]
+            counts["failed"] += 1
+            return [
+                new_error(
+                    IndexingErrorType.unknown,
+                    f"failed to insert into '{collection_id}'/'{item_id}': {e}",
+                    collection=collection_id,
+                    item=item_id,
                 )
-                counts["failed"] += 1
-            return errors
+            ]
 
-        errors = await reader.process_items(collections, processor)
-        self._insert_errors(errors)
-        _logger.info(counts)
-        return errors
+    def _reject_upserted_key_conflicts(
+        self: Self, counts: Dict[str, int]
+    ) -> List[IndexingError]:
+        # Deltas are keyed by location, so an upserted item with the key of an item at another
+        # location would present two rows for one item, unless that location is deleted.
+        conflicts = self._conn.execute(
+            """
+            DELETE FROM items
+             WHERE EXISTS (
+                SELECT 1
+                  FROM items_current
+                 WHERE items_current.collection_id = items.collection_id
+                   AND items_current.id = items.id
+                   AND items_current.stac_location != items.stac_location
+                   AND items_current.stac_location NOT IN (SELECT stac_location FROM item_delta_deletes)
+             )
+         RETURNING collection_id, id
+            """
+        ).fetchall()
+        counts["inserted"] -= len(conflicts)
+        counts["duplicates"] += len(conflicts)
+        return [
+            new_error(
+                IndexingErrorType.item_validation,
+                f"duplicate in '{collection_id}'/'{item_id}'",
+                collection=collection_id,
+                item=item_id,
+            )
+            for collection_id, item_id in conflicts
+        ]
 
     def _log_index_event(self: Self, root_catalog_uri: str) -> None:
-        insert_sql_template = """
-        INSERT INTO index_history (
-            id
-            , start_time
-            , end_time
-            , root_catalog_uris
-            , items_loaded
-            , items_added
-            , items_removed
-            , items_updated
-            , items_unchanged
-            , collections_loaded
-            , collections_added
-            , collections_removed
-            , collections_updated
-            , collections_unchanged
-        )
-        VALUES (?, ?, ?, ?, {items_loaded}, {items_added}, {items_removed}, {items_updated}, {items_unchanged}, {collections_loaded}, {collections_added}, {collections_removed}, {collections_updated}, {collections_unchanged})
-        """
-        insert_sql_args = (
-            self._load_id,
-            self._creation_time,
-            _current_time(),
-            [root_catalog_uri],
-        )
         history_tables = (
             "items_previous",
             "collections_previous",
@@ -400,56 +1315,35 @@ class IndexCreator:
             )
             # these statements will need updating if we support multi-catalog indexing where individual catalogs can be updated separately
             # right now we can assume that the items and collections tables represent all source data and therefore don't need to check load IDs or catalogs
-            insert_sql = insert_sql_template.format(
+            item_changes = _format_changes_query(
+                "items", ["collection_id", "id"], "item_hash", ["stac_location"]
+            )
+            collection_changes = _format_changes_query(
+                "collections", ["id"], "collection_hash"
+            )
+            counts = {
+                **self._count_changes("items", item_changes),
+                **self._count_changes("collections", collection_changes),
+            }
+            if get_settings().export_item_changes:
+                # unchanged items are omitted, consumers only need to act on changes
+                self._conn.execute(
+                    f"""
+                    CREATE OR REPLACE TABLE item_changes AS
+                    SELECT *
+                      FROM ({item_changes})
+                     WHERE change != 'unchanged'
+                    """
+                )
+            self._insert_index_history(
+                root_catalog_uri,
                 items_loaded="(SELECT COUNT(*) FROM items)",
-                items_added=""" (
-                SELECT COUNT(*)
-                  FROM items
-                 WHERE CONCAT(collection_id, '.', id) NOT IN (SELECT CONCAT(collection_id, '.', id) FROM items_previous)
-                ) """,
-                items_removed=""" (
-                SELECT COUNT(*)
-                  FROM items_previous
-                 WHERE CONCAT(collection_id, '.', id) NOT IN (SELECT CONCAT(collection_id, '.', id) FROM items)
-                ) """,
-                items_updated=""" (
-                SELECT COUNT(*)
-                  FROM items i
-            INNER JOIN items_previous ip ON CONCAT(i.collection_id, '.', i.id) = CONCAT(ip.collection_id, '.', ip.id)
-                   AND i.item_hash != ip.item_hash
-                ) """,
-                items_unchanged=""" (
-                SELECT COUNT(*)
-                  FROM items i
-            INNER JOIN items_previous ip ON CONCAT(i.collection_id, '.', i.id) = CONCAT(ip.collection_id, '.', ip.id)
-                   AND i.item_hash = ip.item_hash
-                ) """,
                 collections_loaded="(SELECT COUNT(*) FROM collections)",
-                collections_added=""" (
-                SELECT COUNT(*)
-                  FROM collections
-                 WHERE id NOT IN (SELECT id FROM collections_previous)
-                ) """,
-                collections_removed=""" (
-                SELECT COUNT(*)
-                  FROM collections_previous
-                 WHERE id NOT IN (SELECT id FROM collections)
-                ) """,
-                collections_updated=""" (
-                SELECT COUNT(*)
-                  FROM collections c
-            INNER JOIN collections_previous cp ON c.id = cp.id
-                   AND c.collection_hash != cp.collection_hash
-                ) """,
-                collections_unchanged=""" (
-                SELECT COUNT(*)
-                  FROM collections c
-            INNER JOIN collections_previous cp ON c.id = cp.id
-                   AND c.collection_hash = cp.collection_hash
-                ) """,
+                **counts,
             )
         else:
-            insert_sql = insert_sql_template.format(
+            self._insert_index_history(
+                root_catalog_uri,
                 items_loaded="(SELECT COUNT(*) FROM items)",
                 items_added="(SELECT COUNT(*) FROM items)",
                 items_removed=0,
@@ -461,14 +1355,86 @@ class IndexCreator:
                 collections_updated=0,
                 collections_unchanged=0,
             )
+
+    def _log_item_events(self: Self, root_catalog_uri: str) -> None:
+        # Items not upserted or deleted by the events are unchanged, and all collections are.
+        current_count, updated_count, added_count, removed_count = self._conn.execute(
+            """
+            SELECT (SELECT COUNT(*) FROM items_current)
+                 , (SELECT COUNT(*) FROM items WHERE stac_location IN (SELECT stac_location FROM items_current))
+                 , (SELECT COUNT(*) FROM items WHERE stac_location NOT IN (SELECT stac_location FROM items_current))
+                 , (SELECT COUNT(*) FROM items_current WHERE stac_location IN (SELECT stac_location FROM item_delta_deletes))
+            """
+        ).fetchone()
+        self._insert_index_history(
+            root_catalog_uri,
+            items_loaded=current_count + added_count - removed_count,
+            items_added=added_count,
+            items_removed=removed_count,
+            items_updated=updated_count,
+            items_unchanged=current_count - updated_count - removed_count,
+            collections_loaded="(SELECT COUNT(*) FROM collections)",
+            collections_added=0,
+            collections_removed=0,
+            collections_updated=0,
+            collections_unchanged="(SELECT COUNT(*) FROM collections)",
+        )
+
+    def _insert_index_history(
+        self: Self, root_catalog_uri: Optional[str], **counts: Any
+    ) -> None:
+        # counts are each a number or a SQL expression
+        insert_sql_template = """
+        INSERT INTO index_history (
+            id
+            , start_time
+            , end_time
+            , root_catalog_uris
+            , items_loaded
+            , items_added
+            , items_removed
+            , items_updated
+            , items_unchanged
+            , collections_loaded
+            , collections_added
+            , collections_removed
+            , collections_updated
+            , collections_unchanged
+        )
+        VALUES (?, ?, ?, ?, {items_loaded}, {items_added}, {items_removed}, {items_updated}, {items_unchanged}, {collections_loaded}, {collections_added}, {collections_removed}, {collections_updated}, {collections_unchanged})
+        """
+        insert_sql_args = (
+            self._load_id,
+            self._creation_time,
+            _current_time(),
+            [root_catalog_uri],
+        )
         try:
-            self._conn.execute(insert_sql, insert_sql_args)
+            self._conn.execute(insert_sql_template.format(**counts), insert_sql_args)
         except ConstraintException:
             _logger.exception(
                 "invalid load counts. ?_loaded is not the sum of all other counts"
             )
             raise
 
+    def _count_changes(self: Self, table_name: str, changes: str) -> Dict[str, int]:
+        change_types = ["added", "removed", "updated", "unchanged"]
+        row = self._conn.execute(
+            "SELECT {} FROM ({})".format(
+                ", ".join(
+                    [
+                        f"count_if(change = '{change_type}')"
+                        for change_type in change_types
+                    ]
+                ),
+                changes,
+            )
+        ).fetchone()
+        return {
+            f"{table_name}_{change_type}": count
+            for change_type, count in zip(change_types, row)
+        }
+
     def _insert_errors(self: Self, errors: list[IndexingError]) -> None:
         for error in errors:
             try:
@@ -476,36 +1442,50 @@ class IndexCreator:
             except Exception as e:
                 _logger.exception("failed to insert indexing error: {}".format(e))
 
-    async def _load_existing_index(self: Self, manifest_json_uri: str) -> IndexManifest:
-        source_reader = get_reader_for_uri(uri=manifest_json_uri)
-        index_reader = source_reader.get_index_reader(
+    async def _get_compatible_index_manifest(
+        self: Self, source_reader: SourceReader, manifest_json_uri: str
+    ) -> IndexManifest:
+        index_manifest = await source_reader.get_index_reader(
             index_manifest_uri=manifest_json_uri
-        )
-        index_manifest = await index_reader.get_index_manifest()
+        ).get_index_manifest()
         if index_manifest.indexer_version != _indexer_version:
             raise Exception(
                 f"indexer v{_indexer_version} incompatible with manifest from v{index_manifest.indexer_version}"
             )
+        return index_manifest
+
+    async def _load_existing_index(self: Self, manifest_json_uri: str) -> IndexManifest:
+        source_reader = get_reader_for_uri(uri=manifest_json_uri)
+        index_manifest = await self._get_compatible_index_manifest(
+            source_reader, manifest_json_uri
+        )
+        if self._is_checkpointed(_previous_index_stage):
+            return index_manifest
         tmp_dir_path = mkdtemp()
         for table_name in ["collections", "items", "index_history"]:
-            if table_name not in index_manifest.tables:
-                raise ValueError(f"{table_name} table not present in index_manifest")
-            relative_path = index_manifest.tables[table_name].relative_path
-            tmp_file_path = path.join(tmp_dir_path, relative_path)
-            makedirs(path.dirname(tmp_file_path), exist_ok=True)
-            await source_reader.get_uri_to_file(
-                source_reader.path_separator().join(
-                    manifest_json_uri.split(source_reader.path_separator())[:-1]
-                    + [relative_path]
-                ),
-                tmp_file_path,
+            tmp_file_path = await self._download_index_table(
+                source_reader,
+                manifest_json_uri,
+                index_manifest,
+                table_name,
+                tmp_dir_path,
             )
             previous_table_name = f"{table_name}_previous"
             _logger.info(f"creating {previous_table_name} from {tmp_file_path}")
+            # previous items include any item deltas applied since the index was created
+            source = (
+                await self._format_downloaded_items(
+                    source_reader,
+                    manifest_json_uri,
+                    index_manifest,
+                    tmp_file_path,
+                    tmp_dir_path,
+                )
+                if table_name == "items"
+                else f"'{tmp_file_path}'"
+            )
             self._conn.execute(
-                f"CREATE TABLE {previous_table_name} AS SELECT * FROM '{tmp_file_path}'"
+                f"CREATE OR REPLACE TABLE {previous_table_name} AS SELECT * FROM {source}"
             )
+        self._checkpoint(_previous_index_stage)
         return index_manifest
-
-    def _hash_data(self: Self, data_str: str) -> str:
-        return md5(data_str.encode()).hexdigest()
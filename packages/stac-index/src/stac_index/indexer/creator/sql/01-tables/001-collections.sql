@@ -1,5 +1,12 @@
 CREATE TABLE collections (
     id VARCHAR PRIMARY KEY,
+    title VARCHAR,
+    description VARCHAR,
+    keywords VARCHAR[],
+    license VARCHAR,
+    geometry GEOMETRY,  /* overall spatial extent of the collection */
+    start_datetime TIMESTAMPTZ,  /* overall temporal extent of the collection, NULL if open */
+    end_datetime TIMESTAMPTZ,
     stac_location VARCHAR NOT NULL,
     load_id VARCHAR(32) NOT NULL,
     collection_hash VARCHAR NOT NULL,
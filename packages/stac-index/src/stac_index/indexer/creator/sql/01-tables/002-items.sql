@@ -9,5 +9,6 @@ CREATE TABLE items (
     applied_fixes VARCHAR,
     load_id VARCHAR(32) NOT NULL,
     item_hash VARCHAR NOT NULL,
+    source_version VARCHAR,  /* identifies the version of the source object, so that unchanged items need not be fetched again on update */
     PRIMARY KEY (collection_id, id),
 );
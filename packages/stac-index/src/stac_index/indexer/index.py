@@ -1,13 +1,14 @@
 from asyncio import gather, run
-from json import load
+from json import load, loads
 from logging import Logger, getLogger
 from os import path
-from typing import Final, List, Optional, Tuple
+from typing import Final, List, Optional, Tuple, cast
 
 from stac_index.indexer.creator.creator import IndexCreator
 from stac_index.indexer.types.index_config import IndexConfig
-from stac_index.indexer.types.index_manifest import IndexManifest
+from stac_index.indexer.types.index_manifest import IndexManifest, ShardMetadata
 from stac_index.indexer.types.indexing_error import IndexingError
+from stac_index.indexer.types.item_delta import ItemEvent
 from stac_index.io.writers import get_writer_for_uri
 
 _logger: Final[Logger] = getLogger(__name__)
@@ -18,7 +19,30 @@ def execute(
     manifest_json_uri: Optional[str] = None,
     index_config_path: Optional[str] = None,
     publish_uri: Optional[str] = None,
+    export_database: bool = False,
+    load_id: Optional[str] = None,
+    shard_index: Optional[int] = None,
+    shard_count: Optional[int] = None,
+    merge_shard_manifest_json_uris: Optional[List[str]] = None,
+    item_events_path: Optional[str] = None,
+    compact: bool = False,
 ):
+    if item_events_path is not None or compact:
+        if manifest_json_uri is None:
+            raise ValueError("item_events and compact require manifest_json_uri")
+        if item_events_path is not None and compact:
+            raise ValueError("item_events and compact are mutually exclusive")
+        if shard_index is not None or merge_shard_manifest_json_uris is not None:
+            raise ValueError("item_events and compact cannot be used with shards")
+    if merge_shard_manifest_json_uris is not None:
+        if root_catalog_uri is not None or index_config_path is not None:
+            raise ValueError(
+                "merge_shard_manifest_json_uris is mutually exclusive with root_catalog_uri and index_config"
+            )
+        if shard_index is not None or shard_count is not None:
+            raise ValueError("shards cannot be merged by a shard")
+    elif (shard_index is None) != (shard_count is None):
+        raise ValueError("shard_index and shard_count must be provided together")
     if root_catalog_uri is not None:
         if manifest_json_uri is not None:
             raise ValueError(
@@ -29,7 +53,11 @@ def execute(
             raise ValueError(
                 "manifest_json_uri and index_config are mutually exclusive"
             )
-    if root_catalog_uri is None and manifest_json_uri is None:
+    if (
+        root_catalog_uri is None
+        and manifest_json_uri is None
+        and merge_shard_manifest_json_uris is None
+    ):
         raise ValueError(
             "Either root_catalog_uri or manifest_json_uri must be provided"
         )
@@ -38,6 +66,14 @@ def execute(
             root_catalog_uri=root_catalog_uri,
             manifest_json_uri=manifest_json_uri,
             index_config_path=index_config_path,
+            export_database=export_database,
+            load_id=load_id,
+            shard=ShardMetadata(index=shard_index, count=shard_count)
+            if shard_index is not None and shard_count is not None
+            else None,
+            merge_shard_manifest_json_uris=merge_shard_manifest_json_uris,
+            item_events_path=item_events_path,
+            compact=compact,
         )
     )
     if len(errors) > 0:
@@ -53,8 +89,29 @@ async def _call_process(
     root_catalog_uri: Optional[str] = None,
     manifest_json_uri: Optional[str] = None,
     index_config_path: Optional[str] = None,
+    export_database: bool = False,
+    load_id: Optional[str] = None,
+    shard: Optional[ShardMetadata] = None,
+    merge_shard_manifest_json_uris: Optional[List[str]] = None,
+    item_events_path: Optional[str] = None,
+    compact: bool = False,
 ) -> Tuple[List[IndexingError], str]:
-    index_creator = IndexCreator()
+    index_creator = IndexCreator(export_database=export_database, load_id=load_id)
+    if item_events_path is not None:
+        with open(item_events_path, "r") as f:
+            events = [ItemEvent(**loads(line)) for line in f if line.strip() != ""]
+        return await index_creator.apply_item_events(
+            manifest_json_uri=cast(str, manifest_json_uri), events=events
+        )
+    if compact:
+        return await index_creator.compact_index(
+            manifest_json_uri=cast(str, manifest_json_uri)
+        )
+    if merge_shard_manifest_json_uris is not None:
+        return await index_creator.merge_shards(
+            shard_manifest_json_uris=merge_shard_manifest_json_uris,
+            manifest_json_uri=manifest_json_uri,
+        )
     if root_catalog_uri is not None:
         if index_config_path is not None:
             with open(index_config_path, "r") as f:
@@ -63,10 +120,12 @@ async def _call_process(
         else:
             index_config = None
         return await index_creator.create_new_index(
-            root_catalog_uri=root_catalog_uri, index_config=index_config
+            root_catalog_uri=root_catalog_uri, index_config=index_config, shard=shard
         )
     elif manifest_json_uri is not None:
-        return await index_creator.update_index(manifest_json_uri=manifest_json_uri)
+        return await index_creator.update_index(
+            manifest_json_uri=manifest_json_uri, shard=shard
+        )
     raise Exception("No useable arguments provided")
 
 
@@ -78,8 +137,16 @@ async def _publish_index(manifest_path: str, publish_uri: str) -> None:
     with open(manifest_path, "r") as f:
         index_manifest = IndexManifest(**load(f))
     table_uploads = []
-    for metadata in index_manifest.tables.values():
+    for metadata in (
+        list(index_manifest.tables.values())
+        + index_manifest.item_deltas
+        + ([index_manifest.database] if index_manifest.database is not None else [])
+    ):
         table_file_path = path.join(path.dirname(manifest_path), metadata.relative_path)
+        if not path.exists(table_file_path):
+            # an index with an added item delta references files published by earlier runs
+            _logger.info(f"{metadata.relative_path} not created by this run, skipping")
+            continue
         target_uri = "{}{}".format(publish_uri, metadata.relative_path)
         table_uploads.append(source_writer.put_file_to_uri(table_file_path, target_uri))
     await gather(*table_uploads)
@@ -120,10 +187,58 @@ if __name__ == "__main__":
         default=None,
         help="Optional URI for index publish location",
     )
+    parser.add_argument(
+        "--export_database",
+        action="store_true",
+        help="Optionally export a DuckDB database file containing all index tables, in addition to Parquet files",
+    )
+    parser.add_argument(
+        "--load_id",
+        type=str,
+        default=None,
+        help="Optional load ID of a checkpointed run to resume, requires STAC_INDEX_INDEXER_CHECKPOINT_DIRECTORY. The same catalog or manifest arguments must be provided",
+    )
+    parser.add_argument(
+        "--shard_index",
+        type=int,
+        default=None,
+        help="Optional zero-based index of the shard to create, requires --shard_count. A shard indexes a subset of collections and must be merged with the other shards before use",
+    )
+    parser.add_argument(
+        "--shard_count",
+        type=int,
+        default=None,
+        help="Optional number of shards the catalog is divided into, requires --shard_index",
+    )
+    parser.add_argument(
+        "--merge_shard_manifests",
+        type=str,
+        nargs="+",
+        default=None,
+        help=f"Optional URIs for the JSON manifests of every shard of an indexing run, to merge into a complete index. Not compatible with {root_catalog_uri_key}. {manifest_json_uri_key} optionally references the index the shards update",
+    )
+    parser.add_argument(
+        "--item_events",
+        type=str,
+        default=None,
+        help=f"Optional path to a JSON lines file of item events, each with a type of 'upsert' or 'delete' and an item uri, to apply to the index referenced by {manifest_json_uri_key} as an item delta",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help=f"Optionally create an index with the item deltas of the index referenced by {manifest_json_uri_key} applied to its items table",
+    )
     args = parser.parse_args()
     execute(
         root_catalog_uri=args.root_catalog_uri,
         manifest_json_uri=args.manifest_json_uri,
         index_config_path=args.index_config,
         publish_uri=args.publish_to_uri,
+        export_database=args.export_database,
+        load_id=args.load_id,
+        shard_index=args.shard_index,
+        shard_count=args.shard_count,
+        merge_shard_manifest_json_uris=args.merge_shard_manifests,
+        item_events_path=args.item_events,
+        compact=args.compact,
     )
@@ -12,6 +12,27 @@ class _Settings(BaseSettings):
     test_collection_item_limit: Optional[int] = None
     test_collection_limit: Optional[int] = None
     max_concurrency: int = 10
+    # maximum number of item URIs, and of fetched items, waiting to be processed at any time
+    item_queue_size: int = 1000
+    # items are inserted into the index in batches of this size
+    insert_batch_size: int = 1000
+    # number of processes parsing and validating items, 0 parses in the indexing process, worker processes require
+    # multiprocessing support that some environments lack, e.g. AWS Lambda has no /dev/shm
+    parse_workers: int = 0
+    # maximum number of fetched items sent to a parse worker at once
+    parse_batch_size: int = 100
+    # when updating an index, copy items whose source objects are unchanged rather than fetching them again
+    incremental_update: bool = True
+    # export an item_changes table of items added, removed, or updated since the previous index
+    export_item_changes: bool = False
+    # directory for resumable runs' working databases, runs are held in memory and cannot be resumed if not set
+    checkpoint_directory: Optional[str] = None
+    # directory for a working database file, removed when the run ends, so that the index need not fit in memory
+    working_directory: Optional[str] = None
+    # DuckDB memory limit, e.g. "4GB", beyond which work spills to the temporary directory
+    memory_limit: Optional[str] = None
+    # directory for DuckDB to spill to when the memory limit is reached
+    temp_directory: Optional[str] = None
 
 
 @lru_cache(maxsize=1)
@@ -1,9 +1,30 @@
-from asyncio import Semaphore, gather
+from asyncio import (
+    Queue,
+    Semaphore,
+    TaskGroup,
+    create_task,
+    gather,
+    get_running_loop,
+)
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from json import loads
 from logging import Logger, getLogger
+from multiprocessing import get_context
 from re import Pattern, compile, sub
-from threading import Lock
-from typing import Any, Callable, Dict, Final, List, Protocol, Tuple, Type, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Final,
+    List,
+    Optional,
+    Protocol,
+    Set,
+    Tuple,
+    Type,
+    cast,
+)
 
 from stac_index.indexer.settings import get_settings
 from stac_index.indexer.stac_parser import StacParser, StacParserException
@@ -23,10 +44,18 @@ class _HasLinks(Protocol):
     links: Links
 
 
+ItemRow = Dict[str, Any]
+ItemParseResult = Tuple[Optional[ItemRow], List[IndexingError]]
+# Converts an item to a row for insertion, or to errors. Runs in parse worker processes, so must be picklable.
+ItemRowBuilder = Callable[[ItemWithLocation], ItemParseResult]
+
 _settings: Final = get_settings()
 _logger: Final[Logger] = getLogger(__name__)
-_item_processor_mutex: Final[Lock] = Lock()
 _link_strip_regex: Final[Pattern] = compile(r"[^/]+$")
+# catalog traversal progress is logged each time this many child links have been followed
+_child_progress_interval: Final[int] = 100
+_worker_parser: Optional[StacParser] = None
+_worker_row_builder: Optional[ItemRowBuilder] = None
 _child_types_by_lower_type: Final[Dict[str, Type[_HasLinks]]] = {
     "catalog": Catalog,
     "collection": Collection,
@@ -85,160 +114,365 @@ class StacCatalogReader:
         collections: List[CollectionWithLocation] = []
         errors: List[IndexingError] = []
 
-        child_links_all: List[str] = [
-            link.href
-            for link in root_catalog.links.link_iterator()
-            if link.rel == "child"
-        ]
-        child_links_followed: List[str] = []
+        child_links_queue: Queue[str] = Queue()
+        child_links_seen: Set[str] = set()
+        counts: Dict[str, int] = {"followed": 0}
 
-        # child_links_all can grow as nested catalogs or collections are discovered.
-        # Repeatedly process the list until no more links are added.
-        while len(set(child_links_all).difference(set(child_links_followed))) > 0:
-            for child_link in set(child_links_all).difference(
-                set(child_links_followed)
-            ):
-                child_links_followed.append(child_link)
-                try:
-                    child_dict = await self._get_json_content_from_uri(child_link)
-                except Exception as e:
-                    errors.append(
-                        new_error(
-                            IndexingErrorType.collection_parsing,
-                            "Could not read or parse child JSON at '{}': {}".format(
-                                child_link, e
-                            ),
-                        )
+        def enqueue(links_provider: _HasLinks) -> int:
+            # Links are only followed once, however many catalogs link to them.
+            # The queue is unbounded, as workers are also its producers and could otherwise block each other.
+            added = 0
+            for link in links_provider.links.link_iterator():
+                if link.rel == "child" and link.href not in child_links_seen:
+                    child_links_seen.add(link.href)
+                    child_links_queue.put_nowait(link.href)
+                    added += 1
+            return added
+
+        async def follow(child_link: str) -> None:
+            try:
+                child_dict = await self._get_json_content_from_uri(child_link)
+            except Exception as e:
+                errors.append(
+                    new_error(
+                        IndexingErrorType.collection_parsing,
+                        "Could not read or parse child JSON at '{}': {}".format(
+                            child_link, e
+                        ),
                     )
-                    continue
-                child_type = str(child_dict.get("type", "_unknown_")).lower()
-                if child_type not in _child_types_by_lower_type:
-                    errors.append(
-                        new_error(
-                            IndexingErrorType.collection_parsing,
-                            "Did not recognise child type at '{}': {}".format(
-                                child_link, child_type
-                            ),
-                        )
+                )
+                return
+            child_type = str(child_dict.get("type", "_unknown_")).lower()
+            if child_type not in _child_types_by_lower_type:
+                errors.append(
+                    new_error(
+                        IndexingErrorType.collection_parsing,
+                        "Did not recognise child type at '{}': {}".format(
+                            child_link, child_type
+                        ),
                     )
-                    continue
-                try:
-                    child = _child_types_by_lower_type[child_type](**child_dict)
-                except Exception as e:
-                    errors.append(
-                        new_error(
-                            IndexingErrorType.collection_parsing,
-                            "Could not parse child dictionary as '{}' at '{}': {}".format(
-                                child_type, child_link, e
-                            ),
-                        )
+                )
+                return
+            try:
+                child = _child_types_by_lower_type[child_type](**child_dict)
+            except Exception as e:
+                errors.append(
+                    new_error(
+                        IndexingErrorType.collection_parsing,
+                        "Could not parse child dictionary as '{}' at '{}': {}".format(
+                            child_type, child_link, e
+                        ),
                     )
-                    continue
-                _expand_relative_links(child, child_link)
-                childs_child_links = [
-                    link.href
-                    for link in cast(_HasLinks, child).links.link_iterator()
-                    if link.rel == "child"
-                ]
-                if len(childs_child_links) > 0:
-                    _logger.info(
-                        f"Child of type '{child_type}' at '{child_link}' adds {len(childs_child_links)} child(ren)"
+                )
+                return
+            _expand_relative_links(child, child_link)
+            added = enqueue(cast(_HasLinks, child))
+            if added > 0:
+                _logger.debug(
+                    f"Child of type '{child_type}' at '{child_link}' adds {added} child(ren)"
+                )
+            if isinstance(child, Collection):
+                collection = cast(Collection, child)
+                if not _has_matching_self_link(collection, child_link):
+                    _logger.debug(
+                        "Collection '{}' self link is incorrect and does not match '{}'".format(
+                            collection.id,
+                            child_link,
+                        )
                     )
-                    child_links_all.extend(childs_child_links)
-                if isinstance(child, Collection):
-                    collection = cast(Collection, child)
-                    if not _has_matching_self_link(collection, child_link):
-                        _logger.debug(
-                            "Collection '{}' self link is incorrect and does not match '{}'".format(
-                                collection.id,
-                                child_link,
+                collections.append(
+                    collection.model_copy(update={"location": child_link})
+                )
+
+        async def worker() -> None:
+            while True:
+                child_link = await child_links_queue.get()
+                try:
+                    await follow(child_link)
+                finally:
+                    counts["followed"] += 1
+                    if counts["followed"] % _child_progress_interval == 0:
+                        _logger.info(
+                            "followed {} child link(s), {} queued, {} collection(s) discovered".format(
+                                counts["followed"],
+                                child_links_queue.qsize(),
+                                len(collections),
                             )
                         )
-                    collections.append(
-                        collection.model_copy(update={"location": child_link})
-                    )
+                    child_links_queue.task_done()
+
+        # Breadth-first traversal, following up to max_concurrency child links at once.
+        # Traversal is complete when every queued link has been followed.
+        enqueue(root_catalog)
+        workers = [create_task(worker()) for _ in range(get_settings().max_concurrency)]
+        try:
+            await child_links_queue.join()
+        finally:
+            for worker_task in workers:
+                worker_task.cancel()
+            await gather(*workers, return_exceptions=True)
+        _logger.info(
+            f"followed {counts['followed']} child link(s), discovered {len(collections)} collection(s)"
+        )
         return (collections, errors)
 
     async def process_items(
         self,
         collections: List[Collection],
-        item_ingestor: Callable[[ItemWithLocation], List[IndexingError]],
+        row_builder: ItemRowBuilder,
+        row_ingestor: Callable[[ItemRow], List[IndexingError]],
+        get_previous_source_versions: Optional[Callable[[str], Dict[str, str]]] = None,
+        unchanged_ingestor: Optional[Callable[[str], List[IndexingError]]] = None,
+        get_ingested_uris: Optional[Callable[[str], Set[str]]] = None,
+        collection_completed: Optional[
+            Callable[[str, List[IndexingError]], None]
+        ] = None,
     ) -> List[IndexingError]:
+        # Items stream through bounded queues from URI discovery, to fetching, to parsing and ingestion.
+        # A full queue pauses the stage feeding it, and each stage has a fixed number of workers.
+        # Up to max_concurrency collections are discovered at once, and each holds its listed item
+        # URIs until they are queued, so memory use is bounded by the largest collections rather
+        # than by the size of the catalog. Duplicate item URIs are removed within each collection,
+        # an item URI listed by more than one collection is fetched for each and counted as a
+        # duplicate, rather than an error, when ingested.
+        # get_previous_source_versions returns the source versions of a collection's previous items,
+        # keyed by URI. Items whose source version matches are not fetched and are passed to
+        # unchanged_ingestor instead. Items in a collection's get_ingested_uris are skipped entirely.
+        # collection_completed is called with a collection's errors once every item discovered for it
+        # has been ingested, and those errors are not returned. A collection whose item URIs could
+        # not all be listed never completes.
         _logger.info("reading items for collections")
         all_errors: List[IndexingError] = []
-        item_uris: List[str] = []
-        concurrency_limit = Semaphore(get_settings().max_concurrency)
+        settings = get_settings()
+        max_concurrency = settings.max_concurrency
+        request_limit = Semaphore(max_concurrency)
+        # queue entries are tagged with the ID of the collection the item was discovered in,
+        # and carry the item's previous source version
+        uri_queue: Queue[Optional[Tuple[str, str, Optional[str]]]] = Queue(
+            maxsize=settings.item_queue_size
+        )
+        item_queue: Queue[Optional[Tuple[str, Tuple[str, str, Optional[str]]]]] = Queue(
+            maxsize=settings.item_queue_size
+        )
+        discovery_limit = Semaphore(max_concurrency)
+        counts: Dict[str, int] = {
+            "discovered": 0,
+            "duplicates": 0,
+            "fetched": 0,
+            "unchanged": 0,
+            "previously ingested": 0,
+        }
+        outstanding_by_collection: Dict[str, int] = {}
+        errors_by_collection: Dict[str, List[IndexingError]] = {}
+        listed_collection_ids: Set[str] = set()
+
+        def add_errors(collection_id: str, errors: List[IndexingError]) -> None:
+            if collection_completed is None:
+                all_errors.extend(errors)
+            else:
+                errors_by_collection.setdefault(collection_id, []).extend(errors)
+
+        def check_completed(collection_id: str) -> None:
+            if (
+                collection_completed is not None
+                and collection_id in listed_collection_ids
+                and outstanding_by_collection.get(collection_id, 0) == 0
+            ):
+                listed_collection_ids.remove(collection_id)
+                collection_completed(
+                    collection_id, errors_by_collection.pop(collection_id, [])
+                )
+
+        def item_done(collection_id: str) -> None:
+            outstanding_by_collection[collection_id] -= 1
+            check_completed(collection_id)
+
         if _settings.test_collection_limit is not None:
             collections = collections[: _settings.test_collection_limit]
-        _logger.info("collecting item URIs for collections")
-        results = await gather(
-            *[
-                self._get_collection_item_uris(collection, semaphore=concurrency_limit)
-                for collection in collections
-            ]
+        parse_workers = settings.parse_workers
+        # Parsing and validation are CPU-bound, so run in worker processes where configured.
+        # Each worker process parses one batch at a time.
+        parse_pool = (
+            ProcessPoolExecutor(
+                max_workers=parse_workers,
+                mp_context=get_context("spawn"),
+                initializer=_initialise_parse_worker,
+                initargs=(self.fixes_to_apply, row_builder),
+            )
+            if parse_workers > 0
+            else None
         )
-        for result in results:
-            item_uris.extend(result[0])
-            all_errors.extend(result[1])
-
-        collected_item_count = len(item_uris)
-        item_uris = list(set(item_uris))
-        if len(item_uris) < collected_item_count:
-            _logger.info(
-                "removed {} duplicate item URIs".format(
-                    collected_item_count - len(item_uris)
-                )
+        parse_task_count = max(parse_workers, 1)
+
+        async def discover(collection: Collection) -> None:
+            async with discovery_limit:
+                await discover_collection(collection)
+
+        async def discover_collection(collection: Collection) -> None:
+            item_uris, errors = await self._get_collection_item_uris(
+                collection, semaphore=request_limit
+            )
+            all_errors.extend(errors)
+            previous_source_versions = (
+                get_previous_source_versions(collection.id)
+                if get_previous_source_versions is not None
+                else {}
             )
+            ingested_uris = (
+                get_ingested_uris(collection.id)
+                if get_ingested_uris is not None
+                else set()
+            )
+            seen_uris: Set[str] = set()
+            skipped_uris: List[str] = []
+            for uri in item_uris:
+                if uri in seen_uris:
+                    counts["duplicates"] += 1
+                    continue
+                seen_uris.add(uri)
+                counts["discovered"] += 1
+                if uri in ingested_uris:
+                    counts["previously ingested"] += 1
+                    skipped_uris.append(uri)
+                    continue
+                outstanding_by_collection[collection.id] = (
+                    outstanding_by_collection.get(collection.id, 0) + 1
+                )
+                await uri_queue.put(
+                    (collection.id, uri, previous_source_versions.get(uri))
+                )
+            self._get_source_reader_for_uri().discard_source_versions(skipped_uris)
+            if len(errors) == 0:
+                listed_collection_ids.add(collection.id)
+                check_completed(collection.id)
 
-        async def fetch_and_ingest(
-            uri: str, semaphore: Semaphore
-        ) -> List[IndexingError]:
-            async with semaphore:
-                item_errors: List[IndexingError] = []
+        async def discover_all() -> None:
+            _logger.info("collecting item URIs for collections")
+            await gather(*[discover(collection) for collection in collections])
+            for _ in range(max_concurrency):
+                await uri_queue.put(None)
+
+        async def fetch() -> None:
+            while (entry := await uri_queue.get()) is not None:
+                collection_id, uri, previous_source_version = entry
                 try:
-                    dict_item = await self._get_json_content_from_uri(uri)
-                    (item, dict_item) = self._stac_parser.parse_stac_item(dict_item)
-                except StacParserException as e:
-                    item_errors.extend(e.indexing_errors)
-                except Exception as e:
-                    item_errors.append(
-                        new_error(
-                            type=IndexingErrorType.item_fetching,
-                            description=str(e),
+                    async with request_limit:
+                        fetched = await self._get_source_reader_for_uri().get_uri_as_string_if_changed(
+                            uri, previous_source_version
                         )
-                    )
-                else:
-                    if not _has_matching_self_link(item, uri):
-                        _logger.debug(
-                            "Item '{}' self link is incorrect and does not match '{}'".format(
-                                item.id,
-                                uri,
+                except Exception as e:
+                    add_errors(
+                        collection_id,
+                        [
+                            new_error(
+                                type=IndexingErrorType.item_fetching,
+                                description=str(e),
                             )
-                        )
+                        ],
+                    )
+                    item_done(collection_id)
+                    continue
+                if fetched is None:
+                    counts["unchanged"] += 1
+                    if unchanged_ingestor is not None:
+                        add_errors(collection_id, unchanged_ingestor(uri))
+                    item_done(collection_id)
+                    continue
+                counts["fetched"] += 1
+                await item_queue.put((collection_id, (uri, *fetched)))
 
-                    # ensure item_ingestor cannot be called concurrently by concurrent async function calls
-                    with _item_processor_mutex:
-                        item_errors.extend(
-                            item_ingestor(ItemWithLocation(**dict_item, location=uri))
-                        )
-                return item_errors
+        async def fetch_all() -> None:
+            await gather(*[fetch() for _ in range(max_concurrency)])
+            for _ in range(parse_task_count):
+                await item_queue.put(None)
+
+        async def parse_and_ingest() -> None:
+            finished = False
+            while not finished:
+                # batches take whatever is waiting, up to the batch size, rather than waiting to fill
+                batch: List[Tuple[str, str, Optional[str]]] = []
+                batch_collection_ids: List[str] = []
+                entry = await item_queue.get()
+                while entry is not None:
+                    batch_collection_ids.append(entry[0])
+                    batch.append(entry[1])
+                    if len(batch) >= settings.parse_batch_size or item_queue.empty():
+                        break
+                    entry = item_queue.get_nowait()
+                finished = entry is None
+                if len(batch) == 0:
+                    continue
+                if parse_pool is None:
+                    results = _parse_items(self._stac_parser, row_builder, batch)
+                else:
+                    results = await get_running_loop().run_in_executor(
+                        parse_pool, _parse_items_in_worker, batch
+                    )
+                # row_ingestor is synchronous, so is never called concurrently
+                for collection_id, (row, errors) in zip(batch_collection_ids, results):
+                    add_errors(collection_id, errors)
+                    if row is not None:
+                        add_errors(collection_id, row_ingestor(row))
+                    item_done(collection_id)
 
         _logger.info(
-            f"starting processing {len(item_uris)} items with max concurrency {get_settings().max_concurrency}"
+            f"starting processing items with max concurrency {max_concurrency} and {parse_workers} parse worker(s)"
         )
-        all_errors.extend(
-            item_errors
-            for sublist in await gather(
-                *[
-                    fetch_and_ingest(uri=uri, semaphore=concurrency_limit)
-                    for uri in item_uris
-                ]
+        try:
+            async with TaskGroup() as task_group:
+                task_group.create_task(discover_all())
+                task_group.create_task(fetch_all())
+                for _ in range(parse_task_count):
+                    task_group.create_task(parse_and_ingest())
+        finally:
+            if parse_pool is not None:
+                parse_pool.shutdown(cancel_futures=True)
+        _logger.info(
+            "processed {} item URIs, {} fetched, {} unchanged, {} previously ingested, removed {} duplicate item URIs".format(
+                counts["discovered"],
+                counts["fetched"],
+                counts["unchanged"],
+                counts["previously ingested"],
+                counts["duplicates"],
             )
-            for item_errors in sublist
         )
-
         return all_errors
 
+    async def read_items(
+        self, uris: List[str], row_builder: ItemRowBuilder
+    ) -> Tuple[List[ItemRow], List[IndexingError]]:
+        # For small numbers of items, e.g. from item events, so items are parsed in this process.
+        request_limit = Semaphore(get_settings().max_concurrency)
+        errors: List[IndexingError] = []
+
+        async def fetch(uri: str) -> Optional[Tuple[str, str, Optional[str]]]:
+            try:
+                async with request_limit:
+                    content = await self._get_source_reader_for_uri().get_uri_as_string_if_changed(
+                        uri, None
+                    )
+            except Exception as e:
+                errors.append(
+                    new_error(
+                        type=IndexingErrorType.item_fetching,
+                        description=str(e),
+                    )
+                )
+                return None
+            return (uri, *cast(Tuple[str, Optional[str]], content))
+
+        entries = [
+            entry
+            for entry in await gather(*[fetch(uri) for uri in uris])
+            if entry is not None
+        ]
+        rows: List[ItemRow] = []
+        for row, row_errors in _parse_items(self._stac_parser, row_builder, entries):
+            errors.extend(row_errors)
+            if row is not None:
+                rows.append(row)
+        return (rows, errors)
+
     async def _get_collection_item_uris(
         self, collection: Collection, semaphore: Semaphore
     ) -> Tuple[List[str], List[IndexingError]]:
@@ -310,3 +544,62 @@ def _expand_relative_links(links_provider: _HasLinks, provider_href: str) -> Non
                     new_link_parts.append(part)
             link.href = "/".join(new_link_parts)
             _logger.debug(f"expanded '{original_relative_link}' to '{link.href}'")
+
+
+def _initialise_parse_worker(
+    fixes_to_apply: List[str], row_builder: ItemRowBuilder
+) -> None:
+    global _worker_parser, _worker_row_builder
+    _worker_parser = StacParser(fixes_to_apply)
+    _worker_row_builder = row_builder
+
+
+def _parse_items_in_worker(
+    entries: List[Tuple[str, str, Optional[str]]],
+) -> List[ItemParseResult]:
+    if _worker_parser is None or _worker_row_builder is None:
+        raise Exception("item parse worker not initialised")
+    return _parse_items(_worker_parser, _worker_row_builder, entries)
+
+
+def _parse_items(
+    parser: StacParser,
+    row_builder: ItemRowBuilder,
+    entries: List[Tuple[str, str, Optional[str]]],
+) -> List[ItemParseResult]:
+    # each entry is an item's URI, JSON content, and source version
+    results: List[ItemParseResult] = []
+    for uri, content, source_version in entries:
+        try:
+            (item, dict_item) = parser.parse_stac_item(loads(content))
+        except StacParserException as e:
+            results.append((None, e.indexing_errors))
+            continue
+        except Exception as e:
+            results.append(
+                (
+                    None,
+                    [
+                        new_error(
+                            type=IndexingErrorType.item_fetching,
+                            description=str(e),
+                        )
+                    ],
+                )
+            )
+            continue
+        if not _has_matching_self_link(item, uri):
+            _logger.debug(
+                "Item '{}' self link is incorrect and does not match '{}'".format(
+                    item.id,
+                    uri,
+                )
+            )
+        results.append(
+            row_builder(
+                ItemWithLocation(
+                    **dict_item, location=uri, source_version=source_version
+                )
+            )
+        )
+    return results
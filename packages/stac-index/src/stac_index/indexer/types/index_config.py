@@ -50,9 +50,14 @@ class Sortable(BaseModel):
     collections: List[str]
 
 
+class TextSearchable(BaseModel):
+    collections: List[str]
+
+
 IndexableByFieldName = Dict[str, Indexable]
 QueryableByFieldName = Dict[str, Queryable]
 SortablesByFieldName = Dict[str, Sortable]
+TextSearchablesByFieldName = Dict[str, TextSearchable]
 IndexableByCollection = Dict[str, IndexableByFieldName]
 
 
@@ -60,6 +65,7 @@ class IndexConfig(BaseModel):
     indexables: IndexableByFieldName = {}
     queryables: QueryableByFieldName = {}
     sortables: SortablesByFieldName = {}
+    text_searchables: TextSearchablesByFieldName = {}
     fixes_to_apply: List[str] = []
 
     def __init__(self, **data):
@@ -70,6 +76,10 @@ class IndexConfig(BaseModel):
             ), "queryable contains name that is not indexed"
         for name in self.sortables.keys():
             assert name in self.indexables, "sortable contains name that is not indexed"
+        for name in self.text_searchables.keys():
+            assert (
+                name in self.indexables
+            ), "text searchable contains name that is not indexed"
 
     @property
     def all_indexables_by_collection(self) -> IndexableByCollection:
@@ -86,4 +96,10 @@ class IndexConfig(BaseModel):
                     by_collection[collection] = {}
                 if name not in by_collection[collection]:
                     by_collection[collection][name] = self.indexables[name]
+        for name, text_searchable in self.text_searchables.items():
+            for collection in text_searchable.collections:
+                if collection not in by_collection:
+                    by_collection[collection] = {}
+                if name not in by_collection[collection]:
+                    by_collection[collection][name] = self.indexables[name]
         return by_collection
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, field_serializer
 from stac_index.indexer.types.index_config import IndexConfig
@@ -9,6 +9,16 @@ class TableMetadata(BaseModel):
     relative_path: str
 
 
+class DatabaseMetadata(BaseModel):
+    relative_path: str
+
+
+class ShardMetadata(BaseModel):
+    # zero-based position of this shard among count shards
+    index: int
+    count: int
+
+
 class IndexManifest(BaseModel):
     indexer_version: int
     updated: datetime
@@ -16,6 +26,12 @@ class IndexManifest(BaseModel):
     root_catalog_uri: Optional[str] = None
     index_config: Optional[IndexConfig] = None
     tables: Dict[str, TableMetadata] = {}
+    # optional DuckDB database file containing all tables, with indexes
+    database: Optional[DatabaseMetadata] = None
+    # present if this is a partial index, covering only the collections assigned to one shard
+    shard: Optional[ShardMetadata] = None
+    # item changes applied since the items table was created, in the order applied
+    item_deltas: List[TableMetadata] = []
 
     @field_serializer("updated")
     def serialize_timestamp(self, timestamp: datetime) -> str:
@@ -0,0 +1,51 @@
+from enum import Enum
+from typing import Final, List
+
+from pydantic import BaseModel
+
+# Item deltas record item changes made since an index's tables were created, without recreating them.
+# Each delta is a parquet file with the items table's columns plus item_delta_deleted_column.
+# Deltas are keyed by stac_location: a row replaces any earlier row from the same location,
+# and a deleted row, where only stac_location is set, removes it. An upserted row may not have
+# the collection_id and id of an item at another location, unless that location is deleted.
+item_delta_deleted_column: Final[str] = "deleted"
+_item_delta_sequence_column: Final[str] = "delta_sequence"
+
+
+class ItemEventType(str, Enum):
+    upsert = "upsert"
+    delete = "delete"
+
+
+class ItemEvent(BaseModel):
+    type: ItemEventType
+    # location of the item's STAC JSON, which is fetched for upserts
+    uri: str
+
+
+def format_items_with_deltas(
+    items_object_name: str, delta_object_names: List[str]
+) -> str:
+    """Format a relation presenting items with deltas applied, in order.
+
+    Returns items_object_name unchanged if there are no deltas, so that queries are unaffected.
+
+    """
+    if len(delta_object_names) == 0:
+        return items_object_name
+    deltas = " UNION ALL BY NAME ".join(
+        [
+            f"SELECT *, {sequence} AS {_item_delta_sequence_column} FROM {delta_object_name}"
+            for sequence, delta_object_name in enumerate(delta_object_names)
+        ]
+    )
+    return f"""(
+        SELECT *
+          FROM {items_object_name}
+         WHERE stac_location NOT IN (SELECT stac_location FROM ({deltas}))
+UNION ALL BY NAME
+        SELECT * EXCLUDE ({item_delta_deleted_column}, {_item_delta_sequence_column})
+          FROM ({deltas})
+       QUALIFY row_number() OVER (PARTITION BY stac_location ORDER BY {_item_delta_sequence_column} DESC) = 1
+           AND NOT {item_delta_deleted_column}
+    )"""
@@ -1,6 +1,6 @@
 from typing import Optional, Set
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from stac_pydantic import Collection, Item
 
 
@@ -12,9 +12,14 @@ class WithFixes(BaseModel):
     applied_fixes: Optional[Set[str]] = None
 
 
+class WithSourceVersion(BaseModel):
+    # excluded from serialisation, so that item hashes reflect only item content
+    source_version: Optional[str] = Field(default=None, exclude=True)
+
+
 class CollectionWithLocation(Collection, WithLocation):
     pass
 
 
-class ItemWithLocation(Item, WithLocation, WithFixes):
+class ItemWithLocation(Item, WithLocation, WithFixes, WithSourceVersion):
     pass
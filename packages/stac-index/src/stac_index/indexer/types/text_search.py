@@ -0,0 +1,19 @@
+from typing import Final, List
+
+# Text is normalised identically when indexed and when queried: accents stripped, lower-cased,
+# then split on any run of characters matching this pattern.
+text_search_ignore_pattern: Final[str] = "[^a-z]+"
+# Terms are not stemmed so that queries can be normalised without DuckDB's FTS extension.
+text_search_stemmer: Final[str] = "none"
+text_search_stopwords: Final[str] = "english"
+
+text_search_documents_table: Final[str] = "text_search_documents"
+text_search_terms_table: Final[str] = "text_search_terms"
+text_search_dictionary_table: Final[str] = "text_search_dictionary"
+text_search_stats_table: Final[str] = "text_search_stats"
+text_search_tables: Final[List[str]] = [
+    text_search_documents_table,
+    text_search_terms_table,
+    text_search_dictionary_table,
+    text_search_stats_table,
+]
@@ -1,6 +1,6 @@
 from glob import glob
 from logging import Logger, getLogger
-from os import path
+from os import path, stat
 from shutil import copy
 from time import time
 from typing import Final, List, Optional, Self, Tuple
@@ -8,11 +8,16 @@ from typing import Final, List, Optional, Self, Tuple
 from stac_index.io.filesystem_common import can_handle_uri as can_handle_uri_common
 from stac_index.io.filesystem_common import path_separator as path_separator_common
 from stac_index.io.readers.exceptions import UriNotFoundException
-from stac_index.io.readers.source_reader import SourceReader
+from stac_index.io.readers.source_reader import IndexReader, SourceReader
 
 _logger: Final[Logger] = getLogger(__name__)
 
 
+class _FilesystemIndexReader(IndexReader):
+    def get_duckdb_extensions(self: Self) -> List[str]:
+        return []
+
+
 class FilesystemSourceReader(SourceReader):
     @staticmethod
     def can_handle_uri(uri: str) -> bool:
@@ -62,3 +67,15 @@ class FilesystemSourceReader(SourceReader):
         if path.exists(path=uri):
             return round(path.getmtime(filename=uri))
         return None
+
+    async def get_source_version_for_uri(self: Self, uri: str) -> Optional[str]:
+        try:
+            file_stat = stat(uri)
+        except FileNotFoundError:
+            return None
+        return f"{file_stat.st_size}-{file_stat.st_mtime_ns}"
+
+    def get_index_reader(self: Self, index_manifest_uri: str) -> IndexReader:
+        return _FilesystemIndexReader(
+            source_reader=self, index_manifest_uri=index_manifest_uri
+        )
@@ -2,6 +2,7 @@ from datetime import UTC, datetime
 from logging import Logger, getLogger
 from time import time
 from typing import (
+    TYPE_CHECKING,
     Any,
     Callable,
     Coroutine,
@@ -14,12 +15,14 @@ from typing import (
     cast,
 )
 
-from aiohttp import ClientResponse, ClientSession
 from stac_index.io.https_common import can_handle_uri as can_handle_uri_common
 from stac_index.io.https_common import path_separator as path_separator_common
 from stac_index.io.readers.exceptions import UriNotFoundException
 from stac_index.io.readers.source_reader import SourceReader
 
+if TYPE_CHECKING:
+    from aiohttp import ClientResponse
+
 _logger: Final[Logger] = getLogger(__name__)
 
 
@@ -38,12 +41,16 @@ class HttpsSourceReader(SourceReader):
     async def _get_uri_and_process(
         self: Self,
         uri: str,
-        processor: Callable[[ClientResponse], Coroutine[None, None, None]],
+        processor: Callable[["ClientResponse"], Coroutine[None, None, None]],
         success_statuses: List[int] = [200],
+        headers: Optional[Dict[str, str]] = None,
     ) -> None:
+        # aiohttp is slow to import and not required by deployments that do not read over HTTPS
+        from aiohttp import ClientSession
+
         start = time()
         async with ClientSession() as session:
-            async with session.get(uri) as response:
+            async with session.get(uri, headers=headers) as response:
                 if response.status in success_statuses:
                     await processor(response)
                     _logger.debug(
@@ -60,15 +67,36 @@ class HttpsSourceReader(SourceReader):
     async def get_uri_as_string(self: Self, uri: str) -> str:
         result = ""
 
-        async def process(response: ClientResponse) -> None:
+        async def process(response: "ClientResponse") -> None:
             nonlocal result
             result = await response.text()
 
         await self._get_uri_and_process(uri, process)
         return result
 
+    async def get_uri_as_string_if_changed(
+        self: Self, uri: str, previous_source_version: Optional[str]
+    ) -> Optional[Tuple[str, Optional[str]]]:
+        # a conditional request, the server responds 304 without content if the ETag still matches
+        result: Optional[Tuple[str, Optional[str]]] = None
+
+        async def process(response: "ClientResponse") -> None:
+            nonlocal result
+            if response.status != 304:
+                result = (await response.text(), response.headers.get("ETag"))
+
+        await self._get_uri_and_process(
+            uri,
+            process,
+            success_statuses=[200, 304],
+            headers={"If-None-Match": previous_source_version}
+            if previous_source_version is not None
+            else None,
+        )
+        return result
+
     async def get_uri_to_file(self: Self, uri: str, file_path: str) -> None:
-        async def process(response: ClientResponse) -> None:
+        async def process(response: "ClientResponse") -> None:
             with open(file_path, "wb") as f:
                 async for chunk in response.content.iter_chunked(1000000):
                     f.write(chunk)
@@ -51,6 +51,8 @@ class S3SourceReader(SourceReader):
         self._obstore_cache: Dict[
             str, S3Store
         ] = {}  # stores are bucket-specific, so need one per unique bucket
+        # versions of listed objects, held until each object is fetched to avoid a request per object
+        self._listed_source_versions: Dict[str, str] = {}
 
     def path_separator(self: Self) -> str:
         return path_separator_common()
@@ -103,11 +105,20 @@ class S3SourceReader(SourceReader):
         uris: List[str] = []
         list_stream = self._obstore_for_bucket(bucket=bucket).list(prefix=prefix)
         async for chunk in list_stream:
+            # versions are only held for URIs returned, which may be fetched
+            for entry in chunk[: item_limit - len(uris) if item_limit else None]:
+                entry_uri = "s3://{}/{}".format(bucket, entry["path"])
+                uris.append(entry_uri)
+                self._listed_source_versions[entry_uri] = (
+                    entry["e_tag"]
+                    if entry.get("e_tag") is not None
+                    else "{}-{}".format(
+                        entry["size"], entry["last_modified"].timestamp()
+                    )
+                )
             if item_limit and len(uris) >= item_limit:
                 break
-            for entry in chunk:
-                uris.append("s3://{}/{}".format(bucket, entry["path"]))
-        return (uris if item_limit is None else uris[:item_limit], [])
+        return (uris, [])
 
     async def get_last_modified_epoch_for_uri(self: Self, uri: str) -> Optional[int]:
         bucket, prefix = get_s3_key_parts(uri)
@@ -120,5 +131,13 @@ class S3SourceReader(SourceReader):
         last_modified = object_meta["last_modified"]
         return round(last_modified.timestamp())
 
+    async def get_source_version_for_uri(self: Self, uri: str) -> Optional[str]:
+        # objects that were not listed, e.g. those linked individually from a collection, have no known version
+        return self._listed_source_versions.pop(uri, None)
+
+    def discard_source_versions(self: Self, uris: List[str]) -> None:
+        for uri in uris:
+            self._listed_source_versions.pop(uri, None)
+
     def get_index_reader(self: Self, index_manifest_uri: str):
         return _S3IndexReader(source_reader=self, index_manifest_uri=index_manifest_uri)
@@ -24,14 +24,32 @@ class IndexReader:
             raise MissingIndexException(f"index missing at {self._index_manifest_uri}")
 
     async def get_parquet_uris(self: Self) -> Dict[str, str]:
-        manifest = await self.get_index_manifest()
+        return self.get_table_uris(await self.get_index_manifest())
+
+    def get_table_uris(self: Self, index_manifest: IndexManifest) -> Dict[str, str]:
         return {
-            table_name: "/".join(
-                self._index_manifest_uri.split("/")[:-1] + [metadata.relative_path]
-            )
-            for table_name, metadata in manifest.tables.items()
+            table_name: self._get_relative_uri(metadata.relative_path)
+            for table_name, metadata in index_manifest.tables.items()
         }
 
+    def get_item_delta_uris(self: Self, index_manifest: IndexManifest) -> List[str]:
+        return [
+            self._get_relative_uri(metadata.relative_path)
+            for metadata in index_manifest.item_deltas
+        ]
+
+    def get_database_uri(self: Self, index_manifest: IndexManifest) -> Optional[str]:
+        if index_manifest.database is None:
+            return None
+        return self._get_relative_uri(index_manifest.database.relative_path)
+
+    def _get_relative_uri(self: Self, relative_path: str) -> str:
+        return "/".join(self._index_manifest_uri.split("/")[:-1] + [relative_path])
+
+    def get_duckdb_extensions(self: Self) -> List[str]:
+        # DuckDB extensions required to read index files from this source, in addition to spatial
+        return ["httpfs"]
+
     def get_duckdb_configuration_statements(
         self: Self,
     ) -> List[Tuple[str, Optional[List[Any]]]]:
@@ -67,6 +85,26 @@ class SourceReader(Source):
     async def get_last_modified_epoch_for_uri(self: Self, uri: str) -> Optional[int]:
         pass
 
+    async def get_source_version_for_uri(self: Self, uri: str) -> Optional[str]:
+        # Identifies a version of the object at uri, if the source can do so without fetching it.
+        # Versions are opaque and only compared for equality.
+        return None
+
+    def discard_source_versions(self: Self, uris: List[str]) -> None:
+        # Called for listed URIs that will not be fetched, so that sources holding versions
+        # from listings until each object is fetched can release them.
+        pass
+
+    async def get_uri_as_string_if_changed(
+        self: Self, uri: str, previous_source_version: Optional[str]
+    ) -> Optional[Tuple[str, Optional[str]]]:
+        # Returns None if the object is unchanged since previous_source_version,
+        # otherwise its content and current version.
+        source_version = await self.get_source_version_for_uri(uri)
+        if source_version is not None and source_version == previous_source_version:
+            return None
+        return (await self.get_uri_as_string(uri), source_version)
+
     async def load_json_from_uri(self: Self, uri: str) -> Dict[str, Any]:
         return loads(await self.get_uri_as_string(uri))
 
@@ -0,0 +1,364 @@
+import unittest
+from asyncio import run
+from datetime import datetime, timezone
+from json import dump
+from os import makedirs, path
+from tempfile import TemporaryDirectory
+from typing import Dict
+
+from duckdb import connect
+from stac_index.indexer.creator import creator as creator_module
+from stac_index.indexer.creator.creator import (
+    IndexCreator,
+    _format_changes_query,
+    _get_shard_index,
+    _validate_shard_manifests,
+)
+from stac_index.indexer.types.index_manifest import (
+    IndexManifest,
+    ShardMetadata,
+    TableMetadata,
+)
+from stac_index.indexer.types.indexing_error import IndexingErrorType
+from stac_index.indexer.types.item_delta import format_items_with_deltas
+from stac_index.io.readers import get_reader_for_uri
+
+
+class IndexCreatorTest(unittest.TestCase):
+    def setUp(self):
+        # the spatial extension is not required to exercise batch insertion of non-geometry columns
+        self.target = IndexCreator.__new__(IndexCreator)
+        self.target._conn = connect()
+        self.target._conn.execute(
+            """
+            CREATE TABLE items (
+                id VARCHAR NOT NULL,
+                collection_id VARCHAR NOT NULL,
+                datetime TIMESTAMPTZ,
+                i_properties_gsd DOUBLE,
+                PRIMARY KEY (collection_id, id),
+            )
+            """
+        )
+        self.item_column_types = {
+            row[0]: row[1]
+            for row in self.target._conn.execute("DESCRIBE items").fetchall()
+        }
+        self.counts: Dict[str, int] = {"inserted": 0, "duplicates": 0, "failed": 0}
+        self.target._checkpointing = False
+
+    def tearDown(self):
+        self.target._conn.close()
+
+    def test_insert_items_batch(self):
+        errors = self.target._insert_items(
+            [
+                {
+                    "id": "a",
+                    "collection_id": "c1",
+                    "datetime": "2020-01-01T00:00:00Z",
+                    "i_properties_gsd": 10,
+                },
+                {
+                    "id": "b",
+                    "collection_id": "c1",
+                    "datetime": None,
+                    "i_properties_gsd": None,
+                },
+            ],
+            self.item_column_types,
+            self.counts,
+        )
+        assert errors == []
+        assert self.counts["inserted"] == 2
+        assert self.target._conn.execute(
+            "SELECT id, i_properties_gsd FROM items ORDER BY id"
+        ).fetchall() == [("a", 10.0), ("b", None)]
+
+    def test_insert_items_attributes_batch_failures(self):
+        row = {
+            "id": "a",
+            "collection_id": "c1",
+            "datetime": None,
+            "i_properties_gsd": None,
+        }
+        errors = self.target._insert_items(
+            [
+                row,
+                {**row, "id": "b", "i_properties_gsd": "not a number"},
+                row,
+                {**row, "id": "c"},
+            ],
+            self.item_column_types,
+            self.counts,
+        )
+        assert self.counts == {"inserted": 2, "duplicates": 1, "failed": 1}
+        assert [(error.type, error.item) for error in errors] == [
+            (IndexingErrorType.unknown, "b"),
+            (IndexingErrorType.item_validation, "a"),
+        ]
+        assert self.target._conn.execute(
+            "SELECT id FROM items ORDER BY id"
+        ).fetchall() == [("a",), ("c",)]
+
+    def test_insert_items_duplicate_uri(self):
+        self.target._conn.execute("ALTER TABLE items ADD COLUMN stac_location VARCHAR")
+        item_column_types = {
+            row[0]: row[1]
+            for row in self.target._conn.execute("DESCRIBE items").fetchall()
+        }
+        row = {
+            "id": "a",
+            "collection_id": "c1",
+            "datetime": None,
+            "i_properties_gsd": None,
+            "stac_location": "/a.json",
+        }
+        self.target._insert_items([row], item_column_types, self.counts)
+        # the same URI listed again, e.g. by another collection, is not an error
+        errors = self.target._insert_items([row], item_column_types, self.counts)
+        assert errors == []
+        # another item with the same key is
+        errors = self.target._insert_items(
+            [{**row, "stac_location": "/b.json"}], item_column_types, self.counts
+        )
+        assert [(error.type, error.item) for error in errors] == [
+            (IndexingErrorType.item_validation, "a")
+        ]
+        assert self.counts == {"inserted": 1, "duplicates": 2, "failed": 0}
+
+    def test_copy_previous_items(self):
+        self.target._conn.execute(
+            """
+            CREATE TABLE items_previous AS
+            SELECT * FROM (VALUES
+                ('a', 'c1', NULL, 10, '/c1/a.json', 'v1'),
+                ('b', 'c1', NULL, 20, '/c1/b.json', NULL),
+            ) t(id, collection_id, datetime, i_properties_gsd, stac_location, source_version)
+            """
+        )
+        # only items whose source versions were recorded can be skipped
+        assert self.target._create_previous_source_versions()
+        assert self.target._get_previous_source_versions("c1") == {"/c1/a.json": "v1"}
+        assert self.target._get_previous_source_versions("c2") == {}
+        self.counts["unchanged"] = 0
+        errors = self.target._copy_previous_items(
+            ["/c1/a.json", "/c1/missing.json"], self.item_column_types, self.counts
+        )
+        assert errors == []
+        assert self.counts["unchanged"] == 1
+        assert self.target._conn.execute(
+            "SELECT id, i_properties_gsd FROM items"
+        ).fetchall() == [("a", 10.0)]
+
+    def test_item_events(self):
+        self.target._load_id = "load2"
+        self.target._creation_time = datetime.now(tz=timezone.utc)
+        self.target._conn.execute("ALTER TABLE items ADD COLUMN stac_location VARCHAR")
+        self.target._conn.execute("CREATE TABLE collections (id VARCHAR)")
+        self.target._conn.execute("INSERT INTO collections VALUES ('c1')")
+        with open(
+            path.join(
+                path.dirname(creator_module.__file__),
+                "sql",
+                "01-tables",
+                "901-index_history.sql",
+            )
+        ) as f:
+            self.target._conn.execute(f.read())
+        self.target._conn.execute(
+            """
+            CREATE TABLE items_current AS
+            SELECT * FROM (VALUES ('c1', 'a', '/a.json'), ('c1', 'b', '/b.json'), ('c1', 'c', '/c.json'))
+                t(collection_id, id, stac_location)
+            """
+        )
+        self.target._conn.execute(
+            """
+            INSERT INTO items (collection_id, id, stac_location)
+            VALUES ('c1', 'a', '/a.json'), ('c1', 'b', '/moved-b.json'), ('c1', 'c', '/moved-c.json'), ('c1', 'd', '/d.json')
+            """
+        )
+        self.target._conn.execute(
+            "CREATE TABLE item_delta_deletes AS SELECT * FROM (VALUES ('/c.json'), ('/missing.json')) t(stac_location)"
+        )
+        self.counts["inserted"] = 4
+        errors = self.target._reject_upserted_key_conflicts(self.counts)
+        # an upsert may only take an existing item's key if the item's location is deleted
+        assert [(error.type, error.item) for error in errors] == [
+            (IndexingErrorType.item_validation, "b")
+        ]
+        assert self.counts == {"inserted": 3, "duplicates": 1, "failed": 0}
+        self.target._log_item_events("/catalog.json")
+        assert self.target._conn.execute(
+            """
+            SELECT id, items_loaded, items_added, items_removed, items_updated, items_unchanged
+                 , collections_loaded, collections_unchanged
+              FROM index_history
+            """
+        ).fetchall() == [("load2", 4, 2, 1, 1, 1, 1, 1)]
+
+    def test_checkpoints(self):
+        self.target._checkpointing = True
+        self.target._conn.execute(
+            "CREATE TABLE checkpoints (stage VARCHAR PRIMARY KEY, completed TIMESTAMPTZ NOT NULL)"
+        )
+        self.target._checkpoint("collection:c1")
+        self.target._checkpoint("collection:c1")
+        self.target._checkpoint("items")
+        assert self.target._is_checkpointed("items")
+        assert not self.target._is_checkpointed("indexables")
+        assert self.target._get_completed_collection_ids() == {"c1"}
+        # a stage that fails part way is not checkpointed, and leaves nothing to clear up on resume
+        with self.assertRaises(Exception):
+            with self.target._transaction():
+                self.target._conn.execute("CREATE TABLE partial (id VARCHAR)")
+                self.target._checkpoint("indexables")
+                raise Exception("stopped")
+        assert not self.target._is_checkpointed("indexables")
+        assert (
+            self.target._conn.execute(
+                "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'partial'"
+            ).fetchone()[0]
+            == 0
+        )
+
+    def test_merge_shard(self):
+        self.target._conn.execute("CREATE TABLE collections (id VARCHAR PRIMARY KEY)")
+        self.target._conn.execute(
+            "CREATE TABLE errors (id INTEGER PRIMARY KEY DEFAULT 1, description VARCHAR)"
+        )
+        with TemporaryDirectory() as tmp_dir:
+            manifest_path = _write_shard(
+                tmp_dir,
+                collections="SELECT 'c1' AS id",
+                items="SELECT 'a' AS id, 'c1' AS collection_id, NULL::TIMESTAMPTZ AS datetime, 10::DOUBLE AS i_properties_gsd",
+                errors="SELECT 1 AS id, 'failed' AS description",
+            )
+            manifest = _get_shard_manifest(0, 2)
+            run(self.target._merge_shard(manifest_path, manifest))
+            assert self.target._conn.execute(
+                "SELECT collection_id, id, i_properties_gsd FROM items"
+            ).fetchall() == [("c1", "a", 10.0)]
+            assert self.target._conn.execute(
+                "SELECT description FROM errors"
+            ).fetchall() == [("failed",)]
+            # a shard overlapping an already-merged shard is rejected
+            with self.assertRaises(ValueError):
+                run(self.target._merge_shard(manifest_path, manifest))
+
+    def test_count_changes(self):
+        self.target._conn.execute(
+            """
+            CREATE TABLE collections AS
+            SELECT * FROM (VALUES ('a', 'h1'), ('b', 'h2'), ('d', 'h4')) t(id, collection_hash)
+            """
+        )
+        self.target._conn.execute(
+            """
+            CREATE TABLE collections_previous AS
+            SELECT * FROM (VALUES ('a', 'h1'), ('b', 'h0'), ('c', 'h3')) t(id, collection_hash)
+            """
+        )
+        changes = _format_changes_query("collections", ["id"], "collection_hash")
+        assert self.target._conn.execute(
+            f"SELECT id, change FROM ({changes}) ORDER BY id"
+        ).fetchall() == [
+            ("a", "unchanged"),
+            ("b", "updated"),
+            ("c", "removed"),
+            ("d", "added"),
+        ]
+        assert self.target._count_changes("collections", changes) == {
+            "collections_added": 1,
+            "collections_removed": 1,
+            "collections_updated": 1,
+            "collections_unchanged": 1,
+        }
+
+    def test_format_downloaded_items_with_deltas(self):
+        with TemporaryDirectory() as tmp_dir:
+            manifest_path = _write_shard(
+                tmp_dir,
+                items="SELECT * FROM (VALUES ('a', 'a.json', 1), ('b', 'b.json', 1), ('c', 'c.json', 1)) t(id, stac_location, version)",
+                delta1="SELECT * FROM (VALUES ('a', 'a.json', 2, false), (NULL, 'b.json', NULL, true), ('d', 'd.json', 2, false)) t(id, stac_location, version, deleted)",
+                delta2="SELECT * FROM (VALUES (NULL, 'a.json', NULL, true), ('b', 'b.json', 3, false)) t(id, stac_location, version, deleted)",
+            )
+            manifest = _get_shard_manifest(0, 2).model_copy(
+                update={
+                    "item_deltas": [
+                        TableMetadata(relative_path="shard/delta1.parquet"),
+                        TableMetadata(relative_path="shard/delta2.parquet"),
+                    ]
+                }
+            )
+            items_path = path.join(tmp_dir, "shard", "items.parquet")
+            items = run(
+                self.target._format_downloaded_items(
+                    get_reader_for_uri(manifest_path),
+                    manifest_path,
+                    manifest,
+                    items_path,
+                    path.join(tmp_dir, "download"),
+                )
+            )
+            # later deltas take precedence, and deleted items are removed
+            assert self.target._conn.execute(
+                f"SELECT * FROM {items} ORDER BY id"
+            ).fetchall() == [("b", "b.json", 3), ("c", "c.json", 1), ("d", "d.json", 2)]
+            # without deltas the items table is unchanged
+            assert format_items_with_deltas(f"'{items_path}'", []) == f"'{items_path}'"
+
+
+class ShardTest(unittest.TestCase):
+    def test_get_shard_index(self):
+        shard_indexes = [_get_shard_index(f"c{i}", 4) for i in range(100)]
+        assert set(shard_indexes) == {0, 1, 2, 3}
+        assert shard_indexes == [_get_shard_index(f"c{i}", 4) for i in range(100)]
+
+    def test_validate_shard_manifests(self):
+        _validate_shard_manifests(
+            [_get_shard_manifest(1, 2), _get_shard_manifest(0, 2)]
+        )
+        for shard_manifests in [
+            [],
+            [_get_shard_manifest(0, 2)],
+            [_get_shard_manifest(0, 2), _get_shard_manifest(0, 2)],
+            [_get_shard_manifest(0, 2), _get_shard_manifest(1, 3)],
+            [
+                _get_shard_manifest(0, 2),
+                _get_shard_manifest(1, 2, root_catalog_uri="/other/catalog.json"),
+            ],
+            [_get_shard_manifest(0, 1).model_copy(update={"shard": None})],
+        ]:
+            with self.assertRaises(ValueError):
+                _validate_shard_manifests(shard_manifests)
+
+
+def _get_shard_manifest(
+    index: int, count: int, root_catalog_uri: str = "/catalog.json"
+) -> IndexManifest:
+    return IndexManifest(
+        indexer_version=1,
+        updated=datetime.now(tz=timezone.utc),
+        load_id="shard",
+        root_catalog_uri=root_catalog_uri,
+        tables={
+            table_name: TableMetadata(relative_path=f"shard/{table_name}.parquet")
+            for table_name in ["collections", "items", "errors"]
+        },
+        shard=ShardMetadata(index=index, count=count),
+    )
+
+
+def _write_shard(tmp_dir: str, **queries_by_table_name: str) -> str:
+    makedirs(path.join(tmp_dir, "shard"))
+    with connect() as connection:
+        for table_name, query in queries_by_table_name.items():
+            connection.execute(
+                f"COPY ({query}) TO '{path.join(tmp_dir, 'shard', table_name)}.parquet' (FORMAT PARQUET)"
+            )
+    manifest_path = path.join(tmp_dir, "manifest.json")
+    with open(manifest_path, "w") as f:
+        dump(_get_shard_manifest(0, 2).model_dump(), f)
+    return manifest_path
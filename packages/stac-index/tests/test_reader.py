@@ -1,8 +1,16 @@
+from asyncio import run
+from json import dumps, loads
 from types import SimpleNamespace
-from typing import List
-from unittest.mock import Mock
+from typing import Any, Dict, List
+from unittest.mock import Mock, patch
 
-from stac_index.indexer.stac_catalog_reader import _expand_relative_links
+from stac_index.indexer.stac_catalog_reader import (
+    StacCatalogReader,
+    _expand_relative_links,
+)
+from stac_index.indexer.types.indexing_error import IndexingErrorType, new_error
+from stac_pydantic import Catalog
+from test_stac_parser import basic_item_json
 
 
 def _get_link_provider(links: List[str]) -> SimpleNamespace:
@@ -40,3 +48,263 @@ def test_expand_relative_links_3():
     link_provider = _get_link_provider([link_1_relative])
     _expand_relative_links(link_provider, provider_href)
     assert link_provider.links.link_iterator()[0].href == link_1_absolute
+
+
+def _build_row(item):
+    # module-level, so that it can be pickled to parse worker processes
+    return (
+        {
+            "id": item.id,
+            "stac_location": item.location,
+            "source_version": item.source_version,
+        },
+        [],
+    )
+
+
+def _get_reader(contents_by_uri: Dict[str, str]) -> StacCatalogReader:
+    reader = StacCatalogReader(root_catalog_uri="/catalog.json", fixes_to_apply=[])
+
+    async def get_uri_as_string_if_changed(uri, previous_source_version):
+        if uri not in contents_by_uri:
+            raise Exception("not found")
+        if previous_source_version == "v1":
+            return None
+        return (contents_by_uri[uri], "v1")
+
+    reader._get_source_reader_for_uri = Mock(
+        return_value=SimpleNamespace(
+            get_uri_as_string_if_changed=get_uri_as_string_if_changed,
+            discard_source_versions=Mock(),
+        )
+    )
+    return reader
+
+
+@patch("stac_index.indexer.stac_catalog_reader._parse_items")
+@patch("stac_index.indexer.stac_catalog_reader.get_settings")
+def test_process_items_pipeline(get_settings_mock: Mock, parse_items_mock: Mock):
+    get_settings_mock.return_value = SimpleNamespace(
+        max_concurrency=3, item_queue_size=2, parse_workers=0, parse_batch_size=4
+    )
+    uris_by_collection = {
+        "c1": [f"/c1/{i}.json" for i in range(20)],
+        # duplicate URIs within a collection are fetched once
+        "c2": ["/c2/0.json", "/c2/0.json", "/c2/missing.json"],
+    }
+    reader = _get_reader(
+        {uri: uri for uri in uris_by_collection["c1"] + ["/c2/0.json"]}
+    )
+
+    async def get_collection_item_uris(collection, semaphore):
+        return (uris_by_collection[collection.id], [])
+
+    batch_sizes: List[int] = []
+
+    def parse_items(parser, row_builder, entries):
+        batch_sizes.append(len(entries))
+        return [({"uri": content}, []) for _, content, _ in entries]
+
+    ingested: List[str] = []
+    unchanged: List[str] = []
+
+    def ingestor(row):
+        ingested.append(row["uri"])
+        return []
+
+    def unchanged_ingestor(uri):
+        unchanged.append(uri)
+        return []
+
+    reader._get_collection_item_uris = get_collection_item_uris
+    parse_items_mock.side_effect = parse_items
+    errors = run(
+        reader.process_items(
+            [SimpleNamespace(id="c1"), SimpleNamespace(id="c2")],
+            _build_row,
+            ingestor,
+            # unchanged items are not fetched
+            get_previous_source_versions=lambda collection_id: {
+                "/c1/0.json": "v1",
+                "/c1/1.json": "v0",
+            }
+            if collection_id == "c1"
+            else {},
+            unchanged_ingestor=unchanged_ingestor,
+        )
+    )
+    assert sorted(ingested) == sorted(uris_by_collection["c1"][1:] + ["/c2/0.json"])
+    assert unchanged == ["/c1/0.json"]
+    assert max(batch_sizes) <= 4
+    assert [error.type for error in errors] == [IndexingErrorType.item_fetching]
+
+
+@patch("stac_index.indexer.stac_catalog_reader.get_settings")
+def test_process_items_parse_workers(get_settings_mock: Mock):
+    get_settings_mock.return_value = SimpleNamespace(
+        max_concurrency=2, item_queue_size=10, parse_workers=2, parse_batch_size=2
+    )
+    item = loads(basic_item_json)
+    contents_by_uri = {f"/c1/{i}.json": dumps({**item, "id": str(i)}) for i in range(5)}
+    contents_by_uri["/c1/invalid.json"] = dumps({**item, "type": "NotAFeature"})
+    contents_by_uri["/c1/not-json.json"] = "{"
+    reader = _get_reader(contents_by_uri)
+
+    async def get_collection_item_uris(collection, semaphore):
+        return (list(contents_by_uri.keys()), [])
+
+    rows: List[Dict[str, str]] = []
+
+    def ingestor(row):
+        rows.append(row)
+        return []
+
+    reader._get_collection_item_uris = get_collection_item_uris
+    errors = run(reader.process_items([SimpleNamespace(id="c1")], _build_row, ingestor))
+    assert sorted([row["id"] for row in rows]) == [str(i) for i in range(5)]
+    assert all([row["stac_location"] == f"/c1/{row['id']}.json" for row in rows])
+    assert all([row["source_version"] == "v1" for row in rows])
+    assert sorted([error.type for error in errors]) == sorted(
+        [IndexingErrorType.item_parsing, IndexingErrorType.item_fetching]
+    )
+
+
+def _get_catalog_dict(type: str, id: str, child_links: List[str]) -> Dict[str, Any]:
+    catalog_dict = {
+        "type": type,
+        "stac_version": "1.0.0",
+        "id": id,
+        "description": id,
+        "links": [{"rel": "child", "href": link} for link in child_links],
+    }
+    if type == "Collection":
+        catalog_dict.update(
+            {
+                "license": "proprietary",
+                "extent": {
+                    "spatial": {"bbox": [[-180, -90, 180, 90]]},
+                    "temporal": {"interval": [[None, None]]},
+                },
+            }
+        )
+    return catalog_dict
+
+
+@patch("stac_index.indexer.stac_catalog_reader.get_settings")
+def test_get_collections_traverses_catalog_tree(get_settings_mock: Mock):
+    get_settings_mock.return_value = SimpleNamespace(max_concurrency=3)
+    dicts_by_uri = {
+        "/a/catalog.json": _get_catalog_dict(
+            "Catalog", "a", ["/a/b/catalog.json", "/a/c1/collection.json"]
+        ),
+        # links back up the tree, and to an already-discovered collection, are followed once
+        "/a/b/catalog.json": _get_catalog_dict(
+            "Catalog",
+            "b",
+            [
+                "/a/catalog.json",
+                "/a/c1/collection.json",
+                "/a/b/c2/collection.json",
+                "/a/b/missing.json",
+            ],
+        ),
+        "/a/c1/collection.json": _get_catalog_dict("Collection", "c1", []),
+        "/a/b/c2/collection.json": _get_catalog_dict("Collection", "c2", []),
+    }
+    requested_uris: List[str] = []
+    reader = StacCatalogReader(root_catalog_uri="/catalog.json", fixes_to_apply=[])
+
+    async def get_json_content_from_uri(uri):
+        requested_uris.append(uri)
+        if uri not in dicts_by_uri:
+            raise Exception("not found")
+        return dicts_by_uri[uri]
+
+    reader._get_json_content_from_uri = get_json_content_from_uri
+    collections, errors = run(
+        reader.get_collections(
+            Catalog(**_get_catalog_dict("Catalog", "root", ["/a/catalog.json"]))
+        )
+    )
+    assert sorted([(c.id, c.location) for c in collections]) == [
+        ("c1", "/a/c1/collection.json"),
+        ("c2", "/a/b/c2/collection.json"),
+    ]
+    assert sorted(requested_uris) == sorted(
+        list(dicts_by_uri.keys()) + ["/a/b/missing.json"]
+    )
+    assert [error.type for error in errors] == [IndexingErrorType.collection_parsing]
+
+
+@patch("stac_index.indexer.stac_catalog_reader._parse_items")
+@patch("stac_index.indexer.stac_catalog_reader.get_settings")
+def test_process_items_collection_completed(
+    get_settings_mock: Mock, parse_items_mock: Mock
+):
+    get_settings_mock.return_value = SimpleNamespace(
+        max_concurrency=2, item_queue_size=2, parse_workers=0, parse_batch_size=2
+    )
+    uris_by_collection = {
+        "c1": [f"/c1/{i}.json" for i in range(5)] + ["/c1/missing.json"],
+        "c2": [f"/c2/{i}.json" for i in range(3)],
+        "c3": ["/c3/0.json"],
+    }
+    reader = _get_reader(
+        {
+            uri: uri
+            for uris in uris_by_collection.values()
+            for uri in uris
+            if uri != "/c1/missing.json"
+        }
+    )
+
+    async def get_collection_item_uris(collection, semaphore):
+        if collection.id == "c3":
+            return (
+                uris_by_collection["c3"],
+                [new_error(IndexingErrorType.item_fetching, "listing failed")],
+            )
+        return (uris_by_collection[collection.id], [])
+
+    ingested: List[str] = []
+    completed: Dict[str, List[str]] = {}
+
+    def ingestor(row):
+        ingested.append(row["uri"])
+        return []
+
+    def collection_completed(collection_id, errors):
+        # every item of a completed collection has been ingested
+        assert all(
+            [
+                uri in ingested
+                for uri in uris_by_collection[collection_id]
+                if uri != "/c1/missing.json" and uri not in ingested_uris
+            ]
+        )
+        completed[collection_id] = [error.description for error in errors]
+
+    ingested_uris = {"/c2/0.json"}
+    reader._get_collection_item_uris = get_collection_item_uris
+    parse_items_mock.side_effect = lambda parser, row_builder, entries: [
+        ({"uri": content}, []) for _, content, _ in entries
+    ]
+    errors = run(
+        reader.process_items(
+            [SimpleNamespace(id=id) for id in uris_by_collection.keys()],
+            _build_row,
+            ingestor,
+            get_ingested_uris=lambda collection_id: ingested_uris
+            if collection_id == "c2"
+            else set(),
+            collection_completed=collection_completed,
+        )
+    )
+    assert completed == {"c1": ["not found"], "c2": []}
+    assert "/c2/0.json" not in ingested
+    # listed versions of URIs that will not be fetched are released
+    reader._get_source_reader_for_uri().discard_source_versions.assert_any_call(
+        ["/c2/0.json"]
+    )
+    # a collection whose items could not all be listed does not complete
+    assert [error.description for error in errors] == ["listing failed"]
@@ -4,6 +4,7 @@ from typing import Final
 
 from asgi_correlation_id import CorrelationIdFilter
 
+from stac_fastapi.indexed.profiling import record_startup_phase
 from stac_fastapi.indexed.settings import get_settings
 
 _default_log_level: Final[int] = INFO
@@ -32,3 +33,4 @@ def configure_logging() -> None:
 
 
 configure_logging()
+record_startup_phase("configure logging")
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, Optional, Type, cast
+
+import attr
+from fastapi import Request
+from pydantic import BaseModel
+from stac_fastapi.extensions.core.aggregation.client import AsyncBaseAggregationClient
+from stac_fastapi.extensions.core.aggregation.types import (
+    Aggregation,
+    AggregationCollection,
+)
+
+from stac_fastapi.indexed.aggregation.aggregation_handler import (
+    AggregationHandler,
+    get_aggregation_definitions,
+)
+from stac_fastapi.indexed.aggregation.aggregation_request import AggregationPostRequest
+from stac_fastapi.indexed.constants import rel_root, rel_self
+from stac_fastapi.indexed.links.aggregation import get_aggregation_link
+from stac_fastapi.indexed.links.catalog import get_catalog_link
+from stac_fastapi.indexed.search.search_get_request import get_search_post_request
+
+
+@attr.s
+class AggregationClient(AsyncBaseAggregationClient):
+    post_request_model: Type[BaseModel] = attr.ib(default=AggregationPostRequest)
+
+    async def get_aggregations(
+        self,
+        request: Request,
+        collection_id: Optional[str] = None,
+        **kwargs: Any,
+    ) -> AggregationCollection:
+        return self._get_aggregation_collection(
+            request,
+            [
+                Aggregation(name=definition.name, data_type=definition.data_type)
+                for definition in await get_aggregation_definitions(
+                    collections=[collection_id] if collection_id is not None else None
+                )
+            ],
+        )
+
+    async def aggregate(
+        self,
+        aggregate_request: Optional[AggregationPostRequest] = None,
+        request: Optional[Request] = None,
+        **kwargs: Any,
+    ) -> AggregationCollection:
+        request = cast(Request, request)
+        if aggregate_request is None:
+            # GET requests provide search parameters as keyword arguments
+            aggregate_request = cast(
+                AggregationPostRequest,
+                get_search_post_request(self.post_request_model, request, **kwargs),
+            )
+        # collection-scoped endpoints share request models with the catalog-wide endpoints
+        collection_id = request.path_params.get("collection_id")
+        if collection_id is not None:
+            aggregate_request = aggregate_request.model_copy(
+                update={"collections": [collection_id]}
+            )
+        return self._get_aggregation_collection(
+            request,
+            await AggregationHandler(
+                search_request=aggregate_request,
+                request=request,
+                aggregations=aggregate_request.aggregations or ["total_count"],
+                geohash_precision=aggregate_request.geometry_geohash_grid_frequency_precision,
+                geotile_precision=aggregate_request.geometry_geotile_grid_frequency_precision,
+                datetime_interval=aggregate_request.datetime_frequency_interval,
+            ).aggregate(),
+        )
+
+    def _get_aggregation_collection(
+        self, request: Request, aggregations: List[Aggregation]
+    ) -> AggregationCollection:
+        links: List[Dict[str, Any]] = [
+            get_catalog_link(request, rel_root),
+            get_aggregation_link(request, rel_self),
+        ]
+        return AggregationCollection(
+            type="AggregationCollection",
+            aggregations=aggregations,
+            links=links,
+        )
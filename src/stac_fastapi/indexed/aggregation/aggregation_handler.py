@@ -0,0 +1,283 @@
+from asyncio import gather
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Final, List, Optional, Self, Set
+
+from stac_fastapi.extensions.core.aggregation.types import Aggregation, Bucket
+from stac_fastapi.types.errors import InvalidQueryParameter
+
+from stac_fastapi.indexed.aggregation.aggregation_request import (
+    default_datetime_interval,
+    default_geohash_precision,
+    default_geotile_precision,
+)
+from stac_fastapi.indexed.aggregation.types import DatetimeInterval
+from stac_fastapi.indexed.constants import collection_wildcard
+from stac_fastapi.indexed.db import fetchall, format_query_object_name
+from stac_fastapi.indexed.queryables.queryable_field_map import (
+    get_queryable_config_by_name,
+)
+from stac_fastapi.indexed.search.search_handler import SearchHandler
+from stac_fastapi.indexed.settings import get_settings
+
+_total_count: Final[str] = "total_count"
+_datetime_min: Final[str] = "datetime_min"
+_datetime_max: Final[str] = "datetime_max"
+_collection_frequency: Final[str] = "collection_frequency"
+_datetime_frequency: Final[str] = "datetime_frequency"
+_geohash_grid_frequency: Final[str] = "geometry_geohash_grid_frequency"
+_geotile_grid_frequency: Final[str] = "geometry_geotile_grid_frequency"
+
+_data_type_frequency: Final[str] = "frequency_distribution"
+_numeric_column_types: Final[Set[str]] = {
+    "TINYINT",
+    "SMALLINT",
+    "INTEGER",
+    "BIGINT",
+    "HUGEINT",
+    "UTINYINT",
+    "USMALLINT",
+    "UINTEGER",
+    "UBIGINT",
+    "FLOAT",
+    "DOUBLE",
+}
+_numeric_stats: Final[Dict[str, str]] = {
+    "min": "MIN",
+    "max": "MAX",
+    "avg": "AVG",
+}
+# geotile keys cannot be calculated beyond the Web Mercator latitude limit
+_max_mercator_latitude: Final[float] = 85.0511287798066
+
+
+@dataclass
+class AggregationDefinition:
+    name: str
+    data_type: str
+    # an aggregate expression for single-value aggregations, or a bucket key expression for frequency distributions
+    expression: str
+
+    def is_frequency(self: Self) -> bool:
+        return self.data_type == _data_type_frequency
+
+
+@dataclass
+class AggregationHandler(SearchHandler):
+    aggregations: List[str] = field(default_factory=lambda: [_total_count])
+    geohash_precision: Optional[int] = None
+    geotile_precision: Optional[int] = None
+    datetime_interval: Optional[DatetimeInterval] = None
+
+    async def aggregate(self: Self) -> List[Aggregation]:
+        query_info = await self._new_query_info()
+        available = {
+            definition.name: definition
+            for definition in await get_aggregation_definitions(
+                collections=query_info.collections,
+                geohash_precision=self.geohash_precision,
+                geotile_precision=self.geotile_precision,
+                datetime_interval=self.datetime_interval,
+            )
+        }
+        unknown = [name for name in self.aggregations if name not in available]
+        if len(unknown) > 0:
+            raise InvalidQueryParameter(
+                "unsupported aggregations '{}', see aggregations endpoints".format(
+                    "', '".join(unknown)
+                )
+            )
+        requested = [available[name] for name in dict.fromkeys(self.aggregations)]
+        clauses, params = await self._get_query_clauses(query_info)
+        where = "WHERE {}".format(" AND ".join(clauses)) if len(clauses) > 0 else ""
+        single_values = [
+            definition for definition in requested if not definition.is_frequency()
+        ]
+        frequencies = [
+            definition for definition in requested if definition.is_frequency()
+        ]
+        # every aggregation is answered by the index alone, run each query concurrently
+        single_value_results, *frequency_results = await gather(
+            self._get_single_values(single_values, where, params),
+            *[
+                self._get_frequency(definition, where, params)
+                for definition in frequencies
+            ],
+        )
+        results_by_name = {
+            **single_value_results,
+            **{
+                definition.name: result
+                for definition, result in zip(frequencies, frequency_results)
+            },
+        }
+        return [results_by_name[definition.name] for definition in requested]
+
+    async def _get_single_values(
+        self: Self,
+        definitions: List[AggregationDefinition],
+        where: str,
+        params: List[Any],
+    ) -> Dict[str, Aggregation]:
+        if len(definitions) == 0:
+            return {}
+        # all single-value aggregations share one scan
+        rows = await fetchall(
+            "SELECT {expressions} FROM {table_name} {where}".format(
+                expressions=", ".join(
+                    [definition.expression for definition in definitions]
+                ),
+                table_name=format_query_object_name("items"),
+                where=where,
+            ),
+            params,
+        )
+        return {
+            definition.name: Aggregation(
+                name=definition.name,
+                data_type=definition.data_type,
+                value=_format_value(value),
+            )
+            for definition, value in zip(definitions, rows[0])
+        }
+
+    async def _get_frequency(
+        self: Self,
+        definition: AggregationDefinition,
+        where: str,
+        params: List[Any],
+    ) -> Aggregation:
+        # Fine grids can have one bucket per item, so only the most frequent buckets are returned.
+        # The total across all buckets gives the number of items in buckets that were cut off.
+        rows = await fetchall(
+            """
+            SELECT key, COUNT(*) AS frequency, SUM(COUNT(*)) OVER () AS total_frequency
+              FROM (SELECT {expression} AS key FROM {table_name} {where})
+             WHERE key IS NOT NULL
+          GROUP BY key
+          ORDER BY frequency DESC, key
+             LIMIT ?
+            """.format(
+                expression=definition.expression,
+                table_name=format_query_object_name("items"),
+                where=where,
+            ),
+            params + [get_settings().aggregation_max_buckets],
+        )
+        return Aggregation(
+            name=definition.name,
+            data_type=definition.data_type,
+            overflow=int(rows[0][2]) - sum([row[1] for row in rows])
+            if len(rows) > 0
+            else 0,
+            buckets=[
+                Bucket(
+                    key=_format_value(row[0]),
+                    data_type=_data_type_frequency,
+                    frequency=row[1],
+                )
+                for row in rows
+            ],
+        )
+
+
+async def get_aggregation_definitions(
+    collections: Optional[List[str]] = None,
+    geohash_precision: Optional[int] = None,
+    geotile_precision: Optional[int] = None,
+    datetime_interval: Optional[DatetimeInterval] = None,
+) -> List[AggregationDefinition]:
+    # Expressions are built from validated integers, enum values and configured column names only,
+    # so that no caller-provided text is concatenated into SQL.
+    definitions = [
+        AggregationDefinition(
+            name=_total_count,
+            data_type="integer",
+            expression="COUNT(*)",
+        ),
+        AggregationDefinition(
+            name=_datetime_min,
+            data_type="datetime",
+            expression="MIN(COALESCE(datetime, start_datetime))",
+        ),
+        AggregationDefinition(
+            name=_datetime_max,
+            data_type="datetime",
+            expression="MAX(COALESCE(datetime, end_datetime))",
+        ),
+        AggregationDefinition(
+            name=_collection_frequency,
+            data_type=_data_type_frequency,
+            expression="collection_id",
+        ),
+        AggregationDefinition(
+            name=_datetime_frequency,
+            data_type=_data_type_frequency,
+            expression="date_trunc('{}', COALESCE(datetime, start_datetime))".format(
+                DatetimeInterval(datetime_interval or default_datetime_interval).value
+            ),
+        ),
+        AggregationDefinition(
+            name=_geohash_grid_frequency,
+            data_type=_data_type_frequency,
+            expression="ST_GeoHash(ST_Centroid(geometry), {})".format(
+                int(geohash_precision or default_geohash_precision)
+            ),
+        ),
+        AggregationDefinition(
+            name=_geotile_grid_frequency,
+            data_type=_data_type_frequency,
+            expression=_get_geotile_key_expression(
+                int(
+                    geotile_precision
+                    if geotile_precision is not None
+                    else default_geotile_precision
+                )
+            ),
+        ),
+    ]
+    collection_ids = collections or []
+    for entry in (await get_queryable_config_by_name()).values():
+        if entry.items_column_type not in _numeric_column_types:
+            continue
+        if (
+            len(collection_ids) == 0
+            or entry.collection_id == collection_wildcard
+            or entry.collection_id in collection_ids
+        ):
+            for stat_name, stat_function in _numeric_stats.items():
+                definitions.append(
+                    AggregationDefinition(
+                        name=f"{entry.name}_{stat_name}",
+                        data_type="numeric",
+                        expression=f'{stat_function}("{entry.items_column}")',
+                    )
+                )
+    return definitions
+
+
+def _get_geotile_key_expression(zoom: int) -> str:
+    # Slippy map tile of each item's centroid, as "{zoom}/{x}/{y}"
+    tile_count = 2**zoom
+    longitude = "ST_X(ST_Centroid(geometry))"
+    latitude = (
+        "radians(greatest(least(ST_Y(ST_Centroid(geometry)), {max}), -{max}))".format(
+            max=_max_mercator_latitude
+        )
+    )
+    return (
+        "'{zoom}/' || least(floor(({longitude} + 180) / 360 * {tile_count}), {max_index})::BIGINT"
+        " || '/' || least(floor((1 - ln(tan({latitude}) + 1 / cos({latitude})) / pi()) / 2 * {tile_count}), {max_index})::BIGINT"
+    ).format(
+        zoom=zoom,
+        longitude=longitude,
+        latitude=latitude,
+        tile_count=tile_count,
+        max_index=tile_count - 1,
+    )
+
+
+def _format_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
@@ -0,0 +1,54 @@
+from typing import Final, List, Optional
+
+import attr
+from fastapi import Query
+from pydantic import Field
+from stac_fastapi.types.search import BaseSearchPostRequest, str2list
+from typing_extensions import Annotated
+
+from stac_fastapi.indexed.aggregation.types import DatetimeInterval
+from stac_fastapi.indexed.search.search_get_request import SearchGetRequest
+
+default_geohash_precision: Final[int] = 1
+default_geotile_precision: Final[int] = 0
+default_datetime_interval: Final[DatetimeInterval] = DatetimeInterval.MONTH
+# geohash precision is limited to 12 characters, geotile zoom follows common web map tile limits
+_max_geohash_precision: Final[int] = 12
+_max_geotile_precision: Final[int] = 29
+
+
+def _aggregations_converter(
+    val: Annotated[
+        Optional[str],
+        Query(description="A list of aggregations to compute and return."),
+    ] = None,
+) -> Optional[List[str]]:
+    return str2list(val)
+
+
+@attr.s
+class AggregationGetRequest(SearchGetRequest):
+    aggregations: Optional[List[str]] = attr.ib(
+        default=None, converter=_aggregations_converter
+    )
+    geometry_geohash_grid_frequency_precision: Annotated[
+        Optional[int], Query(ge=1, le=_max_geohash_precision)
+    ] = attr.ib(default=None)
+    geometry_geotile_grid_frequency_precision: Annotated[
+        Optional[int], Query(ge=0, le=_max_geotile_precision)
+    ] = attr.ib(default=None)
+    datetime_frequency_interval: Optional[DatetimeInterval] = attr.ib(default=None)
+
+
+class AggregationPostRequest(BaseSearchPostRequest):
+    aggregations: Optional[List[str]] = Field(
+        default=None,
+        description="A list of aggregations to compute and return.",
+    )
+    geometry_geohash_grid_frequency_precision: Optional[int] = Field(
+        default=None, ge=1, le=_max_geohash_precision
+    )
+    geometry_geotile_grid_frequency_precision: Optional[int] = Field(
+        default=None, ge=0, le=_max_geotile_precision
+    )
+    datetime_frequency_interval: Optional[DatetimeInterval] = None
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class DatetimeInterval(str, Enum):
+    YEAR = "year"
+    MONTH = "month"
+    DAY = "day"
+    HOUR = "hour"
@@ -15,32 +15,90 @@ from stac_fastapi.api.models import (
     create_request_model,
 )
 from stac_fastapi.extensions.core import (
+    AggregationExtension,
+    CollectionSearchExtension,
+    FieldsExtension,
     FilterExtension,
+    FreeTextExtension,
     SortExtension,
     TokenPaginationExtension,
 )
+from stac_fastapi.extensions.core.collection_search import ConformanceClasses
 from stac_index.indexer.types.indexing_error import IndexingError
 
+from stac_fastapi.indexed.aggregation.aggregation_client import AggregationClient
+from stac_fastapi.indexed.aggregation.aggregation_request import (
+    AggregationGetRequest,
+    AggregationPostRequest,
+)
+from stac_fastapi.indexed.collection_search.collection_search_get_request import (
+    CollectionSearchGetRequest,
+)
 from stac_fastapi.indexed.core import CoreCrudClient
 from stac_fastapi.indexed.db import connect_to_db, disconnect_from_db
 from stac_fastapi.indexed.errors import get_all_errors
+from stac_fastapi.indexed.export.routes import add_routes as add_export_routes
+from stac_fastapi.indexed.middleware.index_generation_middleware import (
+    IndexGenerationMiddleware,
+)
+from stac_fastapi.indexed.middleware.query_cancellation_middleware import (
+    QueryCancellationMiddleware,
+)
 from stac_fastapi.indexed.middleware.request_log_middleware import RequestLogMiddleware
+from stac_fastapi.indexed.profiling import record_startup_phase
 from stac_fastapi.indexed.search.filter.filter_client import FiltersClient
 from stac_fastapi.indexed.search.search_get_request import SearchGetRequest
 from stac_fastapi.indexed.settings import get_settings
 from stac_fastapi.indexed.sortables.routes import add_routes as add_sortables_routes
+from stac_fastapi.indexed.warm_up import warm_up_index_generation
 
 _logger: Final[Logger] = getLogger(__name__)
+record_startup_phase("import application modules")
 
 extensions_map = {
     "sort": SortExtension(),
     "pagination": TokenPaginationExtension(),
     "filter": FilterExtension(client=FiltersClient()),
+    "fields": FieldsExtension(),
+    "free_text": FreeTextExtension(),
 }
 
 extensions = list(extensions_map.values())
 post_request_model = create_post_request_model(extensions)
 
+# Aggregation accepts the same search parameters as search, so is excluded from the search request models.
+aggregation_post_request_model = create_request_model(
+    "AggregationPostRequest",
+    base_model=AggregationPostRequest,
+    extensions=extensions,
+    request_type="POST",
+)
+aggregation_extension = AggregationExtension(
+    client=AggregationClient(post_request_model=aggregation_post_request_model)
+)
+aggregation_extension.GET = create_request_model(
+    "AggregationGetRequest",
+    base_model=AggregationGetRequest,
+    extensions=extensions,
+    request_type="GET",
+)
+aggregation_extension.POST = aggregation_post_request_model
+
+# Collection search parameters apply to /collections only, so are excluded from the search request models.
+collection_search_extension = CollectionSearchExtension(
+    GET=create_request_model(
+        "CollectionsGetRequest",
+        base_model=CollectionSearchGetRequest,
+        mixins=[FreeTextExtension().GET, TokenPaginationExtension().GET],
+        request_type="GET",
+    ),
+    conformance_classes=[
+        ConformanceClasses.COLLECTIONSEARCH,
+        ConformanceClasses.BASIS,
+        ConformanceClasses.FREETEXT,
+    ],
+)
+
 
 def fastapi_factory() -> FastAPI:
     fapi_args = {
@@ -56,9 +114,10 @@ def fastapi_factory() -> FastAPI:
 api = StacApi(
     app=fastapi_factory(),
     settings=get_settings(),
-    extensions=extensions,
+    extensions=extensions + [aggregation_extension, collection_search_extension],
     client=CoreCrudClient(post_request_model=post_request_model),  # type: ignore
     response_class=ORJSONResponse,
+    collections_get_request_model=collection_search_extension.GET,
     items_get_request_model=create_request_model(
         "ItemCollectionURI",
         base_model=ItemCollectionUri,
@@ -74,17 +133,21 @@ api = StacApi(
         Middleware(RequestLogMiddleware),
         Middleware(CorrelationIdMiddleware),
         Middleware(BrotliMiddleware),
+        Middleware(IndexGenerationMiddleware),
+        Middleware(QueryCancellationMiddleware),
     ],
 )
 app = api.app
 add_sortables_routes(app)
+add_export_routes(app, post_request_model)
+record_startup_phase("configure application")
 
 
 @app.on_event(
     "startup"
 )  # deprecated event handlers because of stac-fastapi, not yet able to use lifespan approach
 async def startup_event():
-    await connect_to_db()
+    await connect_to_db(generation_warmers=[warm_up_index_generation])
 
 
 @app.on_event("shutdown")
@@ -130,6 +193,8 @@ def create_handler(app):
                 "text/",
                 "application/json",
                 "application/geo+json",
+                "application/geo+json-seq",
+                "application/x-ndjson",
                 "application/schema+json",
                 "application/vnd.oai.openapi",
             ],
@@ -138,4 +203,11 @@ def create_handler(app):
         return None
 
 
-handler = create_handler(app)
+def __getattr__(name: str):
+    # The Lambda handler is only created when requested by the Lambda runtime,
+    # so that other deployments do not import mangum.
+    if name == "handler":
+        global handler
+        handler = create_handler(app)
+        return handler
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -0,0 +1,21 @@
+from typing import Optional
+
+import attr
+from fastapi import Query
+from stac_fastapi.extensions.core.collection_search.request import (
+    BaseCollectionSearchGetRequest,
+)
+from stac_fastapi.types.search import Limit
+from typing_extensions import Annotated
+
+
+@attr.s
+class CollectionSearchGetRequest(BaseCollectionSearchGetRequest):
+    datetime: Optional[str] = attr.ib(default=None)
+    # all collections are returned unless a limit is requested, consistent with responses before collection search
+    limit: Annotated[
+        Optional[Limit],
+        Query(
+            description="Limits the number of results that are included in each page of the response."
+        ),
+    ] = attr.ib(default=None)
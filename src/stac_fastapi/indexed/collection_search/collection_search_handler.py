@@ -0,0 +1,202 @@
+from asyncio import gather
+from dataclasses import dataclass
+from datetime import datetime
+from logging import Logger, getLogger
+from typing import Any, Dict, Final, List, Optional, Self, Set, Tuple, cast
+
+from async_lru import alru_cache
+from fastapi import HTTPException, Request, status
+from stac_fastapi.types.errors import InvalidQueryParameter
+from stac_fastapi.types.rfc3339 import str_to_interval
+from stac_fastapi.types.stac import Collection, Collections
+from stac_index.io.readers.exceptions import UriNotFoundException
+from stac_pydantic.shared import BBox
+
+from stac_fastapi.indexed.constants import rel_parent, rel_root, rel_self
+from stac_fastapi.indexed.db import fetchall, format_query_object_name, get_last_load_id
+from stac_fastapi.indexed.links.catalog import get_catalog_link
+from stac_fastapi.indexed.links.collection import (
+    fix_collection_links,
+    get_collections_link,
+)
+from stac_fastapi.indexed.links.search import get_token_link
+from stac_fastapi.indexed.search.filter_clause import FilterClause
+from stac_fastapi.indexed.search.spatial import get_intersects_clause_for_bbox
+from stac_fastapi.indexed.search.token import create_offset_token, get_offset_from_token
+from stac_fastapi.indexed.search.types import SearchDirection, SearchMethod
+from stac_fastapi.indexed.stac.fetcher import fetch_dict
+
+_logger: Final[Logger] = getLogger(__name__)
+# collection columns required by each filter, absent from indexes created by earlier indexer versions
+_bbox_columns: Final[List[str]] = ["geometry"]
+_datetime_columns: Final[List[str]] = ["start_datetime", "end_datetime"]
+_q_columns: Final[List[str]] = ["title", "description", "keywords"]
+
+
+@dataclass
+class CollectionSearchHandler:
+    request: Request
+    bbox: Optional[BBox] = None
+    datetime: Optional[str] = None
+    q: Optional[List[str]] = None
+    limit: Optional[int] = None
+    token: Optional[str] = None
+
+    async def search(self: Self) -> Collections:
+        offset = 0
+        if self.token is not None:
+            offset, token_load_id = get_offset_from_token(self.token)
+            # do not permit paging across data changes as paged results may be inconsistent
+            if token_load_id != get_last_load_id():
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="STAC data recently changed and paging behaviour cannot be guaranteed. Remove the paging token to start again.",
+                )
+        clauses: List[str] = []
+        params: List[Any] = []
+        additions: List[Tuple[str, Optional[FilterClause], List[str]]] = [
+            ("bbox", self._include_bbox(), _bbox_columns),
+            ("datetime", self._include_datetime(), _datetime_columns),
+            ("q", self._include_q(), _q_columns),
+        ]
+        if any([addition is not None for _, addition, _ in additions]):
+            column_names = await get_collection_column_names()
+        for parameter_name, addition, required_columns in additions:
+            if addition is not None:
+                if not set(required_columns).issubset(column_names):
+                    raise InvalidQueryParameter(
+                        f"collection search by {parameter_name} requires an index created by a later indexer version"
+                    )
+                clauses.append(addition.sql)
+                params.extend(addition.params)
+        query = """
+            SELECT stac_location, COUNT(*) OVER () AS number_matched
+            FROM {table_name}
+              {where}
+              ORDER BY id
+              {limit}
+              OFFSET ?
+            """.format(
+            table_name=format_query_object_name("collections"),
+            where="WHERE {}".format(" AND ".join(clauses)) if len(clauses) > 0 else "",
+            limit="LIMIT ?" if self.limit is not None else "",
+        )
+        if self.limit is not None:
+            # request one more so that we know if there's a next page of results
+            params.append(self.limit + 1)
+        params.append(offset)
+        rows = await fetchall(query, params)
+        page_rows = rows[0 : self.limit] if self.limit is not None else rows
+        collections = [
+            fix_collection_links(Collection(**collection_dict), self.request)
+            for collection_dict in await gather(
+                *[self._get_each_collection(row[0]) for row in page_rows]
+            )
+            if collection_dict is not None
+        ]
+        links = [
+            get_catalog_link(self.request, rel_root),
+            get_catalog_link(self.request, rel_parent),
+            get_collections_link(self.request, rel_self),
+        ]
+        if self.limit is not None:
+            if len(rows) > self.limit:
+                links.append(
+                    get_token_link(
+                        self.request,
+                        SearchDirection.Next,
+                        SearchMethod.GET,
+                        create_offset_token(offset + self.limit, get_last_load_id()),
+                    )
+                )
+            if offset > 0:
+                links.append(
+                    get_token_link(
+                        self.request,
+                        SearchDirection.Previous,
+                        SearchMethod.GET,
+                        create_offset_token(
+                            max(offset - self.limit, 0), get_last_load_id()
+                        ),
+                    )
+                )
+        return cast(
+            Collections,
+            {
+                "collections": collections,
+                "links": links,
+                "numberMatched": rows[0][1] if len(rows) > 0 else 0,
+                "numberReturned": len(collections),
+            },
+        )
+
+    async def _get_each_collection(self: Self, uri: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await fetch_dict(uri=uri)
+        except UriNotFoundException:
+            _logger.warning(
+                "Collection '{uri}' exists in the index but does not exist in the data store, index is outdated".format(
+                    uri=uri
+                )
+            )
+            return None
+
+    def _include_bbox(self: Self) -> Optional[FilterClause]:
+        if self.bbox is not None:
+            if len(self.bbox) == 4:
+                return get_intersects_clause_for_bbox(*self.bbox)
+            elif len(self.bbox) == 6:
+                return get_intersects_clause_for_bbox(
+                    self.bbox[0], self.bbox[1], self.bbox[3], self.bbox[4]
+                )
+        return None
+
+    def _include_datetime(self: Self) -> Optional[FilterClause]:
+        # NULL extent bounds are open, and overlap any requested time
+        if self.datetime:
+            datetime_arg = str_to_interval(self.datetime)
+            if isinstance(datetime_arg, datetime):
+                interval_start, interval_end = datetime_arg, datetime_arg
+            elif isinstance(datetime_arg, tuple):
+                interval_start, interval_end = datetime_arg
+            else:
+                return None
+            clauses: List[str] = []
+            params: List[Any] = []
+            if interval_end is not None:
+                clauses.append("(start_datetime IS NULL OR start_datetime <= ?)")
+                params.append(interval_end)
+            if interval_start is not None:
+                clauses.append("(end_datetime IS NULL OR end_datetime >= ?)")
+                params.append(interval_start)
+            if len(clauses) > 0:
+                return FilterClause(sql=" AND ".join(clauses), params=params)
+        return None
+
+    def _include_q(self: Self) -> Optional[FilterClause]:
+        # https://github.com/stac-api-extensions/freetext-search#basic
+        # terms are combined with OR and matched case-insensitively against title, description and keywords
+        terms = [term.strip().lower() for term in self.q or [] if term.strip()]
+        if len(terms) > 0:
+            text = "lower(concat_ws(' ', title, description, array_to_string(keywords, ' ')))"
+            return FilterClause(
+                sql="({})".format(" OR ".join([f"contains({text}, ?)" for _ in terms])),
+                params=terms,
+            )
+        return None
+
+
+async def get_collection_column_names() -> Set[str]:
+    # ensure a change to the application's last load ID forces a data reload
+    return await _get_collection_column_names(get_last_load_id())
+
+
+# one entry for each of the current and reloading index generations
+@alru_cache(maxsize=2)
+async def _get_collection_column_names(_: str) -> Set[str]:
+    return {
+        row[0]
+        for row in await fetchall(
+            f"SELECT column_name FROM (DESCRIBE SELECT * FROM {format_query_object_name('collections')})"
+        )
+    }
@@ -12,3 +12,6 @@ rel_previous: Final[str] = "previous"
 type_json: Final[str] = "application/json"
 type_geojson: Final[str] = "application/geo+json"
 collection_wildcard: Final[str] = "*"
+type_geojson_seq: Final[str] = "application/geo+json-seq"
+type_ndjson: Final[str] = "application/x-ndjson"
+type_parquet: Final[str] = "application/vnd.apache.parquet"
@@ -1,12 +1,8 @@
-from asyncio import gather
-from json import loads
 from logging import Logger, getLogger
-from re import IGNORECASE, match, search
-from typing import Any, Dict, Final, List, Optional, cast
-from urllib.parse import unquote_plus
+from typing import Final, List, Optional, cast
 
 import attr
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import ValidationError
 from stac_fastapi.types.core import AsyncBaseCoreClient
 from stac_fastapi.types.errors import NotFoundError
@@ -17,24 +13,35 @@ from stac_index.indexer.stac_parser import StacParser
 from stac_index.io.readers.exceptions import UriNotFoundException
 from stac_pydantic.shared import BBox
 
-from stac_fastapi.indexed.constants import rel_parent, rel_root, rel_self
-from stac_fastapi.indexed.db import fetchall, fetchone, format_query_object_name
-from stac_fastapi.indexed.links.catalog import get_catalog_link
-from stac_fastapi.indexed.links.collection import (
-    fix_collection_links,
-    get_collections_link,
+from stac_fastapi.indexed.collection_search.collection_search_handler import (
+    CollectionSearchHandler,
 )
+from stac_fastapi.indexed.db import fetchall, fetchone, format_query_object_name
+from stac_fastapi.indexed.links.collection import fix_collection_links
 from stac_fastapi.indexed.links.item import fix_item_links
-from stac_fastapi.indexed.search.filter.parser import FilterLanguage
+from stac_fastapi.indexed.search.search_get_request import get_search_post_request
 from stac_fastapi.indexed.search.search_handler import SearchHandler
 from stac_fastapi.indexed.stac.fetcher import fetch_dict
+from stac_fastapi.indexed.warm_up import (
+    get_prefetched_collection,
+    record_collection_request,
+)
 
 _logger: Final[Logger] = getLogger(__name__)
 
 
 @attr.s
 class CoreCrudClient(AsyncBaseCoreClient):
-    async def all_collections(self, request: Request, **kwargs) -> Collections:
+    async def all_collections(
+        self,
+        request: Request,
+        bbox: Optional[BBox] = None,
+        datetime: Optional[str] = None,
+        limit: Optional[int] = None,
+        q: Optional[List[str]] = None,
+        token: Optional[str] = None,
+        **kwargs,
+    ) -> Collections:
         # Alter how call is answered based on who is asking.
         # Catalog root requests (/) requires a link for each collection, but doesn't use any other collection data.
         # All Collections requests (/collections) requires all data about all collections.
@@ -47,8 +54,16 @@ class CoreCrudClient(AsyncBaseCoreClient):
             _logger.debug(f"answering '{request.url}' as minimal collections response")
             return await self._get_minimal_collections_response()
         else:
-            _logger.debug(f"answering '{request.url}' as full collections response")
-            return await self._get_full_collections_response(request)
+            _logger.debug(f"answering '{request.url}' as collection search response")
+            # collections are filtered and paged in the index, only collections being returned are fetched
+            return await CollectionSearchHandler(
+                request=request,
+                bbox=bbox,
+                datetime=datetime,
+                q=q,
+                limit=limit,
+                token=token,
+            ).search()
 
     async def get_collection(
         self, collection_id: str, request: Request, **kwargs
@@ -58,9 +73,16 @@ class CoreCrudClient(AsyncBaseCoreClient):
             [collection_id],
         )
         if row is not None:
+            # only indexed collections are counted, so that requests cannot grow the counts without bound
+            record_collection_request(collection_id)
             try:
                 return fix_collection_links(
-                    Collection(**await fetch_dict(row[0])),
+                    Collection(
+                        **(
+                            get_prefetched_collection(row[0])
+                            or await fetch_dict(row[0])
+                        )
+                    ),
                     request,
                 )
             except UriNotFoundException as e:
@@ -90,7 +112,7 @@ class CoreCrudClient(AsyncBaseCoreClient):
         limit: Optional[int] = None,
         token: Optional[str] = None,
         **kwargs,
-    ) -> ItemCollection:
+    ) -> ItemCollection | Response:
         try:
             search_request = self.post_request_model(
                 **{
@@ -153,7 +175,7 @@ class CoreCrudClient(AsyncBaseCoreClient):
 
     async def post_search(
         self, search_request: BaseSearchPostRequest, request: Request, **kwargs
-    ) -> ItemCollection:
+    ) -> ItemCollection | Response:
         return await SearchHandler(
             search_request=search_request, request=request
         ).search()
@@ -173,57 +195,25 @@ class CoreCrudClient(AsyncBaseCoreClient):
         filter: Optional[str] = None,
         filter_lang: Optional[str] = None,
         intersects: Optional[str] = None,
+        q: Optional[List[str]] = None,
         **kwargs,
-    ) -> ItemCollection:
-        base_args = {
-            "collections": collections,
-            "ids": ids,
-            "bbox": bbox,
-            "datetime": datetime,
-            "limit": limit,
-            "token": token,
-        }
-        if sortby:
-            # https://github.com/radiantearth/stac-spec/tree/master/api-spec/extensions/sort#http-get-or-post-form
-            sort_param = []
-            for sort in sortby:
-                sortparts = match(r"^([+-]?)(.*)$", sort)
-                if sortparts:
-                    sort_param.append(
-                        {
-                            "field": sortparts.group(2).strip(),
-                            "direction": "desc" if sortparts.group(1) == "-" else "asc",
-                        }
-                    )
-            base_args["sortby"] = sort_param
-        if intersects:
-            base_args["intersects"] = loads(unquote_plus(intersects))
-        if filter:
-            # following block based on https://github.com/stac-utils/stac-fastapi-pgstac/blob/659ddc374b7001dc7c7ad2cc2fd29e3f420b0573/stac_fastapi/pgstac/core.py#L373
-            # Kludgy fix because using factory does not allow alias for filter-lang
-            if filter_lang is None:
-                lang_match = search(
-                    r"filter-lang=([a-z0-9-]+)", str(request.query_params), IGNORECASE
-                )
-                if lang_match:
-                    filter_lang = lang_match.group(1)
-            filter_lang = filter_lang or FilterLanguage.TEXT.value
-            # prefer to wrap / unwrap filter content here than parse, convert, and re-parse
-            base_args["filter"] = SearchHandler.wrap_text_filter(filter, filter_lang)
-            base_args["filter-lang"] = filter_lang
-        try:
-            search_request = self.post_request_model(
-                **{
-                    key: value
-                    for key, value in base_args.items()
-                    if value is not None and value != []
-                }
-            )
-        except ValidationError as e:
-            raise HTTPException(
-                status_code=400, detail=f"Invalid parameters provided {e}"
-            ) from e
-
+    ) -> ItemCollection | Response:
+        search_request = get_search_post_request(
+            self.post_request_model,
+            request,
+            collections=collections,
+            ids=ids,
+            bbox=bbox,
+            datetime=datetime,
+            limit=limit,
+            token=token,
+            fields=fields,
+            sortby=sortby,
+            filter=filter,
+            filter_lang=filter_lang,
+            intersects=intersects,
+            q=q,
+        )
         return await SearchHandler(
             search_request=search_request, request=request
         ).search()
@@ -241,42 +231,3 @@ class CoreCrudClient(AsyncBaseCoreClient):
             ],
             links=[],
         )
-
-    async def _get_full_collections_response(self, request: Request) -> Collections:
-        async def get_each_collection(uri: str) -> Optional[Dict[str, Any]]:
-            try:
-                return await fetch_dict(uri=uri)
-            except UriNotFoundException:
-                _logger.warning(
-                    "Collection '{uri}' exists in the index but does not exist in the data store, index is outdated".format(
-                        uri=uri
-                    )
-                )
-                return None
-
-        fetch_tasks = [
-            get_each_collection(uri)
-            for uri in [
-                row[0]
-                for row in await fetchall(
-                    f"SELECT stac_location FROM {format_query_object_name('collections')} ORDER BY id"
-                )
-            ]
-        ]
-        collections = [
-            fix_collection_links(
-                Collection(**collection_dict),
-                request,
-            )
-            for collection_dict in [
-                entry for entry in await gather(*fetch_tasks) if entry is not None
-            ]
-        ]
-        return Collections(
-            collections=collections,
-            links=[
-                get_catalog_link(request, rel_root),
-                get_catalog_link(request, rel_parent),
-                get_collections_link(request, rel_self),
-            ],
-        )
@@ -1,68 +1,146 @@
+from asyncio import CancelledError, Task, create_task, shield, to_thread, wait
+from contextlib import asynccontextmanager, contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from datetime import UTC, datetime
+from itertools import count
 from logging import Logger, getLogger
 from os import environ
 from time import time
-from typing import Any, Dict, Final, List, Optional
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Final,
+    Iterator,
+    List,
+    Optional,
+    Self,
+    TypeVar,
+)
 
 from duckdb import DuckDBPyConnection
 from duckdb import connect as duckdb_connect
-from stac_index.indexer.creator.creator import IndexCreator
+from fastapi import HTTPException, status
+from stac_index.indexer.types.item_delta import format_items_with_deltas
 from stac_index.io.readers import get_reader_for_uri
 from stac_index.io.readers.exceptions import MissingIndexException
-from stac_index.io.readers.source_reader import IndexReader
 
+from stac_fastapi.indexed.profiling import log_startup_profile, record_startup_phase
 from stac_fastapi.indexed.settings import get_settings
 
 _logger: Final[Logger] = getLogger(__name__)
 _query_timing_precision: Final[int] = 3
+# how often a running statement checks whether its request's client has disconnected
+_disconnect_poll_interval: Final[float] = 0.1
+
+IndexGenerationWarmer = Callable[[], Awaitable[Any]]
+DisconnectCheck = Callable[[], Awaitable[bool]]
+T = TypeVar("T")
+
+
+@dataclass(kw_only=True)
+class IndexGeneration:
+    """A consistent snapshot of one index load.
+
+    A generation is fully prepared before it becomes current, and each request uses a single
+    generation from start to finish, so requests never observe a partially loaded index.
+
+    """
+
+    load_id: str
+    manifest_last_modified: int
+    parquet_uris: Dict[str, str] = field(default_factory=dict)
+    database_uri: Optional[str] = None
+    # item changes applied since the items table was created, in order
+    item_delta_uris: List[str] = field(default_factory=list)
+    database_alias: Optional[str] = None
+    database_table_names: Dict[str, str] = field(default_factory=dict)
+    active_requests: int = 0
+    retired: bool = False
+
+    def format_query_object_name(self: Self, object_name: str) -> str:
+        if object_name == "items":
+            return format_items_with_deltas(
+                self._format_table_name(object_name),
+                [f"'{uri}'" for uri in self.item_delta_uris],
+            )
+        return self._format_table_name(object_name)
+
+    def _format_table_name(self: Self, object_name: str) -> str:
+        if object_name in self.database_table_names:
+            return self.database_table_names[object_name]
+        if object_name in self.parquet_uris:
+            return "'{}'".format(self.parquet_uris[object_name])
+        raise Exception(
+            "Attempt to use non-existent query object name '{bad_name}'. Available object names: '{availables}'".format(
+                bad_name=object_name,
+                availables="', '".join(list(self.parquet_uris.keys())),
+            )
+        )
+
+    def has_query_object(self: Self, object_name: str) -> bool:
+        return (
+            object_name in self.database_table_names or object_name in self.parquet_uris
+        )
+
 
 _root_db_connection: DuckDBPyConnection = None
-_parquet_uris: Dict[str, str] = {}
-_index_manifest_last_modified: int = 0
-_last_load_id: Optional[str] = None
+_current_generation: Optional[IndexGeneration] = None
+_reload_task: Optional[Task] = None
+_generation_warmers: List[IndexGenerationWarmer] = []
+_generation_sequence: Final[Iterator[int]] = count(1)
+_request_generation: ContextVar[Optional[IndexGeneration]] = ContextVar(
+    "request_generation", default=None
+)
+_request_disconnect_check: ContextVar[Optional[DisconnectCheck]] = ContextVar(
+    "request_disconnect_check", default=None
+)
 
 
-async def connect_to_db() -> None:
-    times: Dict[str, float] = {}
+async def connect_to_db(
+    generation_warmers: Optional[List[IndexGenerationWarmer]] = None,
+) -> None:
     settings = get_settings()
     index_manifest_uri = settings.index_manifest_uri
     source_reader = get_reader_for_uri(uri=index_manifest_uri)
     index_reader = source_reader.get_index_reader(index_manifest_uri=index_manifest_uri)
-    start = time()
-    await _ensure_latest_data()
-    times["set data versioning variables"] = time()
-    global _root_db_connection
+    global _root_db_connection, _generation_warmers, _current_generation
+    _generation_warmers = generation_warmers or []
     _root_db_connection = duckdb_connect()
-    times["create db connection"] = time()
+    record_startup_phase("create db connection")
+    # only extensions required to read the index from its source are loaded, e.g. httpfs is not required for local files
+    for extension in ["spatial"] + index_reader.get_duckdb_extensions():
+        if settings.install_duckdb_extensions:
+            # Dockerfiles pre-install extensions, so don't need installing here.
+            # Local debug (e.g. running in vscode) still requires this install.
+            _execute(f"INSTALL {extension}")
+            record_startup_phase(f"install {extension} extension")
+        _execute(f"LOAD {extension}")
+        record_startup_phase(f"load {extension} extension")
     for config_command in index_reader.get_duckdb_configuration_statements():
         _execute(
             config_command[0],
             config_command[1],
         )
-    times["index source configuration"] = time()
-    if settings.install_duckdb_extensions:
-        # Dockerfiles pre-install extensions, so don't need installing here.
-        # Local debug (e.g. running in vscode) still requires this install.
-        _execute("INSTALL spatial")
-        times["install spatial extension"] = time()
-        _execute("INSTALL httpfs")
-        times["install httpfs extension"] = time()
-    _execute("LOAD spatial")
-    times["load spatial extension"] = time()
-    _execute("LOAD httpfs")
-    times["load httpfs extension"] = time()
+    record_startup_phase("index source configuration")
     if settings.duckdb_threads:
         _set_duckdb_threads(settings.duckdb_threads)
-    for operation, completed_at in times.items():
-        _logger.info(
-            "'{}' completed in {}s".format(
-                operation, round(completed_at - start, _query_timing_precision)
-            )
-        )
-        start = completed_at
+    if settings.index_warm_up:
+        # Index files are never modified once published, so metadata read during warm-up can be
+        # cached for the lifetime of the process.
+        _execute("SET parquet_metadata_cache = true")
+        _execute("SET enable_http_metadata_cache = true")
+    _current_generation = await _load_generation(await _get_manifest_last_modified())
+    record_startup_phase("load index generation")
+    log_startup_profile(settings.startup_time_budget)
 
 
 async def disconnect_from_db() -> None:
+    if _reload_task is not None:
+        _reload_task.cancel()
     if _root_db_connection is not None:
         try:
             _root_db_connection.close()
@@ -70,15 +148,38 @@ async def disconnect_from_db() -> None:
             _logger.error(e)
 
 
+@asynccontextmanager
+async def use_index_generation() -> AsyncIterator[IndexGeneration]:
+    """Use the current index generation for the duration of a request.
+
+    If the index has changed a new generation is loaded in the background, and this request
+    continues to use the current generation.
+
+    """
+    await _ensure_latest_data()
+    generation = _get_current_generation()
+    generation.active_requests += 1
+    token = _request_generation.set(generation)
+    try:
+        yield generation
+    finally:
+        _request_generation.reset(token)
+        generation.active_requests -= 1
+        if generation.retired and generation.active_requests == 0:
+            _release_generation(generation)
+
+
+def get_index_generation() -> IndexGeneration:
+    return _request_generation.get() or _get_current_generation()
+
+
 def format_query_object_name(object_name: str) -> str:
-    if object_name in _parquet_uris:
-        return "'{}'".format(_parquet_uris[object_name])
-    raise Exception(
-        "Attempt to use non-existent query object name '{bad_name}'. Available object names: '{availables}'".format(
-            bad_name=object_name,
-            availables="', '".join(list(_parquet_uris.keys())),
-        )
-    )
+    return get_index_generation().format_query_object_name(object_name)
+
+
+def has_query_object(object_name: str) -> bool:
+    # optional index tables, e.g. text search tables, are only present if configured at indexing time
+    return get_index_generation().has_query_object(object_name)
 
 
 def _execute(statement: str, params: Optional[List[Any]] = None) -> None:
@@ -95,7 +196,13 @@ async def fetchone(
     if perform_latest_data_check:
         await _ensure_latest_data()
     start = time()
-    result = _get_db_connection().execute(statement, params).fetchone()
+    cursor = _get_db_connection()
+    try:
+        result = await _run_interruptible(
+            cursor, lambda: cursor.execute(statement, params).fetchone()
+        )
+    finally:
+        cursor.close()
     _sql_log_message(statement, time() - start, 1 if result is not None else 0, params)
     return result
 
@@ -108,15 +215,140 @@ async def fetchall(
     if perform_latest_data_check:
         await _ensure_latest_data()
     start = time()
-    result = _get_db_connection().execute(statement, params).fetchall()
+    cursor = _get_db_connection()
+    try:
+        result = await _run_interruptible(
+            cursor, lambda: cursor.execute(statement, params).fetchall()
+        )
+    finally:
+        cursor.close()
     _sql_log_message(statement, time() - start, len(result), params)
     return result
 
 
+async def iterate_batches(
+    statement: str,
+    params: Optional[List[Any]] = None,
+    batch_size: int = 1000,
+    perform_latest_data_check: bool = True,
+) -> AsyncIterator[List[Any]]:
+    # Long-running statements are executed off the event loop so that other requests are not blocked.
+    # If iteration stops early (e.g. the consumer is cancelled) the statement is interrupted.
+    if perform_latest_data_check:
+        await _ensure_latest_data()
+    start = time()
+    cursor = _get_db_connection()
+    row_count = 0
+    completed = False
+    try:
+        await _run_interruptible(cursor, lambda: cursor.execute(statement, params))
+        while True:
+            rows = await _run_interruptible(
+                cursor, lambda: cursor.fetchmany(batch_size)
+            )
+            if len(rows) == 0:
+                completed = True
+                break
+            row_count += len(rows)
+            yield rows
+    finally:
+        if not completed:
+            cursor.interrupt()
+        cursor.close()
+        _sql_log_message(statement, time() - start, row_count, params)
+
+
+async def copy_to_parquet(
+    statement: str,
+    file_path: str,
+    params: Optional[List[Any]] = None,
+    perform_latest_data_check: bool = True,
+) -> None:
+    if perform_latest_data_check:
+        await _ensure_latest_data()
+    start = time()
+    cursor = _get_db_connection()
+    copy_statement = "COPY ({}) TO '{}' (FORMAT PARQUET)".format(statement, file_path)
+    try:
+        await _run_interruptible(cursor, lambda: cursor.execute(copy_statement, params))
+    finally:
+        cursor.close()
+        _sql_log_message(copy_statement, time() - start, None, params)
+
+
+@contextmanager
+def watch_for_disconnect(disconnect_check: DisconnectCheck) -> Iterator[None]:
+    """Interrupt statements run within this context if the check reports a client disconnect."""
+    token = _request_disconnect_check.set(disconnect_check)
+    try:
+        yield
+    finally:
+        _request_disconnect_check.reset(token)
+
+
+async def _run_interruptible(
+    cursor: DuckDBPyConnection, operation: Callable[[], T]
+) -> T:
+    # Statements run off the event loop, so that other requests are served while they run, and so
+    # that a statement exceeding the query timeout, or whose client has disconnected, can be
+    # interrupted rather than continuing to occupy DuckDB threads.
+    query_timeout = get_settings().query_timeout
+    disconnect_check = _request_disconnect_check.get()
+    start = time()
+    operation_task = create_task(to_thread(operation))
+    try:
+        while True:
+            elapsed = time() - start
+            done, _ = await wait(
+                {operation_task},
+                timeout=_disconnect_poll_interval
+                if query_timeout is None
+                else max(min(_disconnect_poll_interval, query_timeout - elapsed), 0),
+            )
+            if len(done) > 0:
+                return operation_task.result()
+            elapsed = time() - start
+            if query_timeout is not None and elapsed >= query_timeout:
+                await _interrupt(cursor, operation_task)
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Query exceeded the time limit of {}s and was stopped after {}s. Narrow the request and try again.".format(
+                        query_timeout, round(elapsed, _query_timing_precision)
+                    ),
+                )
+            if disconnect_check is not None and await disconnect_check():
+                await _interrupt(cursor, operation_task)
+                _logger.info(
+                    "client disconnected, query stopped after {}s".format(
+                        round(elapsed, _query_timing_precision)
+                    )
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_408_REQUEST_TIMEOUT,
+                    detail="Client disconnected, query stopped after {}s.".format(
+                        round(elapsed, _query_timing_precision)
+                    ),
+                )
+    except CancelledError:
+        await shield(_interrupt(cursor, operation_task))
+        raise
+
+
+async def _interrupt(cursor: DuckDBPyConnection, operation_task: Task) -> None:
+    cursor.interrupt()
+    # the cursor is not reusable until its statement has stopped
+    with suppress(Exception):
+        await operation_task
+
+
 def get_last_load_id() -> str:
-    if _last_load_id is None:
-        raise Exception("attempt to access load id before set")
-    return _last_load_id
+    return get_index_generation().load_id
+
+
+def _get_current_generation() -> IndexGeneration:
+    if _current_generation is None:
+        raise Exception("attempt to access index before loaded")
+    return _current_generation
 
 
 def _get_db_connection():
@@ -160,50 +392,124 @@ def _set_duckdb_threads(duckdb_thread_count: int) -> None:
 
 
 async def _ensure_latest_data() -> None:
-    global _index_manifest_last_modified
+    # A request already using a generation must continue to use it.
+    if _request_generation.get() is not None:
+        return
+    global _reload_task
     start = time()
-    index_manifest_uri = get_settings().index_manifest_uri
-    source_reader = get_reader_for_uri(uri=index_manifest_uri)
-    new_last_modified = await source_reader.get_last_modified_epoch_for_uri(
-        uri=index_manifest_uri
-    ) or round(datetime.now(tz=UTC).timestamp())
-    if new_last_modified != _index_manifest_last_modified:
-        _logger.warning("index manifest has changed, reloading data")
-        await _set_parquet_uris(
-            source_reader.get_index_reader(index_manifest_uri=index_manifest_uri)
-        )
-        await _set_last_load_id()
-        _index_manifest_last_modified = new_last_modified
+    new_last_modified = await _get_manifest_last_modified()
+    current_generation = _get_current_generation()
+    if new_last_modified != current_generation.manifest_last_modified and (
+        _reload_task is None or _reload_task.done()
+    ):
+        _logger.warning("index manifest has changed, reloading data in background")
+        _reload_task = create_task(_reload_generation(new_last_modified))
     _logger.debug(
         f"ensured latest data in {round(time() - start, _query_timing_precision)}s"
     )
 
 
-async def _set_last_load_id() -> None:
+async def _get_manifest_last_modified() -> int:
     index_manifest_uri = get_settings().index_manifest_uri
     source_reader = get_reader_for_uri(uri=index_manifest_uri)
-    index_manifest = await source_reader.get_index_reader(
-        index_manifest_uri=index_manifest_uri
-    ).get_index_manifest()
-    global _last_load_id
-    _last_load_id = index_manifest.load_id
+    return await source_reader.get_last_modified_epoch_for_uri(
+        uri=index_manifest_uri
+    ) or round(datetime.now(tz=UTC).timestamp())
+
+
+async def _reload_generation(manifest_last_modified: int) -> None:
+    global _current_generation
+    try:
+        new_generation = await _load_generation(manifest_last_modified)
+    except Exception:
+        # the current generation remains in use, a later request will retry the reload
+        _logger.exception("failed to load new index generation")
+        return
+    previous_generation = _current_generation
+    _current_generation = new_generation
+    _logger.info(f"activated index generation for load {new_generation.load_id}")
+    if previous_generation is not None:
+        previous_generation.retired = True
+        if previous_generation.active_requests == 0:
+            _release_generation(previous_generation)
 
 
-async def _set_parquet_uris(index_reader: IndexReader) -> None:
-    global _parquet_uris
+async def _load_generation(manifest_last_modified: int) -> IndexGeneration:
+    start = time()
+    settings = get_settings()
+    source_reader = get_reader_for_uri(uri=settings.index_manifest_uri)
+    index_reader = source_reader.get_index_reader(
+        index_manifest_uri=settings.index_manifest_uri
+    )
     try:
-        _parquet_uris = await index_reader.get_parquet_uris()
+        index_manifest = await index_reader.get_index_manifest()
     except MissingIndexException:
         _logger.warning("index missing")
-        settings = get_settings()
-        if settings.create_empty_index_if_missing:
-            settings.index_manifest_uri = IndexCreator().create_empty()
-            source_reader = get_reader_for_uri(uri=settings.index_manifest_uri)
-            index_reader = source_reader.get_index_reader(
-                index_manifest_uri=settings.index_manifest_uri
-            )
-            _parquet_uris = await index_reader.get_parquet_uris()
-        else:
+        if not settings.create_empty_index_if_missing:
             raise Exception(
                 "not configured to create empty index if missing, cannot proceed"
             )
+        # the indexer is only required in this uncommon case, and is slow to import
+        from stac_index.indexer.creator.creator import IndexCreator
+
+        settings.index_manifest_uri = IndexCreator().create_empty()
+        source_reader = get_reader_for_uri(uri=settings.index_manifest_uri)
+        index_reader = source_reader.get_index_reader(
+            index_manifest_uri=settings.index_manifest_uri
+        )
+        index_manifest = await index_reader.get_index_manifest()
+    generation = IndexGeneration(
+        load_id=index_manifest.load_id,
+        manifest_last_modified=manifest_last_modified,
+        parquet_uris=index_reader.get_table_uris(index_manifest),
+        database_uri=index_reader.get_database_uri(index_manifest),
+        item_delta_uris=index_reader.get_item_delta_uris(index_manifest),
+    )
+    if generation.database_uri is not None and settings.use_index_database:
+        await to_thread(_attach_database, generation)
+    await _warm_generation(generation)
+    _logger.info(
+        "loaded index generation for load {} in {}s".format(
+            generation.load_id, round(time() - start, _query_timing_precision)
+        )
+    )
+    return generation
+
+
+async def _warm_generation(generation: IndexGeneration) -> None:
+    # Warmers run with the new generation in use, so that caches keyed by load ID are filled
+    # before the generation becomes current.
+    token = _request_generation.set(generation)
+    try:
+        for warmer in _generation_warmers:
+            await warmer()
+    finally:
+        _request_generation.reset(token)
+
+
+def _attach_database(generation: IndexGeneration) -> None:
+    # A database file holds the same tables as the index's parquet files, plus indexes, and avoids
+    # resolving parquet metadata and planning scans across files on a cold start.
+    # Each generation's attachment is uniquely named so that it can be detached independently.
+    alias = f"index_generation_{next(_generation_sequence)}"
+    _execute(f"ATTACH '{generation.database_uri}' AS \"{alias}\" (READ_ONLY)")
+    generation.database_alias = alias
+    generation.database_table_names = {
+        row[0]: f'"{alias}"."{row[0]}"'
+        for row in _get_db_connection()
+        .execute(
+            "SELECT table_name FROM duckdb_tables() WHERE database_name = ?",
+            [alias],
+        )
+        .fetchall()
+    }
+
+
+def _release_generation(generation: IndexGeneration) -> None:
+    if generation.database_alias is not None:
+        _logger.info(f"detaching index database for load {generation.load_id}")
+        try:
+            _execute(f'DETACH "{generation.database_alias}"')
+        except Exception:
+            _logger.exception(f"failed to detach '{generation.database_alias}'")
+        generation.database_alias = None
@@ -0,0 +1,157 @@
+from dataclasses import dataclass
+from logging import Logger, getLogger
+from os import path
+from shutil import rmtree
+from tempfile import mkdtemp
+from typing import Any, AsyncIterator, Dict, Final, List, Optional, Self, Tuple
+
+from fastapi import Response
+from fastapi.responses import FileResponse, StreamingResponse
+from orjson import dumps, loads
+from stac_fastapi.types.errors import InvalidQueryParameter
+from starlette.background import BackgroundTask
+
+from stac_fastapi.indexed.constants import type_ndjson, type_parquet
+from stac_fastapi.indexed.db import (
+    copy_to_parquet,
+    fetchall,
+    format_query_object_name,
+    iterate_batches,
+)
+from stac_fastapi.indexed.export.types import ExportContent, ExportFormat
+from stac_fastapi.indexed.search.query_info import QueryInfo
+from stac_fastapi.indexed.search.search_handler import SearchHandler
+from stac_fastapi.indexed.settings import get_settings
+
+_logger: Final[Logger] = getLogger(__name__)
+# items columns used for index housekeeping that are of no value to export consumers
+_internal_columns: Final[List[str]] = [
+    "load_id",
+    "item_hash",
+    "applied_fixes",
+    "source_version",
+]
+
+
+@dataclass
+class ExportHandler(SearchHandler):
+    export_format: ExportFormat = ExportFormat.NDJSON
+    export_content: ExportContent = ExportContent.INDEX
+    max_rows: Optional[int] = None
+
+    async def export(self: Self) -> Response:
+        if (
+            self.export_format == ExportFormat.GEOPARQUET
+            and self.export_content != ExportContent.INDEX
+        ):
+            raise InvalidQueryParameter(
+                f"'{ExportFormat.GEOPARQUET.value}' export only supports '{ExportContent.INDEX.value}' content"
+            )
+        query_info = await self._new_query_info()
+        if self.export_format == ExportFormat.GEOPARQUET:
+            return await self._export_geoparquet(query_info)
+        if self.export_content == ExportContent.ITEMS:
+            chunks = self._item_ndjson_chunks(query_info)
+        else:
+            chunks = self._index_ndjson_chunks(query_info)
+        return StreamingResponse(chunks, media_type=type_ndjson)
+
+    async def _get_export_query(
+        self: Self, query_info: QueryInfo, columns: str
+    ) -> Tuple[str, List[Any]]:
+        clauses, params = await self._get_query_clauses(query_info)
+        query = """
+            SELECT {columns}
+            FROM {table_name}
+              {where}
+              ORDER BY {order}
+              LIMIT ?
+            """.format(
+            columns=columns,
+            table_name=format_query_object_name("items"),
+            where="WHERE {}".format(" AND ".join(clauses)) if len(clauses) > 0 else "",
+            order=(", ".join(await self._determine_order(query_info.order))),
+        )
+        params.append(self._get_row_cap())
+        return (query, params)
+
+    def _get_row_cap(self: Self) -> int:
+        export_max_rows = get_settings().export_max_rows
+        if self.max_rows is None:
+            return export_max_rows
+        return min(self.max_rows, export_max_rows)
+
+    async def _export_geoparquet(self: Self, query_info: QueryInfo) -> Response:
+        # DuckDB writes GeoParquet metadata for GEOMETRY columns when the spatial extension is loaded
+        query, params = await self._get_export_query(
+            query_info,
+            _format_columns_excluding(_internal_columns),
+        )
+        output_dir = mkdtemp()
+        output_path = path.join(output_dir, "export.parquet")
+        try:
+            await copy_to_parquet(query, output_path, params)
+        except BaseException:
+            rmtree(output_dir, ignore_errors=True)
+            raise
+        return FileResponse(
+            output_path,
+            media_type=type_parquet,
+            filename="export.parquet",
+            background=BackgroundTask(_remove_export, output_path),
+        )
+
+    async def _index_ndjson_chunks(
+        self: Self, query_info: QueryInfo
+    ) -> AsyncIterator[bytes]:
+        query, params = await self._get_export_query(
+            query_info,
+            "{}, ST_AsGeoJSON(geometry) AS geometry".format(
+                _format_columns_excluding(_internal_columns + ["geometry"])
+            ),
+        )
+        column_names = [
+            row[0]
+            for row in await fetchall(
+                f"SELECT column_name FROM (DESCRIBE {query})", params
+            )
+        ]
+        async for batch in iterate_batches(
+            query,
+            params,
+            batch_size=get_settings().export_batch_size,
+            perform_latest_data_check=False,
+        ):
+            yield b"".join(
+                [dumps(self._row_to_dict(column_names, row)) + b"\n" for row in batch]
+            )
+
+    async def _item_ndjson_chunks(
+        self: Self, query_info: QueryInfo
+    ) -> AsyncIterator[bytes]:
+        query, params = await self._get_export_query(
+            query_info, "stac_location, applied_fixes"
+        )
+        async for batch in iterate_batches(
+            query, params, batch_size=get_settings().export_batch_size
+        ):
+            # item fetches are bounded by the same window used by search pages
+            async for item in self._iterate_items(batch):
+                yield dumps(item) + b"\n"
+
+    def _row_to_dict(self: Self, column_names: List[str], row: Any) -> Dict[str, Any]:
+        row_dict = dict(zip(column_names, row))
+        row_dict["geometry"] = loads(row_dict["geometry"])
+        return row_dict
+
+
+def _remove_export(file_path: str) -> None:
+    _logger.debug(f"removing export file '{file_path}'")
+    rmtree(path.dirname(file_path), ignore_errors=True)
+
+
+def _format_columns_excluding(column_names: List[str]) -> str:
+    # unlike EXCLUDE, tolerates columns absent from indexes created by older indexer versions
+    return "COLUMNS(c -> c NOT IN ({}))".format(
+        ", ".join([f"'{column_name}'" for column_name in column_names])
+    )
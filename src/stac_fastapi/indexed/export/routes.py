@@ -0,0 +1,33 @@
+from typing import Final, Optional, Type
+
+from fastapi import FastAPI, Query, Request, Response
+from pydantic import PositiveInt
+from stac_fastapi.types.search import BaseSearchPostRequest
+
+from stac_fastapi.indexed.export.export_handler import ExportHandler
+from stac_fastapi.indexed.export.types import ExportContent, ExportFormat
+
+_export_tag: Final[str] = "Export"
+
+
+def add_routes(app: FastAPI, search_request_model: Type[BaseSearchPostRequest]) -> None:
+    @app.post(
+        "/export",
+        tags=[_export_tag],
+        summary="Export Search Results",
+        description="Stream all items matching a search body as NDJSON or GeoParquet, without paging.",
+    )
+    async def post_export(
+        search_request: search_request_model,  # type: ignore
+        request: Request,
+        format: ExportFormat = Query(default=ExportFormat.NDJSON),
+        content: ExportContent = Query(default=ExportContent.INDEX),
+        max_rows: Optional[PositiveInt] = Query(default=None),
+    ) -> Response:
+        return await ExportHandler(
+            search_request=search_request,
+            request=request,
+            export_format=format,
+            export_content=content,
+            max_rows=max_rows,
+        ).export()
@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    GEOPARQUET = "geoparquet"
+
+
+class ExportContent(str, Enum):
+    INDEX = "index"
+    ITEMS = "items"
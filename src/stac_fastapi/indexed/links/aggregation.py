@@ -0,0 +1,19 @@
+from re import sub
+from typing import Any, Dict
+from urllib.parse import urljoin
+
+from fastapi import Request
+
+from stac_fastapi.indexed.constants import type_json
+from stac_fastapi.indexed.links.util import get_base_href
+
+
+def get_aggregation_link(request: Request, rel_type: str) -> Dict[str, Any]:
+    return {
+        "rel": rel_type,
+        "type": type_json,
+        "href": urljoin(
+            get_base_href(request),
+            sub("^/", "", request.url.path),
+        ),
+    }
@@ -0,0 +1,16 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from stac_fastapi.indexed.db import use_index_generation
+
+
+class IndexGenerationMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # every query made while handling this request, including streamed responses, uses one index generation
+        async with use_index_generation():
+            await self.app(scope, receive, send)
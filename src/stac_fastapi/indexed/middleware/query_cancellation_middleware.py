@@ -0,0 +1,54 @@
+from collections import deque
+from typing import Deque, Optional, Self
+
+from anyio import CancelScope
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from stac_fastapi.indexed.db import watch_for_disconnect
+
+
+class QueryCancellationMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # Statements run while handling this request are interrupted if its client disconnects.
+        replaying_receive = _ReplayingReceive(receive)
+        with watch_for_disconnect(replaying_receive.is_disconnected):
+            await self.app(scope, replaying_receive, send)
+
+
+class _ReplayingReceive:
+    # Checking for a disconnect consumes a message from the request's receive channel, which may
+    # be a body chunk the application has yet to read, e.g. where a statement runs while a
+    # request body is streamed. Consumed messages are replayed to the application in order.
+    def __init__(self: Self, receive: Receive):
+        self._receive = receive
+        self._consumed: Deque[Message] = deque()
+        self._disconnected = False
+
+    async def __call__(self: Self) -> Message:
+        if len(self._consumed) > 0:
+            return self._consumed.popleft()
+        message = await self._receive()
+        self._record(message)
+        return message
+
+    async def is_disconnected(self: Self) -> bool:
+        if not self._disconnected:
+            message: Optional[Message] = None
+            # only a message that is already available is consumed, the check never waits
+            with CancelScope() as cancel_scope:
+                cancel_scope.cancel()
+                message = await self._receive()
+            if message is not None:
+                self._record(message)
+                self._consumed.append(message)
+        return self._disconnected
+
+    def _record(self: Self, message: Message) -> None:
+        if message["type"] == "http.disconnect":
+            self._disconnected = True
@@ -0,0 +1,37 @@
+from logging import Logger, getLogger
+from time import time
+from typing import Final, List, Optional, Tuple
+
+_logger: Final[Logger] = getLogger(__name__)
+_timing_precision: Final[int] = 3
+# This module is imported by the package's __init__ before application modules,
+# so that startup phases include the time taken to import them.
+_started_at: Final[float] = time()
+_startup_phases: List[Tuple[str, float]] = []
+
+
+def record_startup_phase(phase: str) -> None:
+    _startup_phases.append((phase, time()))
+
+
+def get_startup_duration() -> float:
+    if len(_startup_phases) == 0:
+        return 0
+    return _startup_phases[-1][1] - _started_at
+
+
+def log_startup_profile(budget: Optional[float] = None) -> None:
+    start = _started_at
+    for phase, completed_at in _startup_phases:
+        _logger.info(
+            "'{}' completed in {}s".format(
+                phase, round(completed_at - start, _timing_precision)
+            )
+        )
+        start = completed_at
+    duration = get_startup_duration()
+    _logger.info(f"startup completed in {round(duration, _timing_precision)}s")
+    if budget is not None and duration > budget:
+        _logger.warning(
+            f"startup exceeded budget of {budget}s by {round(duration - budget, _timing_precision)}s"
+        )
@@ -14,6 +14,7 @@ class QueryableConfig:
     name: str
     collection_id: str
     description: str
+    json_path: str
     json_schema: str
     items_column: str
     items_column_type: str
@@ -26,7 +27,8 @@ async def get_queryable_config_by_name() -> Dict[str, QueryableConfig]:
     return await _get_queryable_config_by_name(get_last_load_id())
 
 
-@alru_cache(maxsize=1)
+# one entry for each of the current and reloading index generations
+@alru_cache(maxsize=2)
 async def _get_queryable_config_by_name(_: str) -> Dict[str, QueryableConfig]:
     _logger.debug("fetching queryable field config")
     field_config = {}
@@ -35,6 +37,7 @@ async def _get_queryable_config_by_name(_: str) -> Dict[str, QueryableConfig]:
         SELECT name
              , qbc.collection_id
              , qbc.description
+             , qbc.json_path
              , qbc.json_schema
              , qbc.items_column
              , icols.column_type as items_column_type
@@ -48,10 +51,11 @@ async def _get_queryable_config_by_name(_: str) -> Dict[str, QueryableConfig]:
             name=row[0],
             collection_id=row[1],
             description=row[2],
-            json_schema=row[3],
-            items_column=row[4],
-            items_column_type=row[5],
-            is_geometry=row[6],
-            is_temporal=row[7],
+            json_path=row[3],
+            json_schema=row[4],
+            items_column=row[5],
+            items_column_type=row[6],
+            is_geometry=row[7],
+            is_temporal=row[8],
         )
     return field_config
@@ -0,0 +1,241 @@
+from abc import ABC, abstractmethod
+from asyncio import to_thread
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from hmac import compare_digest, digest
+from logging import Logger, getLogger
+from os import DirEntry, chmod, getuid, lstat, makedirs, path, remove, scandir, utime
+from pickle import HIGHEST_PROTOCOL, dumps, loads
+from re import Pattern, compile
+from stat import S_IMODE, S_ISDIR
+from tempfile import gettempdir
+from threading import Lock
+from typing import Any, Final, List, Optional, Self, Tuple, cast
+from uuid import uuid4
+
+from stac_fastapi.types.errors import InvalidQueryParameter
+
+from stac_fastapi.indexed.search.query_info import QueryInfo, current_query_version
+from stac_fastapi.indexed.search.token import (
+    create_compressed_token_from_query,
+    create_token_from_query,
+    get_query_info_from_compressed_token,
+)
+from stac_fastapi.indexed.search.types import CursorStoreType
+from stac_fastapi.indexed.settings import get_settings
+
+_logger: Final[Logger] = getLogger(__name__)
+_cursor_token_prefix: Final[str] = "c."
+_cursor_token_pattern: Final[Pattern] = compile(r"^c\.([0-9a-f]{32})\.(.+)$")
+_cursor_file_suffix: Final[str] = ".cursor"
+# length of the HMAC-SHA256 signature preceding each cursor file's payload
+_cursor_signature_length: Final[int] = 32
+# eviction removes the least recently used cursors down to this proportion of the maximum entries
+_cursor_eviction_retained_ratio: Final[float] = 0.9
+
+
+@dataclass(kw_only=True)
+class CompiledQuery:
+    # query parameters, without a paging offset, so that one cursor serves every page of a query
+    query_info: QueryInfo
+    items_object_name: str
+    table_expression: str
+    clauses: List[str]
+    params: List[Any]
+    order: List[str]
+    cursor_id: Optional[str] = None
+
+
+class CursorStore(ABC):
+    @abstractmethod
+    async def get(self: Self, cursor_id: str) -> Optional[CompiledQuery]:
+        pass
+
+    @abstractmethod
+    async def put(self: Self, cursor_id: str, compiled_query: CompiledQuery) -> None:
+        pass
+
+
+class MemoryCursorStore(CursorStore):
+    def __init__(self: Self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, CompiledQuery] = OrderedDict()
+
+    async def get(self: Self, cursor_id: str) -> Optional[CompiledQuery]:
+        compiled_query = self._entries.get(cursor_id)
+        if compiled_query is not None:
+            self._entries.move_to_end(cursor_id)
+        return compiled_query
+
+    async def put(self: Self, cursor_id: str, compiled_query: CompiledQuery) -> None:
+        self._entries[cursor_id] = compiled_query
+        self._entries.move_to_end(cursor_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+class DiskCursorStore(CursorStore):
+    # Survives API restarts and can be shared by API processes on one host that share a token secret.
+    # Cursor files are signed with the token secret and only unpickled once their signature is
+    # verified, and are held in a directory private to the API's user.
+    def __init__(self: Self, directory: str, max_entries: int, secret: str):
+        self._directory = directory
+        self._max_entries = max_entries
+        self._secret = secret.encode()
+        # counted on first write, then tracked so that writes need not scan the directory
+        self._entry_count: Optional[int] = None
+        self._entry_count_lock = Lock()
+        _create_private_directory(directory)
+
+    async def get(self: Self, cursor_id: str) -> Optional[CompiledQuery]:
+        return await to_thread(self._get, cursor_id)
+
+    async def put(self: Self, cursor_id: str, compiled_query: CompiledQuery) -> None:
+        await to_thread(self._put, cursor_id, compiled_query)
+
+    def _get(self: Self, cursor_id: str) -> Optional[CompiledQuery]:
+        cursor_path = self._get_cursor_path(cursor_id)
+        try:
+            with open(cursor_path, "rb") as f:
+                signed = f.read()
+            signature, payload = (
+                signed[:_cursor_signature_length],
+                signed[_cursor_signature_length:],
+            )
+            if not compare_digest(signature, self._sign(payload)):
+                # e.g. a cursor written by an API with a different token secret
+                _logger.warning(f"paging cursor {cursor_id} has an invalid signature")
+                return None
+            compiled_query = loads(payload)
+            # modification time orders cursors by last use for eviction
+            utime(cursor_path)
+            return compiled_query
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # e.g. a cursor written by an incompatible API version
+            _logger.warning(f"unable to read paging cursor {cursor_id}: {e}")
+            return None
+
+    def _put(self: Self, cursor_id: str, compiled_query: CompiledQuery) -> None:
+        payload = dumps(compiled_query, protocol=HIGHEST_PROTOCOL)
+        with open(self._get_cursor_path(cursor_id), "wb") as f:
+            f.write(self._sign(payload) + payload)
+        with self._entry_count_lock:
+            if self._entry_count is None:
+                self._entry_count = len(self._list_cursor_files())
+            else:
+                self._entry_count += 1
+            if self._entry_count > self._max_entries:
+                self._entry_count = self._evict()
+
+    def _sign(self: Self, payload: bytes) -> bytes:
+        return digest(self._secret, payload, "sha256")
+
+    def _get_cursor_path(self: Self, cursor_id: str) -> str:
+        return path.join(self._directory, f"{cursor_id}{_cursor_file_suffix}")
+
+    def _list_cursor_files(self: Self) -> List[DirEntry]:
+        with scandir(self._directory) as entries:
+            return [
+                entry
+                for entry in entries
+                if entry.is_file() and entry.name.endswith(_cursor_file_suffix)
+            ]
+
+    def _evict(self: Self) -> int:
+        # Evicts beyond the limit, so that the directory is scanned once per batch of writes
+        # rather than on every write. Returns the number of cursors retained.
+        cursor_files = sorted(
+            self._list_cursor_files(), key=lambda entry: entry.stat().st_mtime
+        )
+        retained_count = min(
+            len(cursor_files),
+            max(int(self._max_entries * _cursor_eviction_retained_ratio), 1),
+        )
+        for entry in cursor_files[: len(cursor_files) - retained_count]:
+            try:
+                remove(entry.path)
+            except FileNotFoundError:
+                # another process evicted the same cursor
+                pass
+        return retained_count
+
+
+def _create_private_directory(directory: str) -> None:
+    makedirs(directory, mode=0o700, exist_ok=True)
+    directory_stat = lstat(directory)
+    if not S_ISDIR(directory_stat.st_mode) or directory_stat.st_uid != getuid():
+        raise PermissionError(
+            f"cursor store directory '{directory}' must be a directory owned by the API's user"
+        )
+    if S_IMODE(directory_stat.st_mode) & 0o077 != 0:
+        chmod(directory, 0o700)
+
+
+@lru_cache(maxsize=1)
+def get_cursor_store() -> Optional[CursorStore]:
+    settings = get_settings()
+    if settings.search_cursor_store == CursorStoreType.MEMORY:
+        return MemoryCursorStore(max_entries=settings.search_cursor_store_max_entries)
+    if settings.search_cursor_store == CursorStoreType.DISK:
+        return DiskCursorStore(
+            directory=settings.search_cursor_store_path
+            or path.join(gettempdir(), f"stac-api-indexed-cursors-{getuid()}"),
+            max_entries=settings.search_cursor_store_max_entries,
+            secret=settings.token_jwt_secret,
+        )
+    return None
+
+
+async def store_compiled_query(compiled_query: CompiledQuery) -> CompiledQuery:
+    # Queries with short self-contained tokens are not stored. Those tokens are valid on any API
+    # instance and after a cursor would have been evicted.
+    cursor_store = get_cursor_store()
+    if (
+        cursor_store is None
+        or compiled_query.cursor_id is not None
+        or len(create_token_from_query(compiled_query.query_info))
+        <= get_settings().search_cursor_min_token_length
+    ):
+        return compiled_query
+    stored = replace(compiled_query, cursor_id=uuid4().hex)
+    await cursor_store.put(cast(str, stored.cursor_id), stored)
+    return stored
+
+
+def create_paging_token(compiled_query: CompiledQuery, query_info: QueryInfo) -> str:
+    if compiled_query.cursor_id is None:
+        return create_token_from_query(query_info)
+    # A cursor token also carries its query, compressed, so that the query can be compiled again
+    # where the cursor has been evicted or is held by another API instance.
+    return "{}{}.{}".format(
+        _cursor_token_prefix,
+        compiled_query.cursor_id,
+        create_compressed_token_from_query(query_info),
+    )
+
+
+def is_cursor_token(token: str) -> bool:
+    return token.startswith(_cursor_token_prefix)
+
+
+async def get_compiled_query_from_token(
+    token: str,
+) -> Tuple[Optional[CompiledQuery], QueryInfo]:
+    match = _cursor_token_pattern.match(token)
+    if match is None:
+        raise InvalidQueryParameter("invalid search token")
+    query_info = get_query_info_from_compressed_token(match.group(2))
+    cursor_store = get_cursor_store()
+    compiled_query = (
+        await cursor_store.get(match.group(1)) if cursor_store is not None else None
+    )
+    if (
+        compiled_query is None
+        or compiled_query.query_info.query_version != current_query_version
+    ):
+        _logger.info(f"paging cursor {match.group(1)} not found, compiling its query")
+        return None, query_info
+    return compiled_query, query_info
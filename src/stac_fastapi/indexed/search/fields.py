@@ -0,0 +1,184 @@
+from copy import deepcopy
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from json import loads
+from typing import Any, Dict, Final, List, Optional, Set, Tuple
+
+from stac_fastapi.indexed.constants import collection_wildcard
+from stac_fastapi.indexed.queryables.queryable_field_map import (
+    get_queryable_config_by_name,
+)
+from stac_fastapi.indexed.sortables.sortable_config import get_sortable_configs
+
+# Item fields that can be answered from core index columns, and the SQL expression that answers each
+_core_field_expressions: Final[Dict[str, str]] = {
+    "id": "id",
+    "collection": "collection_id",
+    "geometry": "ST_AsGeoJSON(geometry)",
+    "bbox": "[ST_XMin(geometry), ST_YMin(geometry), ST_XMax(geometry), ST_YMax(geometry)]",
+    "properties.datetime": "datetime",
+    "properties.start_datetime": "start_datetime",
+    "properties.end_datetime": "end_datetime",
+}
+# Indexables created for every index, which are answered by the core field expressions above
+_core_indexable_names: Final[Set[str]] = {
+    "id",
+    "collection",
+    "geometry",
+    "datetime",
+    "start_datetime",
+    "end_datetime",
+}
+# Item fields that do not require an index column
+_type_field: Final[str] = "type"
+_links_field: Final[str] = "links"
+_path_separator: Final[str] = "."
+# indexables may declare alternative JSON paths, which cannot be mapped back to a single item field
+_json_path_alternative_separator: Final[str] = "|"
+
+
+@dataclass
+class FieldSelection:
+    include: List[str] = field(default_factory=list)
+    exclude: List[str] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return len(self.include) == 0 and len(self.exclude) == 0
+
+
+@dataclass
+class IndexedField:
+    json_path: str
+    items_column: str
+    collection_ids: Set[str]
+
+
+@dataclass
+class IndexProjection:
+    # (field path, SQL expression) pairs, in the order they are selected
+    columns: List[Tuple[str, str]]
+    include_type: bool
+    include_links: bool
+
+
+def apply_fields(item: Dict[str, Any], selection: FieldSelection) -> Dict[str, Any]:
+    if len(selection.include) > 0:
+        result: Dict[str, Any] = {}
+        for field_path in selection.include:
+            _copy_path(item, result, field_path.split(_path_separator))
+    else:
+        result = deepcopy(item)
+    for field_path in selection.exclude:
+        # where a field is both included and excluded, include takes precedence
+        if field_path not in selection.include:
+            _remove_path(result, field_path.split(_path_separator))
+    return result
+
+
+async def get_indexed_fields() -> Dict[str, IndexedField]:
+    """Map item field paths to the index columns populated from them."""
+    indexed_fields: Dict[str, IndexedField] = {}
+    for name, collection_id, json_path, items_column in [
+        (entry.name, entry.collection_id, entry.json_path, entry.items_column)
+        for entry in (await get_queryable_config_by_name()).values()
+    ] + [
+        (entry.name, entry.collection_id, entry.json_path, entry.items_column)
+        for entry in await get_sortable_configs()
+    ]:
+        if (
+            name in _core_indexable_names
+            or _json_path_alternative_separator in json_path
+        ):
+            continue
+        if json_path not in indexed_fields:
+            indexed_fields[json_path] = IndexedField(
+                json_path=json_path,
+                items_column=items_column,
+                collection_ids=set(),
+            )
+        indexed_fields[json_path].collection_ids.add(collection_id)
+    return indexed_fields
+
+
+async def get_index_projection(
+    selection: FieldSelection,
+    collections: Optional[List[str]] = None,
+) -> Optional[IndexProjection]:
+    """Determine if all included fields can be answered from the index, without fetching item JSON.
+
+    Indexable columns are only populated for the collections they are configured for, so an
+    indexable can only answer a query if it is configured for every collection the query may match.
+
+    """
+    if len(selection.include) == 0:
+        return None
+    indexed_fields = await get_indexed_fields()
+    columns: List[Tuple[str, str]] = []
+    include_type = False
+    include_links = False
+    for field_path in sorted(selection.include):
+        if field_path == _type_field:
+            include_type = True
+        elif field_path == _links_field:
+            include_links = True
+        elif field_path in _core_field_expressions:
+            columns.append((field_path, _core_field_expressions[field_path]))
+        elif field_path in indexed_fields:
+            indexed_field = indexed_fields[field_path]
+            if collection_wildcard not in indexed_field.collection_ids and (
+                collections is None
+                or not set(collections).issubset(indexed_field.collection_ids)
+            ):
+                return None
+            columns.append((field_path, f'"{indexed_field.items_column}"'))
+        else:
+            return None
+    return IndexProjection(
+        columns=columns,
+        include_type=include_type,
+        include_links=include_links,
+    )
+
+
+def index_row_to_item(projection: IndexProjection, values: List[Any]) -> Dict[str, Any]:
+    item: Dict[str, Any] = {}
+    if projection.include_type:
+        item[_type_field] = "Feature"
+    for (field_path, _), value in zip(projection.columns, values):
+        if field_path == "geometry" and value is not None:
+            value = loads(value)
+        elif field_path == "bbox" and value is not None:
+            value = list(value)
+        elif isinstance(value, datetime):
+            value = value.astimezone(UTC).isoformat().replace("+00:00", "Z")
+        if value is None and field_path not in _core_field_expressions:
+            # an item without a value for an indexable field would not have included that field
+            continue
+        _set_path(item, field_path.split(_path_separator), value)
+    return item
+
+
+def _copy_path(source: Dict[str, Any], target: Dict[str, Any], parts: List[str]):
+    if parts[0] not in source:
+        return
+    if len(parts) == 1:
+        target[parts[0]] = deepcopy(source[parts[0]])
+    elif isinstance(source[parts[0]], dict):
+        if not isinstance(target.get(parts[0]), dict):
+            target[parts[0]] = {}
+        _copy_path(source[parts[0]], target[parts[0]], parts[1:])
+
+
+def _remove_path(target: Dict[str, Any], parts: List[str]):
+    if parts[0] not in target:
+        return
+    if len(parts) == 1:
+        del target[parts[0]]
+    elif isinstance(target[parts[0]], dict):
+        _remove_path(target[parts[0]], parts[1:])
+
+
+def _set_path(target: Dict[str, Any], parts: List[str], value: Any):
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = value
@@ -1,13 +1,15 @@
 from enum import Enum
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List
 
-from pygeofilter.ast import Node
 from stac_fastapi.types.errors import InvalidQueryParameter
 
 from stac_fastapi.indexed.search.filter.attribute_config import AttributeConfig
-from stac_fastapi.indexed.search.filter.duckdb_sql_evaluator import to_filter_clause
 from stac_fastapi.indexed.search.filter_clause import FilterClause
 
+if TYPE_CHECKING:
+    # pygeofilter and its dependencies are slow to import, so are only imported when a filter is parsed
+    from pygeofilter.ast import Node
+
 
 class FilterLanguage(str, Enum):
     JSON2 = "cql2-json"
@@ -22,7 +24,7 @@ def parse_filter_language(filter_lang: str) -> FilterLanguage:
         raise InvalidQueryParameter(f"Unsupported filter language {filter_lang}.")
 
 
-def filter_to_ast(filter: Dict[str, Any] | str, filter_lang: str) -> Node:
+def filter_to_ast(filter: Dict[str, Any] | str, filter_lang: str) -> "Node":
     parser_type = parse_filter_language(filter_lang)
     if parser_type == FilterLanguage.JSON2:
         from pygeofilter.parsers.cql2_json import parse
@@ -37,7 +39,11 @@ def filter_to_ast(filter: Dict[str, Any] | str, filter_lang: str) -> Node:
 
 
 def ast_to_filter_clause(
-    ast: Node,
+    ast: "Node",
     attribute_configs: List[AttributeConfig],
 ) -> FilterClause:
+    from stac_fastapi.indexed.search.filter.duckdb_sql_evaluator import (
+        to_filter_clause,
+    )
+
     return to_filter_clause(ast, attribute_configs)
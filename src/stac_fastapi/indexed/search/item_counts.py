@@ -0,0 +1,181 @@
+from dataclasses import dataclass
+from datetime import datetime
+from logging import Logger, getLogger
+from typing import Any, Dict, Final, List, Optional, Self, Tuple
+
+from async_lru import alru_cache
+
+from stac_fastapi.indexed.db import (
+    fetchall,
+    format_query_object_name,
+    get_index_generation,
+    get_last_load_id,
+)
+
+_logger: Final[Logger] = getLogger(__name__)
+
+# Start and end of a datetime interval, either of which may be open.
+DatetimeInterval = Tuple[Optional[datetime], Optional[datetime]]
+
+
+@dataclass(kw_only=True)
+class _ColumnStatistics:
+    min_value: Any
+    max_value: Any
+    all_null: bool
+
+    def may_contain(self: Self, values: List[str]) -> bool:
+        if self.all_null:
+            return False
+        if self.min_value is None or self.max_value is None:
+            return True
+        return any(self.min_value <= value <= self.max_value for value in values)
+
+    def may_overlap(
+        self: Self, start: Optional[datetime], end: Optional[datetime]
+    ) -> bool:
+        if self.all_null:
+            return False
+        return (self.min_value is None or end is None or self.min_value <= end) and (
+            self.max_value is None or start is None or self.max_value >= start
+        )
+
+
+@dataclass(kw_only=True)
+class _RowGroupStatistics:
+    row_count: int
+    collection_id: _ColumnStatistics
+    id: _ColumnStatistics
+    datetime: _ColumnStatistics
+    start_datetime: _ColumnStatistics
+    end_datetime: _ColumnStatistics
+
+    def may_match(
+        self: Self,
+        collections: Optional[List[str]],
+        ids: Optional[List[str]],
+        datetime_interval: Optional[DatetimeInterval],
+    ) -> bool:
+        if collections is not None and not self.collection_id.may_contain(collections):
+            return False
+        if ids is not None and not self.id.may_contain(ids):
+            return False
+        if datetime_interval is not None:
+            start, end = datetime_interval
+            # items have either a datetime or a start and end datetime
+            return self.datetime.may_overlap(start, end) or (
+                self.start_datetime.may_overlap(None, end)
+                and self.end_datetime.may_overlap(start, None)
+            )
+        return True
+
+
+async def get_item_counts_by_collection() -> Dict[str, int]:
+    # ensure a change to the application's last load ID forces a data reload
+    return await _get_item_counts_by_collection(get_last_load_id())
+
+
+async def get_estimated_item_count(
+    collections: Optional[List[str]] = None,
+    ids: Optional[List[str]] = None,
+    datetime_interval: Optional[DatetimeInterval] = None,
+) -> int:
+    """Estimate the number of items matching a search.
+
+    Per-collection counts bound the estimate, which is refined by the row group statistics of
+    the items parquet file where the search constrains ids or datetime. Constraints without
+    statistics, e.g. spatial or CQL2 filters, do not refine it, so it is then an upper bound.
+
+    """
+    counts = await get_item_counts_by_collection()
+    if collections is None:
+        estimate = sum(counts.values())
+    else:
+        collections = list(set(collections))
+        estimate = sum(counts.get(collection_id, 0) for collection_id in collections)
+    if ids is not None:
+        # ids are unique within a collection
+        ids = list(set(ids))
+        estimate = min(
+            estimate,
+            len(ids) * (len(collections) if collections is not None else len(counts)),
+        )
+    if ids is None and datetime_interval is None:
+        return estimate
+    items_uri = get_index_generation().parquet_uris.get("items")
+    if items_uri is None:
+        return estimate
+    row_groups = await _get_items_row_group_statistics(get_last_load_id(), items_uri)
+    return min(
+        estimate,
+        sum(
+            row_group.row_count
+            for row_group in row_groups
+            if row_group.may_match(collections, ids, datetime_interval)
+        ),
+    )
+
+
+# one entry for each of the current and reloading index generations
+@alru_cache(maxsize=2)
+async def _get_item_counts_by_collection(_: str) -> Dict[str, int]:
+    _logger.debug("fetching item counts by collection")
+    return {
+        row[0]: row[1]
+        for row in await fetchall(
+            f"""
+        SELECT collection_id
+             , COUNT(*)
+          FROM {format_query_object_name('items')}
+      GROUP BY collection_id
+    """
+        )
+    }
+
+
+@alru_cache(maxsize=2)
+async def _get_items_row_group_statistics(
+    _: str, items_uri: str
+) -> List[_RowGroupStatistics]:
+    # Read from the parquet footer only, so item changes applied since the items file was
+    # written are not reflected.
+    _logger.debug("fetching items row group statistics")
+    column_names = [
+        ("collection_id", "VARCHAR"),
+        ("id", "VARCHAR"),
+        ("datetime", "TIMESTAMPTZ"),
+        ("start_datetime", "TIMESTAMPTZ"),
+        ("end_datetime", "TIMESTAMPTZ"),
+    ]
+    rows = await fetchall(
+        """
+        SELECT ANY_VALUE(row_group_num_rows)
+             {columns}
+          FROM parquet_metadata(?)
+      GROUP BY file_name, row_group_id
+    """.format(
+            columns="".join(
+                f"""
+             , TRY_CAST(MIN(stats_min_value) FILTER (WHERE path_in_schema = '{column_name}') AS {column_type})
+             , TRY_CAST(MAX(stats_max_value) FILTER (WHERE path_in_schema = '{column_name}') AS {column_type})
+             , COALESCE(BOOL_AND(stats_null_count = row_group_num_rows) FILTER (WHERE path_in_schema = '{column_name}'), false)
+                """
+                for column_name, column_type in column_names
+            )
+        ),
+        [items_uri],
+    )
+    return [
+        _RowGroupStatistics(
+            row_count=row[0],
+            **{
+                column_name: _ColumnStatistics(
+                    min_value=row[1 + i * 3],
+                    max_value=row[2 + i * 3],
+                    all_null=row[3 + i * 3],
+                )
+                for i, (column_name, _) in enumerate(column_names)
+            },
+        )
+        for row in rows
+    ]
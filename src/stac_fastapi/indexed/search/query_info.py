@@ -22,6 +22,9 @@ class QueryInfo:
     filter: Optional[Dict[str, Any]] = None
     filter_lang: str
     order: Optional[List[SortExtension]] = None
+    q: Optional[List[str]] = None
+    fields_include: Optional[List[str]] = None
+    fields_exclude: Optional[List[str]] = None
     limit: int
     offset: Optional[int] = None
     last_load_id: str
@@ -1,9 +1,102 @@
-from typing import Optional
+from json import loads
+from re import IGNORECASE, match, search
+from typing import Any, Dict, List, Optional, Type
+from urllib.parse import unquote_plus
 
 import attr
-from stac_fastapi.types.search import BaseSearchGetRequest
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from stac_fastapi.types.search import BaseSearchGetRequest, BaseSearchPostRequest
+from stac_pydantic.shared import BBox
+
+from stac_fastapi.indexed.search.filter.parser import FilterLanguage
+from stac_fastapi.indexed.search.search_handler import SearchHandler
 
 
 @attr.s
 class SearchGetRequest(BaseSearchGetRequest):
     datetime: Optional[str] = attr.ib(default=None)
+
+
+def get_search_post_request(
+    post_request_model: Type[BaseModel],
+    request: Request,
+    collections: Optional[List[str]] = None,
+    ids: Optional[List[str]] = None,
+    bbox: Optional[BBox] = None,
+    datetime: Optional[str] = None,
+    limit: Optional[int] = None,
+    token: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    sortby: Optional[str] = None,
+    filter: Optional[str] = None,
+    filter_lang: Optional[str] = None,
+    intersects: Optional[str] = None,
+    q: Optional[List[str]] = None,
+    **kwargs,
+) -> BaseSearchPostRequest:
+    # Search is implemented against the POST request model, convert GET parameters to that model.
+    # Any additional keyword arguments are passed through to the model as-is.
+    base_args: Dict[str, Any] = {
+        **kwargs,
+        "collections": collections,
+        "ids": ids,
+        "bbox": bbox,
+        "datetime": datetime,
+        "limit": limit,
+        "token": token,
+        "q": q,
+    }
+    if sortby:
+        # https://github.com/radiantearth/stac-spec/tree/master/api-spec/extensions/sort#http-get-or-post-form
+        sort_param = []
+        for sort in sortby:
+            sortparts = match(r"^([+-]?)(.*)$", sort)
+            if sortparts:
+                sort_param.append(
+                    {
+                        "field": sortparts.group(2).strip(),
+                        "direction": "desc" if sortparts.group(1) == "-" else "asc",
+                    }
+                )
+        base_args["sortby"] = sort_param
+    if fields:
+        # https://github.com/stac-api-extensions/fields#get
+        # a "+" prefix may arrive URL-decoded as a space
+        include_fields, exclude_fields = set(), set()
+        for field in [entry.strip() for entry in fields]:
+            if field.startswith("-"):
+                exclude_fields.add(field[1:])
+            elif len(field) > 0:
+                include_fields.add(field.lstrip("+"))
+        base_args["fields"] = {
+            "include": include_fields,
+            "exclude": exclude_fields,
+        }
+    if intersects:
+        base_args["intersects"] = loads(unquote_plus(intersects))
+    if filter:
+        # following block based on https://github.com/stac-utils/stac-fastapi-pgstac/blob/659ddc374b7001dc7c7ad2cc2fd29e3f420b0573/stac_fastapi/pgstac/core.py#L373
+        # Kludgy fix because using factory does not allow alias for filter-lang
+        if filter_lang is None:
+            lang_match = search(
+                r"filter-lang=([a-z0-9-]+)", str(request.query_params), IGNORECASE
+            )
+            if lang_match:
+                filter_lang = lang_match.group(1)
+        filter_lang = filter_lang or FilterLanguage.TEXT.value
+        # prefer to wrap / unwrap filter content here than parse, convert, and re-parse
+        base_args["filter"] = SearchHandler.wrap_text_filter(filter, filter_lang)
+        base_args["filter-lang"] = filter_lang
+    try:
+        return post_request_model(
+            **{
+                key: value
+                for key, value in base_args.items()
+                if value is not None and value != []
+            }
+        )
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid parameters provided {e}"
+        ) from e
@@ -1,11 +1,27 @@
-from asyncio import gather
-from dataclasses import dataclass
+from asyncio import Task, create_task
+from collections import deque
+from dataclasses import dataclass, replace
 from datetime import datetime
+from itertools import islice
+from json import dumps, loads
 from logging import Logger, getLogger
-from typing import Any, Dict, Final, List, Optional, Self, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Deque,
+    Dict,
+    Final,
+    List,
+    Optional,
+    Self,
+    Tuple,
+    cast,
+)
 
-from fastapi import HTTPException, Request, status
-from pygeofilter.ast import Node
+from async_lru import alru_cache
+from fastapi import HTTPException, Request, Response, status
+from stac_fastapi.extensions.core.fields.request import PostFieldsExtension
 from stac_fastapi.extensions.core.filter.filter import FilterExtensionPostRequest
 from stac_fastapi.extensions.core.pagination.token_pagination import POSTTokenPagination
 from stac_fastapi.extensions.core.sort.sort import SortExtensionPostRequest
@@ -27,6 +43,20 @@ from stac_fastapi.indexed.links.search import get_search_link, get_token_link
 from stac_fastapi.indexed.queryables.queryable_field_map import (
     get_queryable_config_by_name,
 )
+from stac_fastapi.indexed.search.cursor_store import (
+    CompiledQuery,
+    create_paging_token,
+    get_compiled_query_from_token,
+    is_cursor_token,
+    store_compiled_query,
+)
+from stac_fastapi.indexed.search.fields import (
+    FieldSelection,
+    IndexProjection,
+    apply_fields,
+    get_index_projection,
+    index_row_to_item,
+)
 from stac_fastapi.indexed.search.filter.attribute_config import AttributeConfig
 from stac_fastapi.indexed.search.filter.errors import (
     NotAGeometryField,
@@ -41,21 +71,26 @@ from stac_fastapi.indexed.search.filter.parser import (
     parse_filter_language,
 )
 from stac_fastapi.indexed.search.filter_clause import FilterClause
+from stac_fastapi.indexed.search.item_counts import get_estimated_item_count
 from stac_fastapi.indexed.search.query_info import QueryInfo, current_query_version
 from stac_fastapi.indexed.search.spatial import (
     get_intersects_clause_for_bbox,
     get_intersects_clause_for_wkt,
 )
-from stac_fastapi.indexed.search.token import (
-    create_token_from_query,
-    get_query_info_from_token,
-)
-from stac_fastapi.indexed.search.types import SearchDirection, SearchMethod
+from stac_fastapi.indexed.search.streaming import get_stream_format, stream_items
+from stac_fastapi.indexed.search.text_search import get_text_search_scores
+from stac_fastapi.indexed.search.token import get_query_info_from_token
+from stac_fastapi.indexed.search.types import CountMode, SearchDirection, SearchMethod
+from stac_fastapi.indexed.settings import get_settings
 from stac_fastapi.indexed.sortables.sortable_config import get_sortable_configs_by_field
 from stac_fastapi.indexed.stac.fetcher import fetch_dict
 
+if TYPE_CHECKING:
+    from pygeofilter.ast import Node
+
 _logger: Final[Logger] = getLogger(__name__)
 _text_filter_wrap_key: Final[str] = "__text_filter"
+_max_cached_filter_clauses: Final[int] = 1024
 
 default_sorts: Final[List[SortExtension]] = [
     SortExtension(field="collection", direction=SortDirections.asc),
@@ -79,54 +114,71 @@ class SearchHandler:
             return {_text_filter_wrap_key: filter}
         return cast(Dict[str, Any], filter)
 
-    async def search(self) -> ItemCollection:
+    async def search(self) -> ItemCollection | Response:
         reject_if_load_id_changed = False
-        if cast(POSTTokenPagination, self.search_request).token is None:
+        token = cast(POSTTokenPagination, self.search_request).token
+        compiled_query: Optional[CompiledQuery] = None
+        if token is None:
             _logger.debug("no token, building new query")
             query_info = await self._new_query_info()
         else:
             _logger.debug("token provided")
             # do not permit paging across data changes as paged results may be inconsistent
             reject_if_load_id_changed = True
-            query_info = get_query_info_from_token(
-                cast(POSTTokenPagination, self.search_request).token
-            )
-        clauses: List[str] = []
-        params: List[Any] = []
-        for addition in [
-            self._include_ids(ids=query_info.ids),
-            self._include_collections(collections=query_info.collections),
-            self._include_bbox(bbox=query_info.bbox),
-            self._include_intersects(intersects=query_info.intersects),
-            self._include_datetime(datetime_str=query_info.datetime),
-            await self._include_filter(
-                filter_lang=query_info.filter_lang,
-                filter=query_info.filter,
-                collections=query_info.collections,
-            ),
-        ]:
-            if addition is not None:
-                clauses.append(addition.sql)
-                params.extend(addition.params)
+            if is_cursor_token(token):
+                compiled_query, query_info = await get_compiled_query_from_token(token)
+                # compiled SQL names the index objects of the generation it was compiled against
+                if (
+                    compiled_query is not None
+                    and compiled_query.items_object_name
+                    != format_query_object_name("items")
+                ):
+                    compiled_query = None
+            else:
+                query_info = get_query_info_from_token(token)
+        if compiled_query is None:
+            compiled_query = await self._compile_query(query_info)
+        count_mode = get_settings().search_count_mode
+        field_selection = FieldSelection(
+            include=query_info.fields_include or [],
+            exclude=query_info.fields_exclude or [],
+        )
+        # where every requested field is held in the index, items need not be fetched at all
+        index_projection = await get_index_projection(
+            field_selection, query_info.collections
+        )
         query = """
-            SELECT stac_location, applied_fixes
+            SELECT stac_location, applied_fixes{projection_columns}{count_column}
             FROM {table_name}
               {where}
               ORDER BY {order}
               LIMIT ?
               OFFSET ?
             """.format(
-            table_name=format_query_object_name("items"),
-            where="WHERE {}".format(" AND ".join(clauses)) if len(clauses) > 0 else "",
-            order=(", ".join(await self._determine_order(query_info.order))),
+            # a window count is evaluated over the same scan as the page, avoiding a second COUNT(*) query
+            projection_columns="".join(
+                [", id, collection_id"]
+                + [f", {expression}" for _, expression in index_projection.columns]
+            )
+            if index_projection is not None
+            else "",
+            count_column=", COUNT(*) OVER () AS number_matched"
+            if count_mode == CountMode.EXACT
+            else "",
+            table_name=compiled_query.table_expression,
+            where="WHERE {}".format(" AND ".join(compiled_query.clauses))
+            if len(compiled_query.clauses) > 0
+            else "",
+            order=", ".join(compiled_query.order),
         )
-        params.append(
-            query_info.limit + 1
-        )  # request one more so that we know if there's a next page of results
-        params.append(query_info.offset if query_info.offset is not None else 0)
         rows = await fetchall(
             query,
-            params,
+            compiled_query.params
+            + [
+                # request one more so that we know if there's a next page of results
+                query_info.limit + 1,
+                query_info.offset if query_info.offset is not None else 0,
+            ],
         )
         if reject_if_load_id_changed and get_last_load_id() != query_info.last_load_id:
             raise HTTPException(
@@ -135,43 +187,10 @@ class SearchHandler:
             )
         has_next_page = len(rows) > query_info.limit
         has_previous_page = query_info.offset is not None
+        number_matched = await self._get_number_matched(count_mode, query_info, rows)
 
-        async def get_each_item(uri: str) -> Optional[Dict[str, Any]]:
-            try:
-                return await fetch_dict(uri=uri)
-            except UriNotFoundException:
-                _logger.warning(
-                    "Item '{uri}' exists in the index but does not exist in the data store, index is outdated".format(
-                        uri=uri
-                    )
-                )
-                return None
-
-        fetch_tasks = [
-            get_each_item(url) for url in [row[0] for row in rows[0 : query_info.limit]]
-        ]
-        fetched_dicts = []
-        missing_entry_indices = []
-        for i, entry in enumerate(await gather(*fetch_tasks)):
-            if entry is None:
-                missing_entry_indices.append(i)
-            else:
-                fetched_dicts.append(entry)
-        fixes_to_apply = [
-            fix_list.split(",")
-            for fix_list in [
-                row[1]
-                for i, row in enumerate(rows[0 : query_info.limit])
-                if i not in missing_entry_indices
-            ]
-        ]
-        items = [
-            fix_item_links(
-                Item(**StacParser(fixers).parse_stac_item(item_dict)[1]),
-                self.request,
-            )
-            for (item_dict, fixers) in zip(fetched_dicts, fixes_to_apply)
-        ]
+        if has_next_page or has_previous_page:
+            compiled_query = await store_compiled_query(compiled_query)
         links = [
             get_catalog_link(self.request, rel_root),
             get_search_link(self.request, rel_self),
@@ -182,7 +201,7 @@ class SearchHandler:
                     self.request,
                     SearchDirection.Next,
                     SearchMethod.from_str(self.request.method),
-                    create_token_from_query(query_info.next()),
+                    create_paging_token(compiled_query, query_info.next()),
                 )
             )
         if has_previous_page:
@@ -191,18 +210,215 @@ class SearchHandler:
                     self.request,
                     SearchDirection.Previous,
                     SearchMethod.from_str(self.request.method),
-                    create_token_from_query(query_info.previous()),
+                    create_paging_token(compiled_query, query_info.previous()),
+                )
+            )
+
+        def get_collection_members(returned: int) -> Dict[str, Any]:
+            context = {
+                "returned": returned,
+                "limit": query_info.limit,
+            }
+            members: Dict[str, Any] = {
+                "links": links,
+                "context": context,
+                "numberReturned": returned,
+            }
+            if number_matched is not None:
+                context["matched"] = number_matched
+                members["numberMatched"] = number_matched
+            return members
+
+        page_rows = rows[0 : query_info.limit]
+        stream_format = get_stream_format(self.request)
+        if stream_format is not None:
+            return stream_items(
+                stream_format=stream_format,
+                items=self._iterate_page_items(
+                    page_rows,
+                    field_selection,
+                    index_projection,
+                    window_size=get_settings().max_concurrency,
+                ),
+                links=links,
+                get_collection_members=get_collection_members,
+            )
+        items = [
+            item
+            # a complete page is built before responding, so every item is fetched at once
+            async for item in self._iterate_page_items(
+                page_rows, field_selection, index_projection, window_size=len(page_rows)
+            )
+        ]
+        return cast(
+            ItemCollection,
+            {
+                "type": "FeatureCollection",
+                "features": items,
+                **get_collection_members(len(items)),
+            },
+        )
+
+    async def _iterate_page_items(
+        self: Self,
+        rows: List[Any],
+        field_selection: FieldSelection,
+        index_projection: Optional[IndexProjection],
+        window_size: int,
+    ) -> AsyncIterator[Item]:
+        if index_projection is not None:
+            for row in rows:
+                yield self._get_projected_item(index_projection, row)
+            return
+        async for item in self._iterate_items(rows, window_size=window_size):
+            if field_selection.is_empty():
+                yield item
+            else:
+                yield cast(
+                    Item, apply_fields(cast(Dict[str, Any], item), field_selection)
+                )
+
+    def _get_projected_item(
+        self: Self, index_projection: IndexProjection, row: Any
+    ) -> Item:
+        # row layout follows the search query: stac_location, applied_fixes, id, collection_id, projection columns
+        item = index_row_to_item(
+            index_projection, row[4 : 4 + len(index_projection.columns)]
+        )
+        if index_projection.include_links:
+            # only generated links are available without the item's JSON
+            item["links"] = fix_item_links(
+                cast(Item, {"id": row[2], "collection": row[3], "links": []}),
+                self.request,
+            )["links"]
+        return cast(Item, item)
+
+    async def _iterate_items(
+        self: Self, rows: List[Any], window_size: Optional[int] = None
+    ) -> AsyncIterator[Item]:
+        # Fetches run ahead of the consumer within a bounded window and are yielded in row order.
+        # The first item is available as soon as its own fetch completes, and a streaming consumer
+        # never causes more than one window of fetched items to be held in memory.
+        window_size = max(
+            window_size if window_size is not None else get_settings().max_concurrency,
+            1,
+        )
+        row_iterator = iter(rows)
+        pending: Deque[Tuple[Task, str]] = deque()
+
+        def fill_window() -> None:
+            for row in islice(row_iterator, window_size - len(pending)):
+                pending.append((create_task(self._get_each_item(row[0])), row[1]))
+
+        fill_window()
+        try:
+            while len(pending) > 0:
+                fetch_task, fixes_to_apply = pending.popleft()
+                item_dict = await fetch_task
+                fill_window()
+                if item_dict is not None:
+                    yield fix_item_links(
+                        Item(
+                            **StacParser(fixes_to_apply.split(",")).parse_stac_item(
+                                item_dict
+                            )[1]
+                        ),
+                        self.request,
+                    )
+        finally:
+            # a closed stream, e.g. client disconnect, should not leave fetches running
+            for fetch_task, _ in pending:
+                fetch_task.cancel()
+
+    async def _get_each_item(self: Self, uri: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await fetch_dict(uri=uri)
+        except UriNotFoundException:
+            _logger.warning(
+                "Item '{uri}' exists in the index but does not exist in the data store, index is outdated".format(
+                    uri=uri
+                )
+            )
+            return None
+
+    async def _get_number_matched(
+        self: Self, count_mode: CountMode, query_info: QueryInfo, rows: List[Any]
+    ) -> Optional[int]:
+        if count_mode == CountMode.EXACT:
+            if len(rows) > 0:
+                # the window count is always the last column selected
+                return rows[0][-1]
+            # an empty page past the first cannot say how many rows precede it
+            return 0 if query_info.offset is None else None
+        elif count_mode == CountMode.ESTIMATED:
+            datetime_interval = (
+                str_to_interval(query_info.datetime) if query_info.datetime else None
+            )
+            return await get_estimated_item_count(
+                collections=query_info.collections,
+                ids=query_info.ids,
+                datetime_interval=(datetime_interval, datetime_interval)
+                if isinstance(datetime_interval, datetime)
+                else datetime_interval,
+            )
+        return None
+
+    async def _compile_query(self: Self, query_info: QueryInfo) -> CompiledQuery:
+        # without an explicit sort, free-text matches are ordered by relevance
+        rank_by_text_score = query_info.q is not None and not query_info.order
+        clauses, params = await self._get_query_clauses(
+            query_info, include_q=not rank_by_text_score
+        )
+        if rank_by_text_score:
+            text_scores = get_text_search_scores(cast(List[str], query_info.q))
+            table_expression = (
+                "{} INNER JOIN ({}) text_scores USING (collection_id, id)".format(
+                    format_query_object_name("items"), text_scores.sql
                 )
             )
-        return ItemCollection(
-            type="FeatureCollection",
-            features=items,
-            links=links,
+            params = text_scores.params + params
+            order = ["text_scores.score DESC"] + await self._determine_order()
+        else:
+            table_expression = format_query_object_name("items")
+            order = await self._determine_order(query_info.order)
+        return CompiledQuery(
+            query_info=replace(query_info, offset=None),
+            items_object_name=format_query_object_name("items"),
+            table_expression=table_expression,
+            clauses=clauses,
+            params=params,
+            order=order,
         )
 
+    async def _get_query_clauses(
+        self: Self, query_info: QueryInfo, include_q: bool = True
+    ) -> Tuple[List[str], List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        for addition in [
+            self._include_ids(ids=query_info.ids),
+            self._include_collections(collections=query_info.collections),
+            self._include_bbox(bbox=query_info.bbox),
+            self._include_intersects(intersects=query_info.intersects),
+            self._include_datetime(datetime_str=query_info.datetime),
+            await self._include_filter(
+                filter_lang=query_info.filter_lang,
+                filter=query_info.filter,
+                collections=query_info.collections,
+            ),
+            self._include_q(q=query_info.q) if include_q else None,
+        ]:
+            if addition is not None:
+                clauses.append(addition.sql)
+                params.extend(addition.params)
+        return (clauses, params)
+
     async def _new_query_info(
         self,
     ) -> QueryInfo:
+        fields = cast(
+            Optional[PostFieldsExtension], getattr(self.search_request, "fields", None)
+        )
         return QueryInfo(
             query_version=current_query_version,
             ids=self.search_request.ids,
@@ -215,6 +431,15 @@ class SearchHandler:
                 str, cast(FilterExtensionPostRequest, self.search_request).filter_lang
             ),
             order=cast(SortExtensionPostRequest, self.search_request).sortby,
+            # the free-text extension may not be enabled, in which case the request has no q attribute
+            q=getattr(self.search_request, "q", None) or None,
+            # the fields extension may not be enabled, in which case the request has no fields attribute
+            fields_include=sorted(fields.include)
+            if fields is not None and fields.include
+            else None,
+            fields_exclude=sorted(fields.exclude)
+            if fields is not None and fields.exclude
+            else None,
             limit=cast(
                 int, self.search_request.limit
             ),  # will have default value if not provided by caller
@@ -254,23 +479,29 @@ class SearchHandler:
         self: Self, ids: Optional[List[str]] = None
     ) -> Optional[FilterClause]:
         if ids is not None:
-            return FilterClause(
-                sql="id IN ({})".format(", ".join(["?" for _ in range(len(ids))])),
-                params=ids,
-            )
+            return self._include_values("id", ids)
         return None
 
     def _include_collections(
         self: Self, collections: Optional[List[str]] = None
     ) -> Optional[FilterClause]:
         if collections is not None:
+            return self._include_values("collection_id", collections)
+        return None
+
+    def _include_values(self: Self, column: str, values: List[str]) -> FilterClause:
+        if len(values) > get_settings().search_value_list_threshold:
+            # Statements with one placeholder per value become slow to parse and bind as lists grow,
+            # as does binding a list parameter. Long lists are bound as a single JSON array and
+            # semi-joined instead, see tests/one_offs/value_list_benchmark.
             return FilterClause(
-                sql="collection_id IN ({})".format(
-                    ", ".join(["?" for _ in range(len(collections))])
-                ),
-                params=collections,
+                sql=f"{column} IN (SELECT unnest(from_json(?, '[\"VARCHAR\"]')))",
+                params=[dumps(values)],
             )
-        return None
+        return FilterClause(
+            sql="{} IN ({})".format(column, ", ".join(["?" for _ in values])),
+            params=values,
+        )
 
     def _include_bbox(
         self: Self, bbox: Optional[BBox] = None
@@ -356,43 +587,28 @@ class SearchHandler:
         collections: Optional[List[str]] = None,
     ) -> Optional[FilterClause]:
         if filter:
-            ast = self._get_ast_from_filter(filter, filter_lang)
-            queryable_config = await get_queryable_config_by_name()
-            collection_ids_for_queryables = collections or []
-            try:
-                return ast_to_filter_clause(
-                    ast=ast,
-                    attribute_configs=[
-                        AttributeConfig(
-                            name=entry.name,
-                            items_column=entry.items_column,
-                            items_column_type=entry.items_column_type,
-                            is_geometry=entry.is_geometry,
-                            is_temporal=entry.is_temporal,
-                        )
-                        for entry in queryable_config.values()
-                        if len(collection_ids_for_queryables) == 0
-                        or entry.collection_id == collection_wildcard
-                        or entry.collection_id in collection_ids_for_queryables
-                    ],
-                )
-            except UnknownField as e:
-                raise InvalidQueryParameter(e.field_name)
-            except (NotAGeometryField, NotATemporalField) as e:
-                raise InvalidQueryParameter(e.argument)
-            except UnknownFunction as e:
-                raise InvalidQueryParameter(e.function_name)
+            filter_clause = await _get_filter_clause(
+                dumps(filter, sort_keys=True, separators=(",", ":")),
+                filter_lang,
+                tuple(sorted(set(collections or []))),
+                get_last_load_id(),
+            )
+            # cached clauses are shared, callers receive their own parameter list
+            return FilterClause(
+                sql=filter_clause.sql, params=list(filter_clause.params)
+            )
         return None
 
-    def _get_ast_from_filter(
-        self, filter_dict: Dict[str, Any], filter_lang: str
-    ) -> Node:
-        if _text_filter_wrap_key in filter_dict:
-            return filter_to_ast(
-                filter_dict[_text_filter_wrap_key], FilterLanguage.TEXT.value
+    def _include_q(self: Self, q: Optional[List[str]] = None) -> Optional[FilterClause]:
+        if q:
+            text_scores = get_text_search_scores(q)
+            return FilterClause(
+                sql="(collection_id, id) IN (SELECT collection_id, id FROM ({}))".format(
+                    text_scores.sql
+                ),
+                params=text_scores.params,
             )
-        else:
-            return filter_to_ast(filter_dict, filter_lang)
+        return None
 
     def _get_bbox_2d(self, bbox: BBox) -> Optional[BBox]:
         if len(bbox) == 4:
@@ -402,3 +618,48 @@ class SearchHandler:
         else:
             _logger.info(f"unhandled bbox parameter in search request: {bbox}")
             return None
+
+
+# Parsing and evaluating a filter is only required the first time a filter is seen for a set of
+# collections, as the filter's queryables depend on those collections, and for an index generation.
+@alru_cache(maxsize=_max_cached_filter_clauses)
+async def _get_filter_clause(
+    canonical_filter: str,
+    filter_lang: str,
+    collections: Tuple[str, ...],
+    _: str,
+) -> FilterClause:
+    ast = _get_ast_from_filter(loads(canonical_filter), filter_lang)
+    queryable_config = await get_queryable_config_by_name()
+    try:
+        return ast_to_filter_clause(
+            ast=ast,
+            attribute_configs=[
+                AttributeConfig(
+                    name=entry.name,
+                    items_column=entry.items_column,
+                    items_column_type=entry.items_column_type,
+                    is_geometry=entry.is_geometry,
+                    is_temporal=entry.is_temporal,
+                )
+                for entry in queryable_config.values()
+                if len(collections) == 0
+                or entry.collection_id == collection_wildcard
+                or entry.collection_id in collections
+            ],
+        )
+    except UnknownField as e:
+        raise InvalidQueryParameter(e.field_name)
+    except (NotAGeometryField, NotATemporalField) as e:
+        raise InvalidQueryParameter(e.argument)
+    except UnknownFunction as e:
+        raise InvalidQueryParameter(e.function_name)
+
+
+def _get_ast_from_filter(filter_dict: Dict[str, Any], filter_lang: str) -> "Node":
+    if _text_filter_wrap_key in filter_dict:
+        return filter_to_ast(
+            filter_dict[_text_filter_wrap_key], FilterLanguage.TEXT.value
+        )
+    else:
+        return filter_to_ast(filter_dict, filter_lang)
@@ -0,0 +1,105 @@
+from typing import Any, AsyncIterator, Callable, Dict, Final, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from orjson import dumps
+from stac_fastapi.types.stac import Item
+
+from stac_fastapi.indexed.constants import type_geojson, type_geojson_seq, type_ndjson
+from stac_fastapi.indexed.search.types import StreamFormat
+from stac_fastapi.indexed.settings import get_settings
+
+# RFC 8142 requires each GeoJSON text in a sequence to be prefixed with an ASCII record separator
+_record_separator: Final[bytes] = b"\x1e"
+_ndjson_media_types: Final[List[str]] = [
+    type_ndjson,
+    "application/ndjson",
+    "application/jsonl",
+]
+_feature_collection_media_types: Final[List[str]] = [
+    type_geojson,
+    "application/json",
+    "application/*",
+    "*/*",
+]
+
+
+def get_stream_format(request: Request) -> Optional[StreamFormat]:
+    for media_type in _get_accepted_media_types(request.headers.get("accept", "")):
+        if media_type == type_geojson_seq:
+            return StreamFormat.GEOJSON_SEQ
+        if media_type in _ndjson_media_types:
+            return StreamFormat.NDJSON
+        if media_type in _feature_collection_media_types:
+            if get_settings().search_stream_feature_collections:
+                return StreamFormat.FEATURE_COLLECTION
+            return None
+    return None
+
+
+def stream_items(
+    stream_format: StreamFormat,
+    items: AsyncIterator[Item],
+    links: List[Dict[str, Any]],
+    get_collection_members: Callable[[int], Dict[str, Any]],
+) -> StreamingResponse:
+    if stream_format == StreamFormat.FEATURE_COLLECTION:
+        return StreamingResponse(
+            _feature_collection_chunks(items, get_collection_members),
+            media_type=type_geojson,
+        )
+    # Sequence formats have nowhere in the body to carry links, so advertise them as headers instead.
+    # Links that require a request body (i.e. POST paging) cannot be expressed this way.
+    link_header = ", ".join(
+        [
+            '<{}>; rel="{}"'.format(link["href"], link["rel"])
+            for link in links
+            if "body" not in link
+        ]
+    )
+    return StreamingResponse(
+        _sequence_chunks(
+            items,
+            _record_separator if stream_format == StreamFormat.GEOJSON_SEQ else b"",
+        ),
+        media_type=type_geojson_seq
+        if stream_format == StreamFormat.GEOJSON_SEQ
+        else type_ndjson,
+        headers={"Link": link_header} if len(link_header) > 0 else None,
+    )
+
+
+async def _sequence_chunks(items: AsyncIterator[Item], prefix: bytes):
+    async for item in items:
+        yield prefix + dumps(item) + b"\n"
+
+
+async def _feature_collection_chunks(
+    items: AsyncIterator[Item],
+    get_collection_members: Callable[[int], Dict[str, Any]],
+):
+    yield b'{"type":"FeatureCollection","features":['
+    returned = 0
+    async for item in items:
+        yield (b"," if returned > 0 else b"") + dumps(item)
+        returned += 1
+    # members that depend on the number of items returned can only be written once all items are sent
+    yield b"]," + dumps(get_collection_members(returned))[1:]
+
+
+def _get_accepted_media_types(accept_header: str) -> List[str]:
+    media_ranges: List[Tuple[float, int, str]] = []
+    for i, media_range in enumerate(accept_header.split(",")):
+        parts = [part.strip() for part in media_range.split(";")]
+        if len(parts[0]) == 0:
+            continue
+        quality = 1.0
+        for parameter in parts[1:]:
+            if parameter.lower().startswith("q="):
+                try:
+                    quality = float(parameter[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            media_ranges.append((-quality, i, parts[0].lower()))
+    return [media_type for _, _, media_type in sorted(media_ranges)]
@@ -0,0 +1,75 @@
+from typing import Final, List
+
+from stac_fastapi.types.errors import InvalidQueryParameter
+from stac_index.indexer.types.text_search import (
+    text_search_dictionary_table,
+    text_search_documents_table,
+    text_search_ignore_pattern,
+    text_search_stats_table,
+    text_search_tables,
+    text_search_terms_table,
+)
+
+from stac_fastapi.indexed.db import format_query_object_name, has_query_object
+from stac_fastapi.indexed.search.filter_clause import FilterClause
+
+# Okapi BM25 parameters, matching the defaults of DuckDB's match_bm25
+_bm25_k1: Final[float] = 1.2
+_bm25_b: Final[float] = 0.75
+
+
+def is_text_search_available() -> bool:
+    return all([has_query_object(table_name) for table_name in text_search_tables])
+
+
+def get_text_search_scores(q: List[str]) -> FilterClause:
+    """Score items matching any free-text search term, as `collection_id, id, score` rows.
+
+    Scores are calculated from the full-text index tables exported at indexing time, so that
+    DuckDB's FTS extension is not required at query time. Query terms are normalised with the
+    same rules applied when the index was built.
+
+    """
+    if not is_text_search_available():
+        raise InvalidQueryParameter(
+            "free-text search is not configured for this index, see text_searchables index configuration"
+        )
+    return FilterClause(
+        sql="""
+        SELECT documents.collection_id
+             , documents.id
+             , SUM(
+                log(((stats.num_docs - dictionary.df + 0.5) / (dictionary.df + 0.5)) + 1)
+                * term_frequencies.tf * ({k1} + 1)
+                / (term_frequencies.tf + {k1} * (1 - {b} + {b} * documents.len / stats.avgdl))
+               ) AS score
+          FROM (
+                SELECT docid, termid, COUNT(*) AS tf
+                  FROM {terms}
+                 WHERE termid IN (
+                    SELECT termid
+                      FROM {dictionary}
+                     WHERE term IN (
+                        SELECT unnest(string_split_regex(
+                            regexp_replace(lower(strip_accents(?)), '{ignore}', ' ', 'g'), ' '
+                        ))
+                    )
+                 )
+              GROUP BY docid, termid
+               ) term_frequencies
+    INNER JOIN {dictionary} dictionary USING (termid)
+    INNER JOIN {documents} documents USING (docid)
+    CROSS JOIN {stats} stats
+      GROUP BY documents.collection_id, documents.id
+        """.format(
+            k1=_bm25_k1,
+            b=_bm25_b,
+            terms=format_query_object_name(text_search_terms_table),
+            dictionary=format_query_object_name(text_search_dictionary_table),
+            documents=format_query_object_name(text_search_documents_table),
+            stats=format_query_object_name(text_search_stats_table),
+            ignore=text_search_ignore_pattern,
+        ),
+        # free-text terms are ORed, so all terms can be tokenised as one document
+        params=[" ".join(q)],
+    )
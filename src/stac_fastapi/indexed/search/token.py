@@ -1,14 +1,19 @@
+from json import dumps, loads
 from logging import Logger, getLogger
-from typing import Final
+from typing import Any, Dict, Final, Tuple
+from zlib import compress, decompress
 
 from fastapi import HTTPException, status
 from jwt import decode, encode
+from jwt.api_jws import decode as decode_jws
+from jwt.api_jws import encode as encode_jws
 from stac_fastapi.types.errors import InvalidQueryParameter
 
 from stac_fastapi.indexed.search.query_info import QueryInfo, current_query_version
 from stac_fastapi.indexed.settings import get_settings
 
 _hashing_algorithm: Final[str] = "HS256"
+_compression_level: Final[int] = 9
 _logger: Final[Logger] = getLogger(__name__)
 
 
@@ -16,19 +21,13 @@ def get_query_info_from_token(
     token: str,
 ) -> QueryInfo:
     try:
-        result = QueryInfo.from_dict(
+        return _get_query_info(
             decode(
                 jwt=token,
                 key=get_settings().token_jwt_secret,
                 algorithms=[_hashing_algorithm],
             )
         )
-        if result.query_version != current_query_version:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Paging token is no longer compatible with this API. Remove the paging token to start again.",
-            )
-        return result
     except Exception as e:
         _logger.warning("error decoding query token", e)
         raise InvalidQueryParameter("invalid search token")
@@ -40,3 +39,66 @@ def create_token_from_query(query_info: QueryInfo) -> str:
         key=get_settings().token_jwt_secret,
         algorithm=_hashing_algorithm,
     )
+
+
+def get_query_info_from_compressed_token(token: str) -> QueryInfo:
+    try:
+        return _get_query_info(
+            loads(
+                decompress(
+                    decode_jws(
+                        jwt=token,
+                        key=get_settings().token_jwt_secret,
+                        algorithms=[_hashing_algorithm],
+                    )
+                )
+            )
+        )
+    except Exception as e:
+        _logger.warning("error decoding compressed query token", e)
+        raise InvalidQueryParameter("invalid search token")
+
+
+def create_compressed_token_from_query(query_info: QueryInfo) -> str:
+    # Signed like a query token, but with a compressed payload, for queries with large parameters.
+    return encode_jws(
+        payload=compress(
+            dumps(query_info.to_dict(), separators=(",", ":")).encode(),
+            _compression_level,
+        ),
+        key=get_settings().token_jwt_secret,
+        algorithm=_hashing_algorithm,
+    )
+
+
+def _get_query_info(payload: Dict[str, Any]) -> QueryInfo:
+    result = QueryInfo.from_dict(payload)
+    if result.query_version != current_query_version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Paging token is no longer compatible with this API. Remove the paging token to start again.",
+        )
+    return result
+
+
+def get_offset_from_token(token: str) -> Tuple[int, str]:
+    # Offset tokens page through queries whose parameters are repeated on each request,
+    # so only the position and the data version need to be carried.
+    try:
+        payload = decode(
+            jwt=token,
+            key=get_settings().token_jwt_secret,
+            algorithms=[_hashing_algorithm],
+        )
+        return (int(payload["offset"]), str(payload["last_load_id"]))
+    except Exception as e:
+        _logger.warning("error decoding offset token", e)
+        raise InvalidQueryParameter("invalid token")
+
+
+def create_offset_token(offset: int, last_load_id: str) -> str:
+    return encode(
+        payload={"offset": offset, "last_load_id": last_load_id},
+        key=get_settings().token_jwt_secret,
+        algorithm=_hashing_algorithm,
+    )
@@ -16,3 +16,21 @@ class SearchMethod(str, Enum):
             if member.value == method.upper():
                 return member
         raise ValueError(f"{method} is not a valid {cls.__name__}")
+
+
+class CountMode(str, Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    OFF = "off"
+
+
+class StreamFormat(str, Enum):
+    GEOJSON_SEQ = "geojson-seq"
+    NDJSON = "ndjson"
+    FEATURE_COLLECTION = "feature-collection"
+
+
+class CursorStoreType(str, Enum):
+    OFF = "off"
+    MEMORY = "memory"
+    DISK = "disk"
@@ -4,6 +4,8 @@ from uuid import uuid4
 
 from stac_fastapi.types.config import ApiSettings, SettingsConfigDict
 
+from stac_fastapi.indexed.search.types import CountMode, CursorStoreType
+
 
 class _Settings(ApiSettings):
     model_config = SettingsConfigDict(
@@ -19,6 +21,38 @@ class _Settings(ApiSettings):
     )
     create_empty_index_if_missing: bool = False
     max_concurrency: int = 10
+    # interrupt any single DuckDB statement running longer than this many seconds, responding 503
+    query_timeout: Optional[float] = None
+    # read index metadata and run representative queries for each index generation before it receives requests
+    index_warm_up: bool = True
+    # prefetch JSON for this many of the most-requested collections when warming up a reloaded index
+    index_warm_up_collection_count: int = 0
+    # log a warning if application startup, including imports and database connection, exceeds this many seconds
+    startup_time_budget: Optional[float] = None
+    # "exact" counts matches in the same scan as the page query, "estimated" uses cached per-collection item counts
+    # and items row group statistics, an upper bound where spatial, filter, or free-text constraints apply,
+    # "off" skips counting
+    search_count_mode: CountMode = CountMode.OFF
+    # stream GeoJSON search responses as a chunked FeatureCollection, rather than building the page in memory.
+    # GeoJSON text sequences and NDJSON are always streamed when requested via the Accept header.
+    search_stream_feature_collections: bool = False
+    # search ids or collections lists longer than this are semi-joined as a single JSON parameter,
+    # rather than expanded into one placeholder per value
+    search_value_list_threshold: int = 100
+    # hold compiled search queries server-side, "memory" or "disk", or "off", paging tokens carry a compressed
+    # query from which a query missing from the store is compiled again
+    search_cursor_store: CursorStoreType = CursorStoreType.OFF
+    search_cursor_store_max_entries: int = 10000
+    # directory of the "disk" cursor store, defaults to a directory in the system temporary directory
+    search_cursor_store_path: Optional[str] = None
+    # paging tokens up to this length are not held in the cursor store
+    search_cursor_min_token_length: int = 512
+    # query the index's DuckDB database file, if the indexer exported one, rather than its parquet files
+    use_index_database: bool = True
+    export_max_rows: int = 100000
+    export_batch_size: int = 1000
+    # maximum number of buckets returned by a frequency aggregation, items in further buckets are reported as overflow
+    aggregation_max_buckets: int = 1000
 
 
 @lru_cache(maxsize=1)
@@ -15,6 +15,7 @@ class SortableConfig:
     type: str
     collection_id: str
     description: str
+    json_path: str
     items_column: str
 
 
@@ -23,7 +24,8 @@ async def get_sortable_configs() -> List[SortableConfig]:
     return await _get_sortable_configs(get_last_load_id())
 
 
-@alru_cache(maxsize=1)
+# one entry for each of the current and reloading index generations
+@alru_cache(maxsize=2)
 async def _get_sortable_configs(_: str) -> List[SortableConfig]:
     _logger.debug("fetching sortable field config")
     return [
@@ -31,14 +33,16 @@ async def _get_sortable_configs(_: str) -> List[SortableConfig]:
             name=row[0],
             collection_id=row[1],
             description=row[2],
-            items_column=row[3],
-            type=row[4],
+            json_path=row[3],
+            items_column=row[4],
+            type=row[5],
         )
         for row in await fetchall(
             f"""
         SELECT name
              , collection_id
              , description
+             , json_path
              , items_column
              , json_type
           FROM {format_query_object_name('sortables_by_collection')}
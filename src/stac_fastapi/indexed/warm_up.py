@@ -0,0 +1,145 @@
+from asyncio import gather
+from collections import Counter
+from copy import deepcopy
+from logging import Logger, getLogger
+from time import time
+from typing import Any, Awaitable, Callable, Dict, Final, List, Optional, Tuple
+
+from stac_fastapi.indexed.db import (
+    fetchall,
+    format_query_object_name,
+    get_index_generation,
+)
+from stac_fastapi.indexed.queryables.queryable_field_map import (
+    get_queryable_config_by_name,
+)
+from stac_fastapi.indexed.search.item_counts import get_item_counts_by_collection
+from stac_fastapi.indexed.search.types import CountMode
+from stac_fastapi.indexed.settings import get_settings
+from stac_fastapi.indexed.sortables.sortable_config import get_sortable_configs
+from stac_fastapi.indexed.stac.fetcher import fetch_dict
+
+_logger: Final[Logger] = getLogger(__name__)
+_timing_precision: Final[int] = 3
+# prefetched collections are retained for the current and reloading index generations
+_max_prefetched_generations: Final[int] = 2
+
+_collection_requests: Counter[str] = Counter()
+_prefetched_collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+
+def record_collection_request(collection_id: str) -> None:
+    _collection_requests[collection_id] += 1
+
+
+def get_prefetched_collection(stac_location: str) -> Optional[Dict[str, Any]]:
+    collection = _prefetched_collections.get(get_index_generation().load_id, {}).get(
+        stac_location
+    )
+    # callers may modify the collection, e.g. when fixing links
+    return deepcopy(collection) if collection is not None else None
+
+
+async def warm_up_index_generation() -> None:
+    """Prepare a new index generation before it receives requests.
+
+    Runs with the new generation in use, so that queries read the new generation's index files
+    and caches keyed by load ID are filled for that generation.
+
+    """
+    settings = get_settings()
+    # configuration caches are always filled, every search requires them
+    steps: List[Tuple[str, Callable[[], Awaitable[Any]]]] = [
+        ("prime configuration caches", _prime_configuration_caches),
+    ]
+    if settings.index_warm_up:
+        steps += [
+            ("read index metadata", _read_index_metadata),
+            ("run representative queries", _run_representative_queries),
+        ]
+        # counts require a scan of all items, and are only used to estimate matched counts
+        if settings.search_count_mode == CountMode.ESTIMATED:
+            steps.append(("prime item counts", get_item_counts_by_collection))
+        if settings.index_warm_up_collection_count > 0:
+            steps.append(("prefetch collections", _prefetch_collections))
+    load_id = get_index_generation().load_id
+    warm_up_start = time()
+    for step_name, step in steps:
+        start = time()
+        await step()
+        _logger.info(
+            "warm-up '{}' for load {} completed in {}s".format(
+                step_name, load_id, round(time() - start, _timing_precision)
+            )
+        )
+    _logger.info(
+        "warm-up for load {} completed in {}s".format(
+            load_id, round(time() - warm_up_start, _timing_precision)
+        )
+    )
+
+
+async def _prime_configuration_caches() -> None:
+    await get_queryable_config_by_name()
+    await get_sortable_configs()
+
+
+async def _read_index_metadata() -> None:
+    # Binding a query reads each parquet file's footer, which DuckDB caches for later queries.
+    # Database tables are already open, so this is inexpensive where a database is attached.
+    for object_name in get_index_generation().parquet_uris.keys():
+        await fetchall(f"SELECT * FROM {format_query_object_name(object_name)} LIMIT 0")
+
+
+async def _run_representative_queries() -> None:
+    # the default item search and collection listing, which most clients request first
+    await fetchall(
+        f"""
+        SELECT stac_location, applied_fixes
+          FROM {format_query_object_name("items")}
+      ORDER BY collection_id, id
+         LIMIT 1
+    """
+    )
+    await fetchall(
+        f"SELECT id FROM {format_query_object_name('collections')} ORDER BY id"
+    )
+
+
+async def _prefetch_collections() -> None:
+    load_id = get_index_generation().load_id
+    collection_ids = [
+        collection_id
+        for collection_id, _ in _collection_requests.most_common(
+            get_settings().index_warm_up_collection_count
+        )
+    ]
+    prefetched: Dict[str, Dict[str, Any]] = {}
+
+    async def prefetch(stac_location: str) -> None:
+        try:
+            prefetched[stac_location] = await fetch_dict(stac_location)
+        except Exception:
+            # a collection that cannot be prefetched is fetched on request instead
+            _logger.warning(f"unable to prefetch collection at '{stac_location}'")
+
+    if len(collection_ids) > 0:
+        await gather(
+            *[
+                prefetch(row[0])
+                for row in await fetchall(
+                    "SELECT stac_location FROM {} WHERE id IN ({})".format(
+                        format_query_object_name("collections"),
+                        ", ".join(["?" for _ in collection_ids]),
+                    ),
+                    collection_ids,
+                )
+            ]
+        )
+    # re-inserted so that the most recently loaded generation is always last
+    _prefetched_collections.pop(load_id, None)
+    _prefetched_collections[load_id] = prefetched
+    for evicted_load_id in list(_prefetched_collections.keys())[
+        :-_max_prefetched_generations
+    ]:
+        del _prefetched_collections[evicted_load_id]
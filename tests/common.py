@@ -1,4 +1,5 @@
 import sys
+from types import SimpleNamespace
 from uuid import uuid4
 
 from pytest import MonkeyPatch
@@ -16,3 +17,18 @@ def monkeypatch_settings(monkeypatch: MonkeyPatch, **kwargs):
             monkeypatch.delenv(key)
         else:
             monkeypatch.setenv(key, value)
+
+
+def get_search_request() -> SimpleNamespace:
+    return SimpleNamespace(
+        token=None,
+        ids=None,
+        collections=None,
+        bbox=None,
+        intersects=None,
+        datetime=None,
+        filter=None,
+        filter_lang="cql2-json",
+        sortby=None,
+        limit=10,
+    )
@@ -0,0 +1,53 @@
+from json import dumps
+from os import environ
+from statistics import mean, median
+from subprocess import run
+from sys import executable, exit
+from time import time
+from typing import Final, List
+
+# Measures the time taken to import the API in a fresh interpreter, as a cold container would,
+# and exits with a non-zero status if the median exceeds a budget. The unit tests enforce the same
+# budget in CI, see tests/test_startup.py; this reports the timings over more iterations.
+test_iterations: Final[int] = int(environ.get("TEST_ITERATIONS", 5))
+budget_seconds: Final[float] = float(environ.get("COLD_START_BUDGET_SECONDS", 1.5))
+# modules that must not be imported until first use
+deferred_modules: Final[List[str]] = [
+    "aiohttp",
+    "mangum",
+    "pygeofilter",
+    "shapely",
+    "stac_index.indexer.creator.creator",
+]
+
+import_times: List[float] = []
+for _ in range(test_iterations):
+    start = time()
+    result = run(
+        [
+            executable,
+            "-c",
+            "import sys, stac_fastapi.indexed.app; print(','.join(sorted(sys.modules)))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_times.append(time() - start)
+    imported_modules = result.stdout.strip().split(",")
+eagerly_imported = [
+    module_name for module_name in deferred_modules if module_name in imported_modules
+]
+print(
+    dumps(
+        {
+            "mean": mean(import_times),
+            "median": median(import_times),
+            "budget": budget_seconds,
+            "eagerly_imported": eagerly_imported,
+        },
+        indent=2,
+    )
+)
+if median(import_times) > budget_seconds or len(eagerly_imported) > 0:
+    exit(1)
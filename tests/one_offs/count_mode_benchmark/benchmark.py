@@ -0,0 +1,109 @@
+from json import dumps
+from os import environ
+from statistics import mean
+from time import time
+from typing import Any, Callable, Dict, Final, List, Optional
+
+from duckdb import connect as duckdb_connect
+
+# Compares the cost of each search count mode (see stac_api_indexed_search_count_mode)
+# against the previous behaviour of a naive COUNT(*) issued alongside the page query.
+items_uri: Final[str] = environ["ITEMS_URI"]
+test_iterations: Final[int] = int(environ.get("TEST_ITERATIONS", 5))
+page_limit: Final[int] = int(environ.get("PAGE_LIMIT", 10))
+where_clauses: Dict[str, Optional[str]] = {
+    "unfiltered": None,
+    "datetime": "datetime >= '2000-01-01T00:00:00Z'",
+    "collection": "collection_id = (SELECT MIN(collection_id) FROM '{items_uri}')",
+}
+test_times: Dict[str, Dict[str, List[float]]] = {
+    where_name: {
+        "off": [],
+        "exact_window": [],
+        "naive_count": [],
+        "estimated": [],
+    }
+    for where_name in where_clauses.keys()
+}
+
+db_connection = duckdb_connect()
+if items_uri.startswith("s3://"):
+    db_connection.execute("INSTALL httpfs; LOAD httpfs")
+    db_connection.execute("CREATE SECRET (TYPE S3, PROVIDER CREDENTIAL_CHAIN)")
+
+
+def page_sql(where: Optional[str], count_column: str = "") -> str:
+    return """
+        SELECT stac_location, applied_fixes{count_column}
+          FROM '{items_uri}'
+          {where}
+      ORDER BY collection_id, id
+         LIMIT {limit}
+    """.format(
+        count_column=count_column,
+        items_uri=items_uri,
+        where="" if where is None else f"WHERE {where.format(items_uri=items_uri)}",
+        limit=page_limit + 1,
+    )
+
+
+def off(where: Optional[str]) -> Any:
+    return len(db_connection.execute(page_sql(where)).fetchall())
+
+
+def exact_window(where: Optional[str]) -> Any:
+    rows = db_connection.execute(
+        page_sql(where, ", COUNT(*) OVER () AS number_matched")
+    ).fetchall()
+    return rows[0][2] if len(rows) > 0 else 0
+
+
+def naive_count(where: Optional[str]) -> Any:
+    db_connection.execute(page_sql(where)).fetchall()
+    return db_connection.execute(
+        "SELECT COUNT(*) FROM '{items_uri}' {where}".format(
+            items_uri=items_uri,
+            where="" if where is None else f"WHERE {where.format(items_uri=items_uri)}",
+        )
+    ).fetchone()[0]
+
+
+def estimated(where: Optional[str]) -> Any:
+    # the API caches these counts per load ID, so this cost is paid once per index change
+    db_connection.execute(page_sql(where)).fetchall()
+    return db_connection.execute(
+        f"SELECT collection_id, COUNT(*) FROM '{items_uri}' GROUP BY collection_id"
+    ).fetchall()
+
+
+def run_test(test_name: str, test: Callable[[Optional[str]], Any]) -> None:
+    for i in range(test_iterations):
+        for where_name, where in where_clauses.items():
+            print(f"testing {test_name} {where_name} ({i})")
+            start = time()
+            test(where)
+            test_times[where_name][test_name].append(time() - start)
+
+
+run_test("off", off)
+run_test("exact_window", exact_window)
+run_test("naive_count", naive_count)
+run_test("estimated", estimated)
+
+for where_name, where in where_clauses.items():
+    if exact_window(where) != naive_count(where):
+        raise Exception(f"Incorrect exact count for {where_name}")
+
+report: Dict[str, Dict[str, Dict[str, float]]] = {}
+for where_name, tests in test_times.items():
+    report[where_name] = {}
+    for test_name, values in tests.items():
+        report[where_name][test_name] = {
+            "mean": mean(values),
+            "min": min(values),
+            "max": max(values),
+        }
+
+print("-----")
+print(dumps(report, indent=2))
+print("-----")
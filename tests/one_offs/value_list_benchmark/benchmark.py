@@ -0,0 +1,87 @@
+from json import dumps
+from os import environ
+from statistics import mean
+from time import time
+from typing import Any, Callable, Dict, Final, List
+
+from duckdb import connect as duckdb_connect
+
+# Compares expanding a search's ids list into one placeholder per value against binding the list
+# as a single JSON parameter and semi-joining it, to locate the crossover used for
+# stac_api_indexed_search_value_list_threshold.
+items_uri: Final[str] = environ["ITEMS_URI"]
+test_iterations: Final[int] = int(environ.get("TEST_ITERATIONS", 5))
+page_limit: Final[int] = int(environ.get("PAGE_LIMIT", 10))
+list_lengths: Final[List[int]] = [
+    int(length)
+    for length in environ.get("LIST_LENGTHS", "10,50,100,250,1000,5000").split(",")
+]
+
+db_connection = duckdb_connect()
+if items_uri.startswith("s3://"):
+    db_connection.execute("INSTALL httpfs; LOAD httpfs")
+    db_connection.execute("CREATE SECRET (TYPE S3, PROVIDER CREDENTIAL_CHAIN)")
+
+
+def page_sql(where: str) -> str:
+    return """
+        SELECT stac_location, applied_fixes
+          FROM '{items_uri}'
+         WHERE {where}
+      ORDER BY collection_id, id
+         LIMIT {limit}
+    """.format(items_uri=items_uri, where=where, limit=page_limit + 1)
+
+
+def placeholders(ids: List[str]) -> Any:
+    return db_connection.execute(
+        page_sql("id IN ({})".format(", ".join(["?" for _ in ids]))), ids
+    ).fetchall()
+
+
+def json_semi_join(ids: List[str]) -> Any:
+    return db_connection.execute(
+        page_sql("id IN (SELECT unnest(from_json(?, '[\"VARCHAR\"]')))"),
+        [dumps(ids)],
+    ).fetchall()
+
+
+# sample ids spread across the index, so that matches are not clustered in a single row group
+all_ids: Final[List[str]] = [
+    row[0]
+    for row in db_connection.execute(
+        f"SELECT id FROM '{items_uri}' USING SAMPLE {max(list_lengths)} ROWS"
+    ).fetchall()
+]
+tests: Dict[str, Callable[[List[str]], Any]] = {
+    "placeholders": placeholders,
+    "json_semi_join": json_semi_join,
+}
+test_times: Dict[int, Dict[str, List[float]]] = {
+    length: {test_name: [] for test_name in tests.keys()} for length in list_lengths
+}
+
+for length in list_lengths:
+    ids = all_ids[0:length]
+    if placeholders(ids) != json_semi_join(ids):
+        raise Exception(f"Results differ for {length} ids")
+    for i in range(test_iterations):
+        for test_name, test in tests.items():
+            print(f"testing {test_name} {length} ({i})")
+            start = time()
+            test(ids)
+            test_times[length][test_name].append(time() - start)
+
+report: Dict[int, Dict[str, Dict[str, float]]] = {}
+for length, times in test_times.items():
+    report[length] = {}
+    for test_name, values in times.items():
+        report[length][test_name] = {
+            "mean": mean(values),
+            "min": min(values),
+            "max": max(values),
+        }
+
+print("-----")
+print(dumps(report, indent=2))
+print("-----")
@@ -0,0 +1,148 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import duckdb
+import pytest
+from common import get_search_request, monkeypatch_settings
+from stac_fastapi.types.errors import InvalidQueryParameter
+
+
+@pytest.fixture(autouse=True)
+def setup(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch_settings(monkeypatch)
+
+
+def _get_fetchall(connection: duckdb.DuckDBPyConnection):
+    async def fetchall(statement, params=None):
+        return connection.execute(statement, params).fetchall()
+
+    return fetchall
+
+
+@pytest.mark.asyncio
+@mock.patch(
+    "stac_fastapi.indexed.aggregation.aggregation_handler.get_queryable_config_by_name"
+)
+@mock.patch(
+    "stac_fastapi.indexed.aggregation.aggregation_handler.format_query_object_name"
+)
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_last_load_id")
+@mock.patch("stac_fastapi.indexed.aggregation.aggregation_handler.fetchall")
+async def test_aggregate(
+    fetchall_mock: mock.AsyncMock,
+    get_last_load_id_mock: mock.MagicMock,
+    format_query_object_name_mock: mock.MagicMock,
+    get_queryable_config_by_name_mock: mock.AsyncMock,
+) -> None:
+    from stac_fastapi.indexed.aggregation.aggregation_handler import AggregationHandler
+
+    connection = duckdb.connect()
+    connection.execute(
+        """
+        CREATE TABLE items AS SELECT * FROM (VALUES
+            ('c1', TIMESTAMPTZ '2020-01-05 00:00:00+00', NULL, NULL, 10.0),
+            ('c1', TIMESTAMPTZ '2020-01-20 00:00:00+00', NULL, NULL, 30.0),
+            ('c2', NULL, TIMESTAMPTZ '2020-02-01 00:00:00+00', TIMESTAMPTZ '2020-03-01 00:00:00+00', NULL),
+        ) t(collection_id, datetime, start_datetime, end_datetime, i_gsd)
+        """
+    )
+    fetchall_mock.side_effect = _get_fetchall(connection)
+    format_query_object_name_mock.return_value = "items"
+    get_queryable_config_by_name_mock.return_value = {
+        "gsd": SimpleNamespace(
+            name="gsd",
+            collection_id="*",
+            items_column="i_gsd",
+            items_column_type="DOUBLE",
+        ),
+    }
+    result = await AggregationHandler(
+        search_request=get_search_request(),
+        request=SimpleNamespace(headers={}),
+        aggregations=[
+            "total_count",
+            "collection_frequency",
+            "datetime_frequency",
+            "gsd_max",
+        ],
+    ).aggregate()
+    assert [aggregation["name"] for aggregation in result] == [
+        "total_count",
+        "collection_frequency",
+        "datetime_frequency",
+        "gsd_max",
+    ]
+    assert result[0]["value"] == 3
+    assert [
+        (bucket["key"], bucket["frequency"]) for bucket in result[1]["buckets"]
+    ] == [("c1", 2), ("c2", 1)]
+    assert [bucket["frequency"] for bucket in result[2]["buckets"]] == [2, 1]
+    assert result[3]["value"] == 30.0
+    # single-value aggregations share one query, each frequency distribution is one more
+    assert fetchall_mock.call_count == 3
+
+
+@pytest.mark.asyncio
+@mock.patch(
+    "stac_fastapi.indexed.aggregation.aggregation_handler.get_queryable_config_by_name"
+)
+@mock.patch(
+    "stac_fastapi.indexed.aggregation.aggregation_handler.format_query_object_name"
+)
+@mock.patch("stac_fastapi.indexed.aggregation.aggregation_handler.get_settings")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_last_load_id")
+@mock.patch("stac_fastapi.indexed.aggregation.aggregation_handler.fetchall")
+async def test_aggregate_frequency_overflow(
+    fetchall_mock: mock.AsyncMock,
+    get_last_load_id_mock: mock.MagicMock,
+    get_settings_mock: mock.MagicMock,
+    format_query_object_name_mock: mock.MagicMock,
+    get_queryable_config_by_name_mock: mock.AsyncMock,
+) -> None:
+    from stac_fastapi.indexed.aggregation.aggregation_handler import AggregationHandler
+
+    connection = duckdb.connect()
+    connection.execute(
+        """
+        CREATE TABLE items AS SELECT * FROM (VALUES ('c1'), ('c1'), ('c1'), ('c2'), ('c2'), ('c3')) t(collection_id)
+        """
+    )
+    fetchall_mock.side_effect = _get_fetchall(connection)
+    get_settings_mock.return_value = SimpleNamespace(aggregation_max_buckets=2)
+    format_query_object_name_mock.return_value = "items"
+    get_queryable_config_by_name_mock.return_value = {}
+    result = await AggregationHandler(
+        search_request=get_search_request(),
+        request=SimpleNamespace(headers={}),
+        aggregations=["collection_frequency"],
+    ).aggregate()
+    # the least frequent buckets are cut off, and their items reported as overflow
+    assert [
+        (bucket["key"], bucket["frequency"]) for bucket in result[0]["buckets"]
+    ] == [("c1", 3), ("c2", 2)]
+    assert result[0]["overflow"] == 1
+
+
+@pytest.mark.asyncio
+@mock.patch(
+    "stac_fastapi.indexed.aggregation.aggregation_handler.get_queryable_config_by_name"
+)
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_last_load_id")
+@mock.patch("stac_fastapi.indexed.aggregation.aggregation_handler.fetchall")
+async def test_aggregate_unknown_rejected(
+    fetchall_mock: mock.AsyncMock,
+    get_last_load_id_mock: mock.MagicMock,
+    get_queryable_config_by_name_mock: mock.AsyncMock,
+) -> None:
+    from stac_fastapi.indexed.aggregation.aggregation_handler import AggregationHandler
+
+    get_queryable_config_by_name_mock.return_value = {}
+    with pytest.raises(InvalidQueryParameter):
+        await AggregationHandler(
+            search_request=get_search_request(),
+            request=SimpleNamespace(headers={}),
+            aggregations=["unknown_frequency"],
+        ).aggregate()
+    fetchall_mock.assert_not_called()
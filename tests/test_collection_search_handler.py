@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+from unittest import mock
+from uuid import uuid4
+
+import duckdb
+import pytest
+from common import monkeypatch_settings
+
+_handler_module = "stac_fastapi.indexed.collection_search.collection_search_handler"
+
+
+@pytest.fixture(autouse=True)
+def setup(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch_settings(monkeypatch)
+
+
+@pytest.mark.asyncio
+@mock.patch(f"{_handler_module}.get_collection_column_names")
+@mock.patch(f"{_handler_module}.format_query_object_name")
+@mock.patch(f"{_handler_module}.get_last_load_id")
+@mock.patch(f"{_handler_module}.get_collections_link")
+@mock.patch(f"{_handler_module}.get_catalog_link")
+@mock.patch(f"{_handler_module}.get_token_link")
+@mock.patch(f"{_handler_module}.fix_collection_links")
+@mock.patch(f"{_handler_module}.fetch_dict")
+@mock.patch(f"{_handler_module}.fetchall")
+async def test_collection_search_paged(
+    fetchall_mock: mock.AsyncMock,
+    fetch_dict_mock: mock.AsyncMock,
+    fix_collection_links_mock: mock.MagicMock,
+    get_token_link_mock: mock.MagicMock,
+    get_catalog_link_mock: mock.MagicMock,
+    get_collections_link_mock: mock.MagicMock,
+    get_last_load_id_mock: mock.MagicMock,
+    format_query_object_name_mock: mock.MagicMock,
+    get_collection_column_names_mock: mock.AsyncMock,
+) -> None:
+    from stac_fastapi.indexed.collection_search.collection_search_handler import (
+        CollectionSearchHandler,
+    )
+    from stac_fastapi.indexed.search.types import SearchDirection
+
+    fetchall_mock.return_value = [["", 5], ["", 5], ["", 5]]
+    fetch_dict_mock.side_effect = [{"id": "c1"}, {"id": "c2"}]
+    fix_collection_links_mock.side_effect = lambda collection, _: collection
+    get_token_link_mock.return_value = {"rel": "next"}
+    get_last_load_id_mock.return_value = "load id"
+    get_collection_column_names_mock.return_value = {"title", "description", "keywords"}
+    result = await CollectionSearchHandler(
+        request=SimpleNamespace(),
+        q=["ocean", "coast"],
+        limit=2,
+    ).search()
+    query, params = fetchall_mock.call_args[0]
+    assert query.count("contains(") == 2
+    assert params == ["ocean", "coast", 3, 0]
+    assert fetch_dict_mock.call_count == 2
+    assert result["numberMatched"] == 5
+    assert result["numberReturned"] == 2
+    assert get_token_link_mock.call_args[0][1] == SearchDirection.Next
+
+
+@pytest.mark.asyncio
+@mock.patch(f"{_handler_module}.format_query_object_name")
+@mock.patch(f"{_handler_module}.get_last_load_id")
+@mock.patch(f"{_handler_module}.fetchall")
+async def test_collection_search_index_without_columns(
+    fetchall_mock: mock.AsyncMock,
+    get_last_load_id_mock: mock.MagicMock,
+    format_query_object_name_mock: mock.MagicMock,
+) -> None:
+    from stac_fastapi.types.errors import InvalidQueryParameter
+
+    from stac_fastapi.indexed.collection_search.collection_search_handler import (
+        CollectionSearchHandler,
+    )
+
+    # an index created before collection metadata columns were added
+    connection = duckdb.connect()
+    connection.execute(
+        "CREATE TABLE collections AS SELECT 'c1' AS id, 'c1.json' AS stac_location"
+    )
+
+    async def fetchall(statement, params=None):
+        return connection.execute(statement, params).fetchall()
+
+    fetchall_mock.side_effect = fetchall
+    get_last_load_id_mock.return_value = uuid4().hex
+    format_query_object_name_mock.return_value = "collections"
+    for parameters in [
+        {"bbox": [0, 0, 1, 1]},
+        {"datetime": "2020-01-01T00:00:00Z"},
+        {"q": ["ocean"]},
+    ]:
+        with pytest.raises(InvalidQueryParameter):
+            await CollectionSearchHandler(
+                request=SimpleNamespace(), **parameters
+            ).search()
+    connection.close()
@@ -80,6 +80,7 @@ async def test_get_item_indexed_but_missing(
 
 
 @pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.core.get_prefetched_collection", return_value=None)
 @mock.patch("stac_fastapi.indexed.core.format_query_object_name")
 @mock.patch("stac_fastapi.indexed.core.fetch_dict")
 @mock.patch("stac_fastapi.indexed.core.fix_collection_links")
@@ -104,6 +105,7 @@ async def test_get_collection_success(
 
 
 @pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.core.get_prefetched_collection", return_value=None)
 @mock.patch("stac_fastapi.indexed.core.format_query_object_name")
 @mock.patch("stac_fastapi.indexed.core.fetch_dict")
 @mock.patch("stac_fastapi.indexed.core.fetchone")
@@ -126,12 +128,22 @@ async def test_get_collection_indexed_but_missing(
 
 
 @pytest.mark.asyncio
-@mock.patch("stac_fastapi.indexed.core.format_query_object_name")
-@mock.patch("stac_fastapi.indexed.core.get_collections_link")
-@mock.patch("stac_fastapi.indexed.core.get_catalog_link")
-@mock.patch("stac_fastapi.indexed.core.fix_collection_links")
-@mock.patch("stac_fastapi.indexed.core.fetch_dict")
-@mock.patch("stac_fastapi.indexed.core.fetchall")
+@mock.patch(
+    "stac_fastapi.indexed.collection_search.collection_search_handler.format_query_object_name"
+)
+@mock.patch(
+    "stac_fastapi.indexed.collection_search.collection_search_handler.get_collections_link"
+)
+@mock.patch(
+    "stac_fastapi.indexed.collection_search.collection_search_handler.get_catalog_link"
+)
+@mock.patch(
+    "stac_fastapi.indexed.collection_search.collection_search_handler.fix_collection_links"
+)
+@mock.patch(
+    "stac_fastapi.indexed.collection_search.collection_search_handler.fetch_dict"
+)
+@mock.patch("stac_fastapi.indexed.collection_search.collection_search_handler.fetchall")
 async def test_all_collections_success(
     fetchall_mock: mock.AsyncMock,
     fetch_dict_mock: mock.AsyncMock,
@@ -139,7 +151,7 @@ async def test_all_collections_success(
     *args,
 ) -> None:
     assert core is not None, "init failure"
-    fetchall_mock.return_value = [[""], [""]]
+    fetchall_mock.return_value = [["", 2], ["", 2]]
     fetch_dict_mock.side_effect = [
         {"id": "mock collection 1"},
         {"id": "mock collection 2"},
@@ -164,12 +176,22 @@ async def test_all_collections_success(
 
 
 @pytest.mark.asyncio
-@mock.patch("stac_fastapi.indexed.core.format_query_object_name")
-@mock.patch("stac_fastapi.indexed.core.get_collections_link")
-@mock.patch("stac_fastapi.indexed.core.get_catalog_link")
-@mock.patch("stac_fastapi.indexed.core.fix_collection_links")
-@mock.patch("stac_fastapi.indexed.core.fetch_dict")
-@mock.patch("stac_fastapi.indexed.core.fetchall")
+@mock.patch(
+    "stac_fastapi.indexed.collection_search.collection_search_handler.format_query_object_name"
+)
+@mock.patch(
+    "stac_fastapi.indexed.collection_search.collection_search_handler.get_collections_link"
+)
+@mock.patch(
+    "stac_fastapi.indexed.collection_search.collection_search_handler.get_catalog_link"
+)
+@mock.patch(
+    "stac_fastapi.indexed.collection_search.collection_search_handler.fix_collection_links"
+)
+@mock.patch(
+    "stac_fastapi.indexed.collection_search.collection_search_handler.fetch_dict"
+)
+@mock.patch("stac_fastapi.indexed.collection_search.collection_search_handler.fetchall")
 async def test_all_collections_partial_indexed_but_missing(
     fetchall_mock: mock.AsyncMock,
     fetch_dict_mock: mock.AsyncMock,
@@ -179,7 +201,7 @@ async def test_all_collections_partial_indexed_but_missing(
     from stac_index.io.readers.exceptions import UriNotFoundException
 
     assert core is not None, "init failure"
-    fetchall_mock.return_value = [[""], [""]]
+    fetchall_mock.return_value = [["", 2], ["", 2]]
     fetch_dict_mock.side_effect = [
         {"id": "mock collection 1"},
         UriNotFoundException("uri"),
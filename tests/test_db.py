@@ -0,0 +1,133 @@
+from asyncio import Event, sleep
+from os import path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import mock
+
+import duckdb
+import pytest
+from common import monkeypatch_settings
+
+
+@pytest.fixture(autouse=True)
+def setup(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch_settings(monkeypatch)
+
+
+def test_attach_database() -> None:
+    from stac_fastapi.indexed import db
+
+    with TemporaryDirectory() as tmp_dir:
+        database_path = path.join(tmp_dir, "index.duckdb")
+        with duckdb.connect(database_path) as database_connection:
+            database_connection.execute(
+                "CREATE TABLE items AS SELECT 'c1' AS collection_id, 'a' AS id"
+            )
+        connection = duckdb.connect()
+        generation = db.IndexGeneration(
+            load_id="load1",
+            manifest_last_modified=1,
+            parquet_uris={"items": "/not/read.parquet"},
+            database_uri=database_path,
+        )
+        with mock.patch.object(db, "_root_db_connection", connection):
+            db._attach_database(generation)
+            # attached tables are preferred over parquet files
+            assert generation.format_query_object_name("items").endswith('."items"')
+            assert connection.execute(
+                f"SELECT id FROM {generation.format_query_object_name('items')}"
+            ).fetchall() == [("a",)]
+            with pytest.raises(duckdb.Error):
+                connection.execute(
+                    f"INSERT INTO {generation.format_query_object_name('items')} VALUES ('c1', 'b')"
+                )
+            database_alias = generation.database_alias
+            db._release_generation(generation)
+            assert (
+                connection.execute(
+                    "SELECT COUNT(*) FROM duckdb_databases() WHERE database_name = ?",
+                    [database_alias],
+                ).fetchone()[0]
+                == 0
+            )
+        connection.close()
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.db._release_generation")
+@mock.patch("stac_fastapi.indexed.db._load_generation")
+@mock.patch("stac_fastapi.indexed.db._get_manifest_last_modified")
+async def test_reload_keeps_request_snapshot(
+    get_manifest_last_modified_mock: mock.AsyncMock,
+    load_generation_mock: mock.AsyncMock,
+    release_generation_mock: mock.MagicMock,
+) -> None:
+    from stac_fastapi.indexed import db
+
+    old_generation = db.IndexGeneration(load_id="old", manifest_last_modified=1)
+    new_generation = db.IndexGeneration(load_id="new", manifest_last_modified=2)
+    load_started = Event()
+    load_may_complete = Event()
+
+    async def load_generation(_):
+        load_started.set()
+        await load_may_complete.wait()
+        return new_generation
+
+    load_generation_mock.side_effect = load_generation
+    get_manifest_last_modified_mock.return_value = 2
+    with (
+        mock.patch.object(db, "_current_generation", old_generation),
+        mock.patch.object(db, "_reload_task", None),
+    ):
+        async with db.use_index_generation():
+            await load_started.wait()
+            # requests arriving during a reload are not blocked, and use the current generation
+            async with db.use_index_generation():
+                assert db.get_last_load_id() == "old"
+            load_may_complete.set()
+            await db._reload_task
+            # a request continues to use its generation after a reload completes
+            assert db.get_last_load_id() == "old"
+            assert old_generation.retired
+            release_generation_mock.assert_not_called()
+        # the retired generation is released once its last request completes
+        release_generation_mock.assert_called_once_with(old_generation)
+        async with db.use_index_generation():
+            assert db.get_last_load_id() == "new"
+        await sleep(0)
+        assert load_generation_mock.call_count == 1
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.db.get_settings")
+async def test_statement_interrupted(get_settings_mock: mock.MagicMock) -> None:
+    from fastapi import HTTPException
+
+    from stac_fastapi.indexed import db
+
+    long_running_statement = (
+        "SELECT SUM(a.range * b.range) FROM range(100000000) a, range(100000) b"
+    )
+    connection = duckdb.connect()
+    with mock.patch.object(db, "_root_db_connection", connection):
+        get_settings_mock.return_value = SimpleNamespace(query_timeout=0.2)
+        with pytest.raises(HTTPException) as exception_info:
+            await db.fetchall(long_running_statement, perform_latest_data_check=False)
+        assert exception_info.value.status_code == 503
+        get_settings_mock.return_value = SimpleNamespace(query_timeout=None)
+
+        async def disconnect_check() -> bool:
+            return True
+
+        with db.watch_for_disconnect(disconnect_check):
+            with pytest.raises(HTTPException) as exception_info:
+                await db.fetchall(
+                    long_running_statement, perform_latest_data_check=False
+                )
+        assert exception_info.value.status_code == 408
+        # the connection remains usable after statements are interrupted
+        assert await db.fetchall("SELECT 1", perform_latest_data_check=False) == [(1,)]
+    connection.close()
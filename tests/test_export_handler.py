@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from common import get_search_request, monkeypatch_settings
+from stac_fastapi.types.errors import InvalidQueryParameter
+
+
+@pytest.fixture(autouse=True)
+def setup(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch_settings(monkeypatch)
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.export.export_handler.format_query_object_name")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_last_load_id")
+@mock.patch("stac_fastapi.indexed.search.search_handler.StacParser")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_sortable_configs_by_field")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fix_item_links")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fetch_dict")
+@mock.patch("stac_fastapi.indexed.export.export_handler.iterate_batches")
+async def test_export_items_ndjson(
+    iterate_batches_mock: mock.MagicMock,
+    fetch_dict_mock: mock.AsyncMock,
+    fix_item_links_mock: mock.MagicMock,
+    get_sortable_configs_by_field_mock: mock.MagicMock,
+    stac_parser_mock: mock.MagicMock,
+    *args,
+) -> None:
+    from stac_fastapi.indexed.export.export_handler import ExportHandler
+    from stac_fastapi.indexed.export.types import ExportContent, ExportFormat
+
+    batches = [[["", ""], ["", ""]], [["", ""]]]
+
+    async def iterate_batches(*args, **kwargs):
+        for batch in batches:
+            yield batch
+
+    iterate_batches_mock.side_effect = iterate_batches
+    fetch_dict_mock.side_effect = [{"id": f"mock item {i}"} for i in range(3)]
+    fix_item_links_mock.side_effect = [{"id": f"mock fixed item {i}"} for i in range(3)]
+    get_sortable_configs_by_field_mock.return_value = {
+        "collection": SimpleNamespace(items_column="col1"),
+        "id": SimpleNamespace(items_column="col2"),
+    }
+    stac_parser_mock.side_effect = [
+        SimpleNamespace(
+            parse_stac_item=mock.Mock(return_value=[None, {}]),
+        )
+        for _ in range(3)
+    ]
+    result = await ExportHandler(
+        search_request=get_search_request(),
+        request=SimpleNamespace(headers={}),
+        export_format=ExportFormat.NDJSON,
+        export_content=ExportContent.ITEMS,
+        max_rows=5,
+    ).export()
+    body = b"".join([chunk async for chunk in result.body_iterator])
+    assert body == (
+        b'{"id":"mock fixed item 0"}\n'
+        b'{"id":"mock fixed item 1"}\n'
+        b'{"id":"mock fixed item 2"}\n'
+    )
+    query, params = iterate_batches_mock.call_args[0]
+    assert "LIMIT ?" in query
+    assert params[-1] == 5
+
+
+@pytest.mark.asyncio
+async def test_export_geoparquet_items_rejected() -> None:
+    from stac_fastapi.indexed.export.export_handler import ExportHandler
+    from stac_fastapi.indexed.export.types import ExportContent, ExportFormat
+
+    with pytest.raises(InvalidQueryParameter):
+        await ExportHandler(
+            search_request=get_search_request(),
+            request=SimpleNamespace(headers={}),
+            export_format=ExportFormat.GEOPARQUET,
+            export_content=ExportContent.ITEMS,
+        ).export()
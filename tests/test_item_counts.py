@@ -0,0 +1,93 @@
+from datetime import datetime, timezone
+from os import path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import mock
+
+import duckdb
+import pytest
+from common import monkeypatch_settings
+
+
+@pytest.fixture(autouse=True)
+def setup(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch_settings(monkeypatch)
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.search.item_counts.format_query_object_name")
+@mock.patch("stac_fastapi.indexed.search.item_counts.get_index_generation")
+@mock.patch("stac_fastapi.indexed.search.item_counts.get_last_load_id")
+@mock.patch("stac_fastapi.indexed.search.item_counts.fetchall")
+async def test_estimated_item_count(
+    fetchall_mock: mock.AsyncMock,
+    get_last_load_id_mock: mock.MagicMock,
+    get_index_generation_mock: mock.MagicMock,
+    format_query_object_name_mock: mock.MagicMock,
+) -> None:
+    from stac_fastapi.indexed.search.item_counts import get_estimated_item_count
+
+    connection = duckdb.connect()
+
+    async def fetchall(statement, params=None):
+        return connection.execute(statement, params).fetchall()
+
+    fetchall_mock.side_effect = fetchall
+    get_last_load_id_mock.return_value = "load1"
+    with TemporaryDirectory() as tmp_dir:
+        items_uri = path.join(tmp_dir, "items.parquet")
+        # 4 row groups, c1 items dated in January 2020 and c2 items spanning 2021
+        connection.execute(
+            f"""
+            COPY (
+                SELECT 'c' || (1 + i // 4096) AS collection_id
+                     , printf('%05d', i) AS id
+                     , CASE WHEN i < 4096 THEN TIMESTAMPTZ '2020-01-01 00:00:00+00' END AS datetime
+                     , CASE WHEN i >= 4096 THEN TIMESTAMPTZ '2021-01-01 00:00:00+00' END AS start_datetime
+                     , CASE WHEN i >= 4096 THEN TIMESTAMPTZ '2021-12-31 00:00:00+00' END AS end_datetime
+                  FROM range(8192) t(i)
+              ORDER BY i
+            ) TO '{items_uri}' (FORMAT PARQUET, ROW_GROUP_SIZE 2048)
+            """
+        )
+        format_query_object_name_mock.return_value = f"'{items_uri}'"
+        get_index_generation_mock.return_value = SimpleNamespace(
+            parquet_uris={"items": items_uri}
+        )
+
+        def utc(year: int, month: int, day: int) -> datetime:
+            return datetime(year, month, day, tzinfo=timezone.utc)
+
+        assert await get_estimated_item_count() == 8192
+        assert await get_estimated_item_count(collections=["c2", "c2"]) == 4096
+        # ids are unique within a collection
+        assert await get_estimated_item_count(ids=["00001"]) == 2
+        assert await get_estimated_item_count(collections=["c1"], ids=["00001"]) == 1
+        # row groups whose datetime statistics cannot match are excluded
+        assert (
+            await get_estimated_item_count(
+                datetime_interval=(utc(2020, 1, 1), utc(2020, 1, 1))
+            )
+            == 4096
+        )
+        assert (
+            await get_estimated_item_count(datetime_interval=(utc(2021, 6, 1), None))
+            == 4096
+        )
+        assert (
+            await get_estimated_item_count(
+                collections=["c1"], datetime_interval=(None, utc(2019, 1, 1))
+            )
+            == 0
+        )
+        # without an items parquet file the estimate is bounded by collection counts alone
+        get_index_generation_mock.return_value = SimpleNamespace(parquet_uris={})
+        assert (
+            await get_estimated_item_count(
+                datetime_interval=(utc(2020, 1, 1), utc(2020, 1, 1))
+            )
+            == 8192
+        )
+    connection.close()
@@ -0,0 +1,45 @@
+from asyncio import Event
+
+import pytest
+from common import monkeypatch_settings
+
+
+@pytest.fixture(autouse=True)
+def setup(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch_settings(monkeypatch)
+
+
+@pytest.mark.asyncio
+async def test_disconnect_check_replays_consumed_messages() -> None:
+    from stac_fastapi.indexed import db
+    from stac_fastapi.indexed.middleware.query_cancellation_middleware import (
+        QueryCancellationMiddleware,
+    )
+
+    messages = [
+        {"type": "http.request", "body": b"first", "more_body": True},
+        {"type": "http.request", "body": b"second", "more_body": False},
+    ]
+    no_more_messages = Event()
+
+    async def receive():
+        if len(messages) > 0:
+            return messages.pop(0)
+        await no_more_messages.wait()
+        return {"type": "http.disconnect"}
+
+    received = []
+
+    async def app(scope, receive, send):
+        # checks made by statements before the body is read in full must not lose body chunks
+        disconnect_check = db._request_disconnect_check.get()
+        assert not await disconnect_check()
+        received.append(await receive())
+        assert not await disconnect_check()
+        assert not await disconnect_check()
+        received.append(await receive())
+
+    await QueryCancellationMiddleware(app)({"type": "http"}, receive, None)
+    assert [message["body"] for message in received] == [b"first", b"second"]
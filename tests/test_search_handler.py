@@ -1,6 +1,10 @@
+from os import chmod, makedirs, path, stat
+from stat import S_IMODE
+from tempfile import TemporaryDirectory
 from types import SimpleNamespace
 from unittest import mock
 
+import duckdb
 import pytest
 from common import monkeypatch_settings
 
@@ -67,7 +71,7 @@ async def test_search_multi_item_success(
             sortby=None,
             limit=10,
         ),
-        request=SimpleNamespace(),
+        request=SimpleNamespace(headers={}),
     ).search()
     assert sorted(result["features"], key=lambda x: x.id) == sorted(
         fixed_items_mock_value, key=lambda x: x.id
@@ -126,7 +130,477 @@ async def test_search_multi_item_partial_indexed_but_missing(
             sortby=None,
             limit=10,
         ),
-        request=SimpleNamespace(),
+        request=SimpleNamespace(headers={}),
     ).search()
     assert len(result["features"]) == 1
     assert result["features"][0] == fixed_items_mock_value[0]
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.search.search_handler.format_query_object_name")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_last_load_id")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_search_link")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_catalog_link")
+@mock.patch("stac_fastapi.indexed.search.search_handler.StacParser")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_sortable_configs_by_field")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fix_item_links")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fetch_dict")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_settings")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fetchall")
+async def test_search_exact_count(
+    fetchall_mock: mock.AsyncMock,
+    get_settings_mock: mock.MagicMock,
+    fetch_dict_mock: mock.AsyncMock,
+    fix_item_links_mock: mock.MagicMock,
+    get_sortable_configs_by_field_mock: mock.MagicMock,
+    stac_parser_mock: mock.MagicMock,
+    *args,
+) -> None:
+    from stac_fastapi.indexed.search.search_handler import SearchHandler
+    from stac_fastapi.indexed.search.types import CountMode
+
+    get_settings_mock.return_value = SimpleNamespace(
+        search_count_mode=CountMode.EXACT,
+        max_concurrency=10,
+    )
+    fetchall_mock.return_value = [["", "", 42], ["", "", 42]]
+    fetch_dict_mock.side_effect = [
+        {"id": "mock item 1"},
+        {"id": "mock item 2"},
+    ]
+    fix_item_links_mock.side_effect = [
+        SimpleNamespace(id="mock fixed item 1"),
+        SimpleNamespace(id="mock fixed item 2"),
+    ]
+    get_sortable_configs_by_field_mock.return_value = {
+        "collection": SimpleNamespace(items_column="col1"),
+        "id": SimpleNamespace(items_column="col2"),
+    }
+    stac_parser_mock.side_effect = [
+        SimpleNamespace(
+            parse_stac_item=mock.Mock(return_value=[None, {}]),
+        )
+        for _ in range(len(fetchall_mock.return_value))
+    ]
+    result = await SearchHandler(
+        search_request=SimpleNamespace(
+            token=None,
+            ids=None,
+            collections=None,
+            bbox=None,
+            intersects=None,
+            datetime=None,
+            filter=None,
+            filter_lang="cql2-json",
+            sortby=None,
+            limit=10,
+        ),
+        request=SimpleNamespace(headers={}),
+    ).search()
+    assert "COUNT(*) OVER ()" in fetchall_mock.call_args[0][0]
+    assert result["numberMatched"] == 42
+    assert result["numberReturned"] == 2
+    assert result["context"] == {"returned": 2, "limit": 10, "matched": 42}
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.search.search_handler.format_query_object_name")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_last_load_id")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_search_link")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_catalog_link")
+@mock.patch("stac_fastapi.indexed.search.search_handler.StacParser")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_sortable_configs_by_field")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fix_item_links")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fetch_dict")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fetchall")
+async def test_search_stream_geojson_seq(
+    fetchall_mock: mock.AsyncMock,
+    fetch_dict_mock: mock.AsyncMock,
+    fix_item_links_mock: mock.MagicMock,
+    get_sortable_configs_by_field_mock: mock.MagicMock,
+    stac_parser_mock: mock.MagicMock,
+    *args,
+) -> None:
+    from stac_fastapi.indexed.search.search_handler import SearchHandler
+
+    fetchall_mock.return_value = [["", ""], ["", ""], ["", ""]]
+    fetch_dict_mock.side_effect = [
+        {"id": "mock item 1"},
+        {"id": "mock item 2"},
+        {"id": "mock item 3"},
+    ]
+    fix_item_links_mock.side_effect = [
+        {"id": "mock fixed item 1"},
+        {"id": "mock fixed item 2"},
+        {"id": "mock fixed item 3"},
+    ]
+    get_sortable_configs_by_field_mock.return_value = {
+        "collection": SimpleNamespace(items_column="col1"),
+        "id": SimpleNamespace(items_column="col2"),
+    }
+    stac_parser_mock.side_effect = [
+        SimpleNamespace(
+            parse_stac_item=mock.Mock(return_value=[None, {}]),
+        )
+        for _ in range(len(fetchall_mock.return_value))
+    ]
+    result = await SearchHandler(
+        search_request=SimpleNamespace(
+            token=None,
+            ids=None,
+            collections=None,
+            bbox=None,
+            intersects=None,
+            datetime=None,
+            filter=None,
+            filter_lang="cql2-json",
+            sortby=None,
+            limit=10,
+        ),
+        request=SimpleNamespace(
+            headers={"accept": "application/json;q=0.5, application/geo+json-seq"}
+        ),
+    ).search()
+    assert result.media_type == "application/geo+json-seq"
+    body = b"".join([chunk async for chunk in result.body_iterator])
+    assert body == (
+        b'\x1e{"id":"mock fixed item 1"}\n'
+        b'\x1e{"id":"mock fixed item 2"}\n'
+        b'\x1e{"id":"mock fixed item 3"}\n'
+    )
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.search.search_handler.format_query_object_name")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_last_load_id")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_search_link")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_catalog_link")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_sortable_configs_by_field")
+@mock.patch("stac_fastapi.indexed.search.fields.get_indexed_fields")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fetch_dict")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fetchall")
+async def test_search_fields_answered_from_index(
+    fetchall_mock: mock.AsyncMock,
+    fetch_dict_mock: mock.AsyncMock,
+    get_indexed_fields_mock: mock.AsyncMock,
+    get_sortable_configs_by_field_mock: mock.MagicMock,
+    *args,
+) -> None:
+    from stac_fastapi.indexed.search.fields import IndexedField
+    from stac_fastapi.indexed.search.search_handler import SearchHandler
+
+    fetchall_mock.return_value = [
+        ["", "", "item1", "collection1", "collection1", "item1", 10],
+        ["", "", "item2", "collection1", "collection1", "item2", None],
+    ]
+    get_indexed_fields_mock.return_value = {
+        "properties.gsd": IndexedField(
+            json_path="properties.gsd",
+            items_column="i_properties_gsd",
+            collection_ids={"*"},
+        ),
+    }
+    get_sortable_configs_by_field_mock.return_value = {
+        "collection": SimpleNamespace(items_column="col1"),
+        "id": SimpleNamespace(items_column="col2"),
+    }
+    result = await SearchHandler(
+        search_request=SimpleNamespace(
+            token=None,
+            ids=None,
+            collections=None,
+            bbox=None,
+            intersects=None,
+            datetime=None,
+            filter=None,
+            filter_lang="cql2-json",
+            sortby=None,
+            fields=SimpleNamespace(
+                include={"id", "collection", "properties.gsd"}, exclude=set()
+            ),
+            limit=10,
+        ),
+        request=SimpleNamespace(headers={}),
+    ).search()
+    fetch_dict_mock.assert_not_called()
+    assert '"i_properties_gsd"' in fetchall_mock.call_args[0][0]
+    assert result["features"] == [
+        {"id": "item1", "collection": "collection1", "properties": {"gsd": 10}},
+        {"id": "item2", "collection": "collection1"},
+    ]
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.search.cursor_store.get_settings")
+@mock.patch("stac_fastapi.indexed.search.cursor_store.get_cursor_store")
+@mock.patch("stac_fastapi.indexed.search.search_handler.format_query_object_name")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_last_load_id")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_token_link")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_search_link")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_catalog_link")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_sortable_configs_by_field")
+@mock.patch("stac_fastapi.indexed.search.fields.get_indexed_fields")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fetchall")
+async def test_search_pages_with_cursor_token(
+    fetchall_mock: mock.AsyncMock,
+    get_indexed_fields_mock: mock.AsyncMock,
+    get_sortable_configs_by_field_mock: mock.MagicMock,
+    get_catalog_link_mock: mock.MagicMock,
+    get_search_link_mock: mock.MagicMock,
+    get_token_link_mock: mock.MagicMock,
+    get_last_load_id_mock: mock.MagicMock,
+    format_query_object_name_mock: mock.MagicMock,
+    get_cursor_store_mock: mock.MagicMock,
+    cursor_store_get_settings_mock: mock.MagicMock,
+) -> None:
+    from stac_fastapi.indexed.search.cursor_store import MemoryCursorStore
+    from stac_fastapi.indexed.search.search_handler import SearchHandler
+
+    get_cursor_store_mock.return_value = MemoryCursorStore(max_entries=10)
+    cursor_store_get_settings_mock.return_value = SimpleNamespace(
+        search_cursor_min_token_length=0
+    )
+    get_last_load_id_mock.return_value = "load1"
+    format_query_object_name_mock.return_value = "items"
+    fetchall_mock.return_value = [
+        ["", "", "item1", "collection1", "collection1", "item1"],
+        ["", "", "item2", "collection1", "collection1", "item2"],
+    ]
+    get_indexed_fields_mock.return_value = {}
+    get_sortable_configs_by_field_mock.return_value = {
+        "collection": SimpleNamespace(items_column="col1"),
+        "id": SimpleNamespace(items_column="col2"),
+    }
+
+    def search_request(token):
+        return SimpleNamespace(
+            token=token,
+            ids=["item1", "item2"],
+            collections=None,
+            bbox=None,
+            intersects=None,
+            datetime=None,
+            filter=None,
+            filter_lang="cql2-json",
+            sortby=None,
+            fields=SimpleNamespace(include={"id", "collection"}, exclude=set()),
+            limit=1,
+        )
+
+    await SearchHandler(
+        search_request=search_request(None),
+        request=SimpleNamespace(headers={}, method="GET"),
+    ).search()
+    next_token = get_token_link_mock.call_args[0][3]
+    assert next_token.startswith("c.")
+    first_query, first_params = fetchall_mock.call_args[0]
+    get_sortable_configs_by_field_mock.reset_mock()
+    await SearchHandler(
+        search_request=search_request(next_token),
+        request=SimpleNamespace(headers={}, method="GET"),
+    ).search()
+    # later pages reuse the compiled query rather than recompiling it from the request
+    get_sortable_configs_by_field_mock.assert_not_called()
+    assert fetchall_mock.call_args[0][0] == first_query
+    assert fetchall_mock.call_args[0][1] == first_params[:-1] + [1]
+    previous_token = get_token_link_mock.call_args[0][3]
+    assert previous_token.startswith("c.")
+    assert next_token.split(".")[1] == previous_token.split(".")[1]
+    # a cursor evicted from, or never held by, this instance's store is compiled from its token
+    get_cursor_store_mock.return_value = MemoryCursorStore(max_entries=10)
+    await SearchHandler(
+        search_request=search_request(next_token),
+        request=SimpleNamespace(headers={}, method="GET"),
+    ).search()
+    get_sortable_configs_by_field_mock.assert_called()
+    assert fetchall_mock.call_args[0][0] == first_query
+    assert fetchall_mock.call_args[0][1] == first_params[:-1] + [1]
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.search.search_handler.StacParser")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fix_item_links")
+@mock.patch("stac_fastapi.indexed.search.search_handler.fetch_dict")
+async def test_iterate_items_window(
+    fetch_dict_mock: mock.AsyncMock,
+    fix_item_links_mock: mock.MagicMock,
+    stac_parser_mock: mock.MagicMock,
+) -> None:
+    from asyncio import sleep
+
+    from stac_fastapi.indexed.search.search_handler import SearchHandler
+
+    in_flight = {"current": 0, "max": 0}
+
+    async def fetch_dict(uri: str):
+        in_flight["current"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["current"])
+        await sleep(0)
+        in_flight["current"] -= 1
+        return {"id": uri}
+
+    fetch_dict_mock.side_effect = fetch_dict
+    fix_item_links_mock.side_effect = lambda item, _: item
+    stac_parser_mock.return_value = SimpleNamespace(
+        parse_stac_item=lambda item_dict: [None, item_dict]
+    )
+    search_handler = SearchHandler(
+        search_request=SimpleNamespace(), request=SimpleNamespace(headers={})
+    )
+    rows = [[f"item{i}", ""] for i in range(6)]
+    for window_size, expected_max in [(2, 2), (len(rows), len(rows))]:
+        in_flight["max"] = 0
+        items = [
+            item
+            async for item in search_handler._iterate_items(
+                rows, window_size=window_size
+            )
+        ]
+        # items are yielded in row order, and at most one window is fetched at once
+        assert [item["id"] for item in items] == [row[0] for row in rows]
+        assert in_flight["max"] == expected_max
+
+
+@pytest.mark.asyncio
+async def test_disk_cursor_store() -> None:
+    from stac_fastapi.indexed.search.cursor_store import (
+        CompiledQuery,
+        DiskCursorStore,
+    )
+    from stac_fastapi.indexed.search.query_info import (
+        QueryInfo,
+        current_query_version,
+    )
+
+    def compiled_query(limit: int) -> CompiledQuery:
+        return CompiledQuery(
+            query_info=QueryInfo(
+                query_version=current_query_version,
+                filter_lang="cql2-json",
+                limit=limit,
+                last_load_id="load1",
+            ),
+            items_object_name="items",
+            table_expression="items",
+            clauses=["id IN (?)"],
+            params=["item1"],
+            order=["id ASC"],
+        )
+
+    with TemporaryDirectory() as tmp_dir:
+        directory = path.join(tmp_dir, "cursors")
+        makedirs(directory, mode=0o777)
+        chmod(directory, 0o777)
+        cursor_store = DiskCursorStore(
+            directory=directory, max_entries=1, secret="secret"
+        )
+        # the directory is made private to the API's user
+        assert S_IMODE(stat(directory).st_mode) == 0o700
+        await cursor_store.put("a" * 32, compiled_query(1))
+        assert await cursor_store.get("a" * 32) == compiled_query(1)
+        await cursor_store.put("b" * 32, compiled_query(2))
+        # least recently used cursors are evicted
+        assert await cursor_store.get("a" * 32) is None
+        assert await cursor_store.get("b" * 32) == compiled_query(2)
+        # cursors that are not signed with the token secret are not unpickled
+        other_cursor_store = DiskCursorStore(
+            directory=directory, max_entries=1, secret="other secret"
+        )
+        assert await other_cursor_store.get("b" * 32) is None
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_last_load_id")
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_queryable_config_by_name")
+@mock.patch("stac_fastapi.indexed.search.search_handler.filter_to_ast")
+async def test_filter_clause_cache(
+    filter_to_ast_mock: mock.MagicMock,
+    get_queryable_config_by_name_mock: mock.AsyncMock,
+    get_last_load_id_mock: mock.MagicMock,
+) -> None:
+    from stac_fastapi.indexed.search.filter.parser import filter_to_ast
+    from stac_fastapi.indexed.search.search_handler import (
+        SearchHandler,
+        _get_filter_clause,
+    )
+
+    _get_filter_clause.cache_clear()
+    filter_to_ast_mock.side_effect = filter_to_ast
+    get_queryable_config_by_name_mock.return_value = {
+        "eo:cloud_cover": SimpleNamespace(
+            name="eo:cloud_cover",
+            collection_id="*",
+            items_column="i_cloud_cover",
+            items_column_type="DOUBLE",
+            is_geometry=False,
+            is_temporal=False,
+        )
+    }
+    get_last_load_id_mock.return_value = "load1"
+    handler = SearchHandler(search_request=None, request=None)
+    first = await handler._include_filter(
+        filter_lang="cql2-json",
+        filter={"op": "<", "args": [{"property": "eo:cloud_cover"}, 10]},
+        collections=["c2", "c1"],
+    )
+    # key order and collection order do not affect the cache key
+    second = await handler._include_filter(
+        filter_lang="cql2-json",
+        filter={"args": [{"property": "eo:cloud_cover"}, 10], "op": "<"},
+        collections=["c1", "c2"],
+    )
+    assert filter_to_ast_mock.call_count == 1
+    assert first == second
+    assert first.params is not second.params
+    # a new index generation may have different queryables
+    get_last_load_id_mock.return_value = "load2"
+    await handler._include_filter(
+        filter_lang="cql2-json",
+        filter={"op": "<", "args": [{"property": "eo:cloud_cover"}, 10]},
+        collections=["c1", "c2"],
+    )
+    assert filter_to_ast_mock.call_count == 2
+
+
+@mock.patch("stac_fastapi.indexed.search.search_handler.get_settings")
+def test_include_ids_above_value_list_threshold(
+    get_settings_mock: mock.MagicMock,
+) -> None:
+    from stac_fastapi.indexed.search.search_handler import SearchHandler
+
+    get_settings_mock.return_value = SimpleNamespace(search_value_list_threshold=2)
+    handler = SearchHandler(search_request=None, request=None)
+    ids = ["a", "c", "it's"]
+    short_clause = handler._include_ids(ids[0:2])
+    long_clause = handler._include_ids(ids)
+    assert len(short_clause.params) == 2
+    # long lists are bound as one parameter, regardless of length
+    assert len(long_clause.params) == 1
+    connection = duckdb.connect()
+    statement = "SELECT id FROM (VALUES ('a'), ('b'), ('c'), ('it''s')) t(id) WHERE {} ORDER BY id"
+    assert connection.execute(
+        statement.format(long_clause.sql), long_clause.params
+    ).fetchall() == [("a",), ("c",), ("it's",)]
+    assert connection.execute(
+        statement.format(short_clause.sql), short_clause.params
+    ).fetchall() == [("a",), ("c",)]
+    connection.close()
+
+
+def test_apply_fields() -> None:
+    from stac_fastapi.indexed.search.fields import FieldSelection, apply_fields
+
+    item = {
+        "id": "item1",
+        "geometry": {"type": "Point", "coordinates": [0, 0]},
+        "properties": {"datetime": "2000-01-01T00:00:00Z", "gsd": 10},
+    }
+    assert apply_fields(
+        item, FieldSelection(include=["id", "properties.gsd"], exclude=["id"])
+    ) == {"id": "item1", "properties": {"gsd": 10}}
+    assert apply_fields(
+        item, FieldSelection(exclude=["geometry", "properties.gsd"])
+    ) == {
+        "id": "item1",
+        "properties": {"datetime": "2000-01-01T00:00:00Z"},
+    }
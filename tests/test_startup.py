@@ -0,0 +1,62 @@
+from os import environ
+from statistics import median
+from subprocess import run
+from sys import executable
+from time import time
+from typing import List, Tuple
+from unittest import mock
+
+import pytest
+from common import monkeypatch_settings
+
+
+@pytest.fixture(autouse=True)
+def setup(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch_settings(monkeypatch)
+
+
+def _import_app() -> Tuple[float, List[str]]:
+    # a fresh interpreter is required, as a cold container would have, and other tests import these modules
+    start = time()
+    result = run(
+        [
+            executable,
+            "-c",
+            "import sys, stac_fastapi.indexed.app; print(','.join(sorted(sys.modules)))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time() - start, result.stdout.strip().split(",")
+
+
+def test_heavy_modules_deferred() -> None:
+    _, imported_modules = _import_app()
+    for module_name in [
+        "aiohttp",
+        "mangum",
+        "pygeofilter",
+        "shapely",
+        "stac_index.indexer.creator.creator",
+    ]:
+        assert module_name not in imported_modules
+
+
+def test_cold_start_budget() -> None:
+    budget = float(environ.get("COLD_START_BUDGET_SECONDS", 1.5))
+    import_times = [_import_app()[0] for _ in range(3)]
+    assert median(import_times) <= budget
+
+
+@mock.patch("stac_fastapi.indexed.profiling._logger")
+def test_startup_budget_exceeded(logger_mock: mock.MagicMock) -> None:
+    from stac_fastapi.indexed import profiling
+
+    with mock.patch.object(profiling, "_startup_phases", []):
+        profiling.record_startup_phase("phase")
+        profiling.log_startup_profile(budget=0)
+        profiling.log_startup_profile(budget=None)
+    assert logger_mock.warning.call_count == 1
@@ -0,0 +1,81 @@
+from unittest import mock
+
+import duckdb
+import pytest
+from common import monkeypatch_settings
+from stac_fastapi.types.errors import InvalidQueryParameter
+
+
+@pytest.fixture(autouse=True)
+def setup(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch_settings(monkeypatch)
+
+
+def _get_text_search_connection() -> duckdb.DuckDBPyConnection:
+    # mirrors the tables derived from DuckDB's full-text index at indexing time
+    connection = duckdb.connect()
+    connection.execute(
+        """
+        CREATE TABLE text_search_documents AS SELECT * FROM (VALUES
+            ('c1', 'a', 0, 3),
+            ('c1', 'b', 1, 2),
+            ('c2', 'a', 2, 2),
+        ) t(collection_id, id, docid, len)
+        """
+    )
+    connection.execute(
+        """
+        CREATE TABLE text_search_dictionary AS SELECT * FROM (VALUES
+            (0, 'ocean', 2),
+            (1, 'coast', 1),
+            (2, 'forest', 1),
+        ) t(termid, term, df)
+        """
+    )
+    connection.execute(
+        """
+        CREATE TABLE text_search_terms AS SELECT * FROM (VALUES
+            (0, 0), (0, 0), (0, 1),
+            (1, 0), (1, 2),
+            (2, 2), (2, 2),
+        ) t(docid, termid)
+        """
+    )
+    connection.execute(
+        """
+        CREATE TABLE text_search_stats AS
+        SELECT COUNT(*) AS num_docs, AVG(len) AS avgdl FROM text_search_documents
+        """
+    )
+    return connection
+
+
+@mock.patch("stac_fastapi.indexed.search.text_search.has_query_object")
+@mock.patch("stac_fastapi.indexed.search.text_search.format_query_object_name")
+def test_text_search_scores(
+    format_query_object_name_mock: mock.MagicMock,
+    has_query_object_mock: mock.MagicMock,
+) -> None:
+    from stac_fastapi.indexed.search.text_search import get_text_search_scores
+
+    connection = _get_text_search_connection()
+    format_query_object_name_mock.side_effect = lambda name: name
+    has_query_object_mock.return_value = True
+    scores = get_text_search_scores(["OCÉAN", "coast"])
+    rows = connection.execute(
+        f"SELECT collection_id, id FROM ({scores.sql}) ORDER BY score DESC",
+        scores.params,
+    ).fetchall()
+    # terms are case and accent insensitive, any matching term matches
+    assert rows == [("c1", "a"), ("c1", "b")]
+
+
+@mock.patch("stac_fastapi.indexed.search.text_search.has_query_object")
+def test_text_search_not_configured(has_query_object_mock: mock.MagicMock) -> None:
+    from stac_fastapi.indexed.search.text_search import get_text_search_scores
+
+    has_query_object_mock.return_value = False
+    with pytest.raises(InvalidQueryParameter):
+        get_text_search_scores(["ocean"])
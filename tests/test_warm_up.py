@@ -0,0 +1,115 @@
+from os import path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import mock
+
+import duckdb
+import pytest
+from common import monkeypatch_settings
+
+
+@pytest.fixture(autouse=True)
+def setup(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch_settings(monkeypatch)
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.warm_up.get_item_counts_by_collection")
+@mock.patch("stac_fastapi.indexed.warm_up.get_sortable_configs")
+@mock.patch("stac_fastapi.indexed.warm_up.get_queryable_config_by_name")
+@mock.patch("stac_fastapi.indexed.warm_up.fetch_dict")
+@mock.patch("stac_fastapi.indexed.warm_up.get_settings")
+async def test_warm_up_index_generation(
+    get_settings_mock: mock.MagicMock,
+    fetch_dict_mock: mock.AsyncMock,
+    get_queryable_config_by_name_mock: mock.AsyncMock,
+    get_sortable_configs_mock: mock.AsyncMock,
+    get_item_counts_by_collection_mock: mock.AsyncMock,
+) -> None:
+    from stac_fastapi.indexed import db, warm_up
+    from stac_fastapi.indexed.search.types import CountMode
+
+    get_settings_mock.return_value = SimpleNamespace(
+        index_warm_up=True,
+        index_warm_up_collection_count=1,
+        search_count_mode=CountMode.ESTIMATED,
+    )
+    fetch_dict_mock.side_effect = lambda uri: {"id": uri}
+    connection = duckdb.connect()
+    with TemporaryDirectory() as tmp_dir:
+        parquet_uris = {
+            "items": path.join(tmp_dir, "items.parquet"),
+            "collections": path.join(tmp_dir, "collections.parquet"),
+        }
+        connection.execute(
+            f"""
+            COPY (SELECT 'c1' AS collection_id, 'a' AS id, 'a.json' AS stac_location, '' AS applied_fixes)
+              TO '{parquet_uris["items"]}' (FORMAT PARQUET)
+            """
+        )
+        connection.execute(
+            f"""
+            COPY (SELECT * FROM (VALUES ('c1', 'c1.json'), ('c2', 'c2.json')) t(id, stac_location))
+              TO '{parquet_uris["collections"]}' (FORMAT PARQUET)
+            """
+        )
+        generation = db.IndexGeneration(
+            load_id="load1", manifest_last_modified=1, parquet_uris=parquet_uris
+        )
+        # warm-up runs with the generation being loaded in use
+        token = db._request_generation.set(generation)
+        try:
+            with (
+                mock.patch.object(db, "_root_db_connection", connection),
+                mock.patch.object(warm_up, "_collection_requests", warm_up.Counter()),
+                mock.patch.object(warm_up, "_prefetched_collections", {}),
+            ):
+                warm_up.record_collection_request("c2")
+                warm_up.record_collection_request("c1")
+                warm_up.record_collection_request("c1")
+                await warm_up.warm_up_index_generation()
+                # only the most-requested collections are prefetched
+                assert warm_up.get_prefetched_collection("c1.json") == {"id": "c1.json"}
+                assert warm_up.get_prefetched_collection("c2.json") is None
+        finally:
+            db._request_generation.reset(token)
+    connection.close()
+    get_queryable_config_by_name_mock.assert_awaited_once()
+    get_sortable_configs_mock.assert_awaited_once()
+    get_item_counts_by_collection_mock.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@mock.patch("stac_fastapi.indexed.warm_up.get_item_counts_by_collection")
+@mock.patch("stac_fastapi.indexed.warm_up._prime_configuration_caches")
+@mock.patch("stac_fastapi.indexed.warm_up.get_index_generation")
+@mock.patch("stac_fastapi.indexed.warm_up.get_settings")
+async def test_warm_up_skips_item_counts(
+    get_settings_mock: mock.MagicMock,
+    get_index_generation_mock: mock.MagicMock,
+    prime_configuration_caches_mock: mock.AsyncMock,
+    get_item_counts_by_collection_mock: mock.AsyncMock,
+) -> None:
+    from stac_fastapi.indexed import warm_up
+    from stac_fastapi.indexed.search.types import CountMode
+
+    get_index_generation_mock.return_value = SimpleNamespace(load_id="load1")
+    # counts are not used by other count modes, and warm-up may be disabled entirely
+    for index_warm_up, search_count_mode in [
+        (True, CountMode.EXACT),
+        (False, CountMode.ESTIMATED),
+    ]:
+        get_settings_mock.return_value = SimpleNamespace(
+            index_warm_up=index_warm_up,
+            index_warm_up_collection_count=0,
+            search_count_mode=search_count_mode,
+        )
+        with (
+            mock.patch.object(warm_up, "_read_index_metadata"),
+            mock.patch.object(warm_up, "_run_representative_queries"),
+        ):
+            await warm_up.warm_up_index_generation()
+    get_item_counts_by_collection_mock.assert_not_awaited()
+    assert prime_configuration_caches_mock.await_count == 2